@@ -0,0 +1,243 @@
+"""
+Показатели отеля по типам номеров: загрузка, ADR, RevPAR
+
+Проживания читаются из БД одним запросом в массивы NumPy; проданные ночи
+по дням считаются через разностные массивы (+ в день заезда, - в день
+выезда) и накопленную сумму, без цикла по броням. Выручка - признанная по
+ночам сумма со скидкой за длительность (таблица nightly_revenue, см.
+revenue.py), та же, что в отчете о доходах.
+
+  загрузка = проданные номеро-ночи / доступные номеро-ночи
+  ADR      = выручка / проданные номеро-ночи
+  RevPAR   = выручка / доступные номеро-ночи
+
+CLI:  python analytics.py 2025-01-01 2026-01-01 [--period month]
+"""
+import argparse
+import logging
+import sys
+import time
+from contextlib import nullcontext
+from datetime import date
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from config import AppConfig
+from database import Database, DatabaseError
+from utils import date_to_day, day_to_date, format_currency
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ("day", "week", "month")
+
+# Строка итога по всем типам номеров
+TOTAL = "Все номера"
+
+
+class AnalyticsError(Exception):
+    """Ошибка расчета показателей"""
+    pass
+
+
+class KpiReport:
+    """
+    Ряды показателей за период. Строки массивов - типы номеров
+    (последняя - итог по отелю), столбцы - дни, недели или месяцы.
+    """
+    def __init__(self, periods: List[date], room_types: List[str],
+                 sold: np.ndarray, available: np.ndarray, revenue: np.ndarray):
+        self.periods = periods        # начало каждого периода
+        self.room_types = room_types
+        self.sold = sold              # проданные номеро-ночи
+        self.available = available    # доступные номеро-ночи
+        self.revenue = revenue
+
+    @property
+    def occupancy(self) -> np.ndarray:
+        """Загрузка, %"""
+        return _ratio(self.sold, self.available) * 100
+
+    @property
+    def adr(self) -> np.ndarray:
+        return _ratio(self.revenue, self.sold)
+
+    @property
+    def revpar(self) -> np.ndarray:
+        return _ratio(self.revenue, self.available)
+
+    def rows(self) -> Iterator[Tuple[date, str, float, float, float]]:
+        """(начало периода, тип номера, загрузка %, ADR, RevPAR)"""
+        occupancy, adr, revpar = self.occupancy, self.adr, self.revpar
+        for j, period in enumerate(self.periods):
+            for i, room_type in enumerate(self.room_types):
+                yield period, room_type, float(occupancy[i, j]), float(adr[i, j]), float(revpar[i, j])
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Поэлементное деление, 0 там, где знаменатель 0"""
+    result = np.zeros(numerator.shape, dtype=np.float64)
+    np.divide(numerator, denominator, out=result, where=denominator > 0)
+    return result
+
+
+def _known_types(room_ids: np.ndarray, room_types: np.ndarray) -> np.ndarray:
+    """Индекс типа для каждого room_id (-1 - номер удален)"""
+    types = room_types[np.clip(room_ids, 0, len(room_types) - 1)]
+    types[room_ids >= len(room_types)] = -1
+    return types
+
+
+def daily_sold(stays: np.ndarray, room_types: np.ndarray, type_count: int,
+               start_day: int, end_day: int) -> np.ndarray:
+    """
+    Проданные номеро-ночи по типам номеров и дням [start_day, end_day)
+    stays - массив (n, 3): room_id, ci_day, co_day
+    room_types - индекс типа по room_id (-1 - номер удален)
+    Возвращает массив (type_count, число дней)
+    """
+    days = end_day - start_day
+    width = days + 1
+    if not len(stays):
+        return np.zeros((type_count, days), dtype=np.int64)
+
+    room_ids = stays[:, 0].astype(np.int64)
+    check_in = stays[:, 1].astype(np.int64)
+    check_out = stays[:, 2].astype(np.int64)
+
+    types = _known_types(room_ids, room_types)
+    known = types >= 0
+    types, check_in, check_out = types[known], check_in[known], check_out[known]
+
+    # Ночи вне периода отрезаются
+    first = np.maximum(check_in, start_day) - start_day
+    last = np.minimum(check_out, end_day) - start_day
+    size = type_count * width
+
+    sold = (np.bincount(types * width + first, minlength=size)
+            - np.bincount(types * width + last, minlength=size))
+    return np.cumsum(sold.reshape(type_count, width), axis=1)[:, :days]
+
+
+def daily_revenue(nights: np.ndarray, room_types: np.ndarray, type_count: int,
+                  start_day: int, end_day: int) -> np.ndarray:
+    """
+    Выручка по типам номеров и дням [start_day, end_day)
+    nights - массив (n, 3): room_id, номер дня, сумма (Database.get_room_night_revenue)
+    Возвращает массив (type_count, число дней)
+    """
+    days = end_day - start_day
+    if not len(nights):
+        return np.zeros((type_count, days))
+
+    types = _known_types(nights[:, 0].astype(np.int64), room_types)
+    day = nights[:, 1].astype(np.int64) - start_day
+    known = (types >= 0) & (day >= 0) & (day < days)
+    revenue = np.bincount(types[known] * days + day[known], weights=nights[known, 2],
+                          minlength=type_count * days)
+    return revenue.reshape(type_count, days)
+
+
+def _period_starts(start_day: int, end_day: int, period: str) -> np.ndarray:
+    """Номер первого дня календарного периода для каждого дня [start_day, end_day)"""
+    days = np.arange(start_day, end_day, dtype=np.int64)
+    if period == "day":
+        return days
+    if period == "week":
+        # День 0 (1970-01-01) - четверг; неделя начинается в понедельник
+        return days - (days + 3) % 7
+    months = days.astype("datetime64[D]").astype("datetime64[M]")
+    return months.astype("datetime64[D]").astype(np.int64)
+
+
+def compute_kpis(db: Database, start_date: str, end_date: str, period: str = "month") -> KpiReport:
+    """
+    Показатели за [start_date, end_date) по дням, неделям или месяцам
+    Первый и последний периоды могут быть неполными - считаются только дни внутри диапазона.
+    Доступность - текущее число номеров каждого типа.
+    """
+    if period not in PERIODS:
+        raise AnalyticsError(f"Неизвестный период '{period}', доступны: {', '.join(PERIODS)}")
+    try:
+        start_day, end_day = date_to_day(start_date), date_to_day(end_date)
+    except ValueError as e:
+        raise AnalyticsError(f"Некорректная дата: {e}")
+    if end_day <= start_day:
+        raise AnalyticsError("Конец периода должен быть позже начала")
+
+    # Номера и брони - из одного снимка, если соединение только для чтения
+    with db.read_snapshot() if db.read_only else nullcontext():
+        rooms = db.get_all_rooms()
+        stays = db.get_stays(start_date, end_date)
+        nights = db.get_room_night_revenue(start_date, end_date)
+
+    names = [t for t in AppConfig.ROOM_TYPES if any(room.type == t for room in rooms)]
+    names += sorted({room.type for room in rooms} - set(names))
+    type_index = {name: i for i, name in enumerate(names)}
+    room_types = np.full(max((room.id for room in rooms), default=0) + 1, -1, dtype=np.int64)
+    for room in rooms:
+        room_types[room.id] = type_index[room.type]
+    capacity = np.bincount(room_types[room_types >= 0], minlength=len(names))
+
+    stays = np.array(stays, dtype=np.int64).reshape(-1, 3)
+    nights = np.array(nights, dtype=np.float64).reshape(-1, 3)
+    sold = daily_sold(stays, room_types, len(names), start_day, end_day)
+    revenue = daily_revenue(nights, room_types, len(names), start_day, end_day)
+
+    # Дни -> периоды: дни упорядочены, поэтому периоды идут сплошными отрезками
+    starts = _period_starts(start_day, end_day, period)
+    boundaries = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+    days_in_period = np.diff(np.r_[boundaries, len(starts)])
+    if len(names):
+        sold = np.add.reduceat(sold, boundaries, axis=1)
+        revenue = np.add.reduceat(revenue, boundaries, axis=1)
+    else:
+        sold = np.zeros((0, len(boundaries)), dtype=np.int64)
+        revenue = np.zeros((0, len(boundaries)))
+    available = capacity[:, None] * days_in_period[None, :]
+
+    # Итог по отелю - последней строкой
+    sold = np.vstack([sold, sold.sum(axis=0)])
+    revenue = np.vstack([revenue, revenue.sum(axis=0)])
+    available = np.vstack([available, available.sum(axis=0)])
+    periods = [day_to_date(int(day)) for day in starts[boundaries]]
+    return KpiReport(periods, names + [TOTAL], sold, available, revenue)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Загрузка, ADR и RevPAR по типам номеров")
+    parser.add_argument("start", help="начало периода ГГГГ-ММ-ДД")
+    parser.add_argument("end", help="конец периода ГГГГ-ММ-ДД (не включается)")
+    parser.add_argument("--period", choices=PERIODS, default="month", help="шаг ряда")
+    parser.add_argument("--db", default=AppConfig.DB_FILE, help="файл БД")
+    parser.add_argument("--archive", default=AppConfig.ARCHIVE_FILE, help="файл архива броней")
+    args = parser.parse_args(argv)
+
+    try:
+        db = Database(args.db, archive_file=args.archive, storage_profile="reporting",
+                      read_only=True)
+    except DatabaseError as e:
+        logger.error(str(e))
+        return 1
+    try:
+        started = time.perf_counter()
+        report = compute_kpis(db, args.start, args.end, args.period)
+        logger.info(f"Показатели рассчитаны за {time.perf_counter() - started:.3f} с")
+    except (AnalyticsError, DatabaseError) as e:
+        logger.error(str(e))
+        return 1
+    finally:
+        db.close()
+
+    print(f"{'Период':<12} {'Тип номера':<22} {'Загрузка':>9} {'ADR':>16} {'RevPAR':>16}")
+    for period, room_type, occupancy, adr, revpar in report.rows():
+        print(
+            f"{period.isoformat():<12} {room_type:<22} {occupancy:>8.1f}% "
+            f"{format_currency(adr):>16} {format_currency(revpar):>16}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Архивирование старых бронирований
+
+Завершенные и отмененные брони с выездом старше ARCHIVE_AFTER_DAYS
+переносятся порциями в hotel_archive.db. Основная таблица и ее индексы
+остаются небольшими, а отчеты читают обе через представление all_bookings.
+
+CLI:  python archive.py [--days 365] [--batch 500]
+"""
+import argparse
+import logging
+import sys
+from datetime import date, timedelta
+from typing import Optional
+
+from config import AppConfig
+from database import Database, DatabaseError
+from utils import date_to_day
+
+logger = logging.getLogger(__name__)
+
+
+def archive_old_bookings(db: Database, archive_file: Optional[str] = None,
+                         older_than_days: Optional[int] = None,
+                         batch_size: Optional[int] = None) -> int:
+    """
+    Перенос старых броней в архив порциями (каждая - короткие транзакции
+    копирования и удаления, чтобы не блокировать запись надолго).
+    Возвращает количество перенесенных.
+    """
+    archive_file = archive_file or AppConfig.ARCHIVE_FILE
+    older_than_days = AppConfig.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or AppConfig.ARCHIVE_BATCH_SIZE
+
+    if not db.attach_archive(archive_file):
+        raise DatabaseError(f"Не удалось подключить архив '{archive_file}'")
+
+    cutoff_day = date_to_day(date.today() - timedelta(days=older_than_days))
+    total = 0
+    while True:
+        moved = db.archive_bookings_batch(cutoff_day, batch_size)
+        total += len(moved)
+        if len(moved) < batch_size:
+            break
+
+    logger.info(f"Перенесено броней в архив: {total}")
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Архивирование старых бронирований")
+    parser.add_argument("--db", default=AppConfig.DB_FILE, help="файл БД")
+    parser.add_argument("--archive", default=AppConfig.ARCHIVE_FILE, help="файл архива")
+    parser.add_argument("--days", type=int, default=AppConfig.ARCHIVE_AFTER_DAYS,
+                        help="переносить брони с выездом старше N дней")
+    parser.add_argument("--batch", type=int, default=AppConfig.ARCHIVE_BATCH_SIZE,
+                        help="размер порции (броней на транзакцию)")
+    args = parser.parse_args(argv)
+
+    try:
+        db = Database(args.db)
+    except DatabaseError as e:
+        logger.error(str(e))
+        return 1
+    try:
+        archive_old_bookings(db, args.archive, args.days, args.batch)
+    except DatabaseError as e:
+        logger.error(str(e))
+        return 1
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+Онлайн-резервное копирование БД через SQLite backup API
+
+Копирование идет небольшими порциями страниц с паузами между ними,
+поэтому приложение продолжает читать и писать во время копирования.
+Запись другого соединения (терминала) перезапускает копирование с начала;
+после AppConfig.BACKUP_MAX_RESTARTS перезапусков копия откладывается.
+В режиме WAL БД копируется за один шаг в одной транзакции чтения:
+запись при этом не блокируется, и перезапусков нет.
+Каждый снимок проверяется PRAGMA integrity_check, старые удаляются.
+
+CLI:  python backup.py [--db hotel.db] [--dir backups/] [--keep 7]
+"""
+import argparse
+import glob
+import logging
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from config import AppConfig
+
+logger = logging.getLogger(__name__)
+
+
+class BackupError(Exception):
+    """Ошибка резервного копирования"""
+    pass
+
+
+class BackupDeferred(BackupError):
+    """Копирование прервано: БД слишком часто меняется другими соединениями"""
+    pass
+
+
+def backup_path(db_file: str, backup_dir: str, moment: Optional[datetime] = None) -> str:
+    """Имя снимка: <имя БД>_ГГГГММДД_ЧЧММСС.db"""
+    name = os.path.splitext(os.path.basename(db_file))[0]
+    stamp = (moment or datetime.now()).strftime("%Y%m%d_%H%M%S")
+    return os.path.join(backup_dir, f"{name}_{stamp}.db")
+
+
+def list_backups(db_file: str, backup_dir: str) -> list:
+    """Снимки БД, от новых к старым"""
+    name = os.path.splitext(os.path.basename(db_file))[0]
+    pattern = os.path.join(backup_dir, f"{name}_????????_??????.db")
+    return sorted(glob.glob(pattern), reverse=True)
+
+
+def rotate_backups(db_file: str, backup_dir: str, keep: int) -> list:
+    """Удаление старых снимков, кроме keep последних"""
+    removed = []
+    for path in list_backups(db_file, backup_dir)[keep:]:
+        try:
+            os.remove(path)
+            removed.append(path)
+        except OSError as e:
+            logger.error(f"Не удалось удалить старый снимок '{path}': {e}")
+    return removed
+
+
+def check_integrity(path: str) -> str:
+    """PRAGMA integrity_check снимка ('ok' или описание проблем)"""
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("PRAGMA integrity_check").fetchall()
+        return "; ".join(row[0] for row in rows)
+    finally:
+        conn.close()
+
+
+def run_backup(source: sqlite3.Connection, db_file: str, backup_dir: Optional[str] = None,
+               keep: Optional[int] = None, pages: Optional[int] = None,
+               sleep: Optional[float] = None,
+               progress: Optional[Callable[[int, int], None]] = None,
+               max_restarts: Optional[int] = None) -> Dict:
+    """
+    Снимок БД с проверкой целостности и ротацией
+    source - соединение, через которое приложение пишет в БД: собственные
+    записи не перезапускают копирование (записи других соединений перезапускают).
+    После max_restarts перезапусков - BackupDeferred, копию нужно повторить позже.
+    progress(скопировано страниц, всего страниц) вызывается после каждого шага.
+    Возвращает метрики: путь, размер, время, скорость, число шагов и перезапусков.
+    """
+    backup_dir = backup_dir or AppConfig.BACKUP_DIR
+    keep = keep or AppConfig.BACKUP_KEEP
+    pages = pages or AppConfig.BACKUP_PAGES_PER_STEP
+    sleep = AppConfig.BACKUP_STEP_SLEEP if sleep is None else sleep
+    max_restarts = AppConfig.BACKUP_MAX_RESTARTS if max_restarts is None else max_restarts
+
+    try:
+        journal_mode = source.execute("PRAGMA journal_mode").fetchone()[0].lower()
+    except sqlite3.Error as e:
+        raise BackupError(f"Ошибка чтения режима журнала: {e}")
+    if journal_mode == "wal":
+        # Один шаг - одна транзакция чтения: в WAL она не мешает записи
+        pages = -1
+
+    os.makedirs(backup_dir, exist_ok=True)
+    path = backup_path(db_file, backup_dir)
+    temp_path = path + ".part"
+    steps = [0]
+    restarts = [0]
+    copied = [0]
+
+    def on_step(status, remaining, total):
+        steps[0] += 1
+        # Скопированных страниц стало меньше - копирование началось заново
+        if total - remaining < copied[0]:
+            restarts[0] += 1
+            if restarts[0] > max_restarts:
+                raise BackupDeferred(
+                    f"Запись других соединений перезапустила копирование более "
+                    f"{max_restarts} раз - копия отложена"
+                )
+        copied[0] = total - remaining
+        if progress:
+            progress(total - remaining, total)
+        # backup() сам ждет только при занятой БД - паузу между шагами
+        # делаем здесь, чтобы запись приложения шла без очереди
+        if remaining and sleep:
+            time.sleep(sleep)
+
+    started = time.perf_counter()
+    target = sqlite3.connect(temp_path)
+    try:
+        # Исключение из progress прерывает backup() и выходит из него
+        source.backup(target, pages=pages, progress=on_step, sleep=sleep)
+    except BackupDeferred:
+        target.close()
+        os.remove(temp_path)
+        raise
+    except sqlite3.Error as e:
+        target.close()
+        os.remove(temp_path)
+        raise BackupError(f"Ошибка копирования БД: {e}")
+    target.close()
+    copy_seconds = time.perf_counter() - started
+
+    try:
+        integrity = check_integrity(temp_path)
+    except sqlite3.Error as e:
+        integrity = str(e)
+    if integrity != "ok":
+        os.remove(temp_path)
+        raise BackupError(f"Снимок не прошел проверку целостности: {integrity}")
+    os.replace(temp_path, path)
+
+    removed = rotate_backups(db_file, backup_dir, keep)
+    size = os.path.getsize(path)
+    result = {
+        "path": path,
+        "bytes": size,
+        "steps": steps[0],
+        "restarts": restarts[0],
+        "copy_seconds": round(copy_seconds, 3),
+        "total_seconds": round(time.perf_counter() - started, 3),
+        "mb_per_second": round(size / 1024 / 1024 / copy_seconds, 1) if copy_seconds else 0.0,
+        "integrity": integrity,
+        "removed": len(removed)
+    }
+    logger.info(
+        f"Резервная копия '{path}': {size / 1024 / 1024:.1f} МБ за {result['copy_seconds']} с "
+        f"({result['mb_per_second']} МБ/с, шагов: {result['steps']}, "
+        f"перезапусков: {result['restarts']}), "
+        f"удалено старых: {result['removed']}"
+    )
+    return result
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Онлайн-резервная копия БД")
+    parser.add_argument("--db", default=AppConfig.DB_FILE, help="файл БД")
+    parser.add_argument("--dir", default=AppConfig.BACKUP_DIR, help="каталог снимков")
+    parser.add_argument("--keep", type=int, default=AppConfig.BACKUP_KEEP,
+                        help="сколько последних снимков хранить")
+    args = parser.parse_args(argv)
+
+    try:
+        source = sqlite3.connect(args.db)
+    except sqlite3.Error as e:
+        logger.error(f"Не удалось открыть БД: {e}")
+        return 1
+    try:
+        run_backup(source, args.db, args.dir, args.keep)
+    except BackupError as e:
+        logger.error(str(e))
+        return 1
+    finally:
+        source.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+"""
+Сравнение профилей хранения на синтетических данных
+
+Создает БД с заданным числом номеров, гостей и броней, затем для каждого
+профиля из AppConfig.STORAGE_PROFILES замеряет три нагрузки:
+  импорт  - вставка броней порциями по 500 с выручкой по ночам (транзакция на порцию);
+  стойка  - страницы списка, дашборд, создание и отмена брони;
+  отчет   - полный проход iter_booking_details и выручка по месяцам;
+  скан    - агрегирующий запрос по всем броням с соединением справочников.
+
+CLI:  python benchmark.py [--bookings 1000000] [--profiles desk reporting]
+"""
+import argparse
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Dict, List
+
+from config import AppConfig
+from database import Database
+from revenue import rebuild_nightly_revenue, refresh_nightly_revenue
+from utils import date_to_day, day_to_date
+
+logger = logging.getLogger(__name__)
+
+INSERT_BATCH = 500
+# Настройки SQLite по умолчанию (как до введения профилей) - базовая строка сравнения
+BASELINE_PROFILE = "sqlite-default"
+BASELINE_SETTINGS = {
+    "cache_size": -2000,
+    "mmap_size": 0,
+    "synchronous": "FULL",
+    "temp_store": "DEFAULT",
+    "busy_timeout": 5000
+}
+PAGE_SCROLL_ROWS = 10000
+START_DATE = date(2019, 1, 1)
+
+
+def _percentile(values: List[float], share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def _booking_rows(rng: random.Random, rooms: int, guests: int, count: int,
+                  first_day: int, last_day: int, today_day: int):
+    """
+    Брони со случайными датами заезда в [first_day, last_day].
+    Пересечения по номеру не исключаются - для замеров хранения это неважно.
+    """
+    for _ in range(count):
+        check_in = rng.randint(first_day, last_day)
+        nights = rng.randint(1, 7)
+        check_out = check_in + nights
+        if check_out > today_day:
+            status = Database.BOOKING_STATUS_ACTIVE
+        elif rng.random() < 0.1:
+            status = Database.BOOKING_STATUS_CANCELLED
+        else:
+            status = Database.BOOKING_STATUS_COMPLETED
+        room_id = rng.randint(1, rooms)
+        yield (
+            room_id,
+            rng.randint(1, guests),
+            day_to_date(check_in).isoformat(),
+            day_to_date(check_out).isoformat(),
+            nights * 100.0 * (1 + room_id % 5),
+            status
+        )
+
+
+def generate_dataset(db_file: str, rooms: int, guests: int, bookings: int, seed: int = 1):
+    """
+    Синтетическая БД (загружается в профиле bulk-import)
+    Брони вставляются напрямую, поэтому их ночи в nightly_revenue
+    раскладываются отдельно - иначе отчеты о выручке читали бы пустую таблицу
+    """
+    rng = random.Random(seed)
+    db = Database(db_file)
+    try:
+        with db.use_storage_profile("bulk-import"):
+            db.conn.executemany(
+                "INSERT INTO rooms (number, type, price_per_night, status, created_at) "
+                "VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)",
+                [
+                    (str(100 + i), AppConfig.ROOM_TYPES[i % len(AppConfig.ROOM_TYPES)],
+                     100.0 * (1 + i % 5), Database.ROOM_STATUS_FREE)
+                    for i in range(1, rooms + 1)
+                ]
+            )
+            db.conn.executemany(
+                "INSERT INTO guests (full_name, phone_number, email, created_at) "
+                "VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
+                [(f"Гость {i}", f"+7900{i:07d}", f"guest{i}@example.com") for i in range(1, guests + 1)]
+            )
+            today = date_to_day(date.today())
+            rows = _booking_rows(rng, rooms, guests, bookings,
+                                 date_to_day(START_DATE), today + 180, today)
+            while True:
+                batch = [row for _, row in zip(range(10000), rows)]
+                if not batch:
+                    break
+                db.conn.executemany(
+                    "INSERT INTO bookings (room_id, guest_id, check_in_date, check_out_date, "
+                    "total_price, status, created_at) VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
+                    batch
+                )
+            rebuild_nightly_revenue(db.conn)
+            db.conn.commit()
+    finally:
+        db.close()
+
+
+def bench_import(db_file: str, profile: str, count: int) -> float:
+    """Строк в секунду при вставке порциями (с выручкой по ночам, как в приложении)"""
+    rng = random.Random(2)
+    db = Database(db_file, storage_profile=profile)
+    try:
+        rooms = db.count_rooms()
+        guests = db.count_guests()
+        today = date_to_day(date.today())
+        rows = list(_booking_rows(rng, rooms, guests, count, today, today + 365, today))
+        started = time.perf_counter()
+        for offset in range(0, len(rows), INSERT_BATCH):
+            last_id = db.conn.execute("SELECT COALESCE(MAX(id), 0) FROM bookings").fetchone()[0]
+            batch = rows[offset:offset + INSERT_BATCH]
+            db.conn.executemany(
+                "INSERT INTO bookings (room_id, guest_id, check_in_date, check_out_date, "
+                "total_price, status, created_at) VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
+                batch
+            )
+            refresh_nightly_revenue(db.conn, range(last_id + 1, last_id + len(batch) + 1))
+            db.conn.commit()
+        return count / (time.perf_counter() - started)
+    finally:
+        db.close()
+
+
+def bench_desk(db_file: str, profile: str, operations: int) -> Dict[str, float]:
+    """Задержки операций стойки (мс)"""
+    rng = random.Random(3)
+    db = Database(db_file, storage_profile=profile)
+    try:
+        rooms = db.count_rooms()
+        total = db.count_bookings()
+        # Создаваемые брони - после всех существующих, чтобы номер был свободен
+        last_day = db.conn.execute("SELECT MAX(co_day) FROM bookings").fetchone()[0]
+        check_in = day_to_date(last_day) + timedelta(days=1)
+        timings = []
+        for i in range(operations):
+            started = time.perf_counter()
+            kind = i % 4
+            if kind == 0:
+                # Прокрутка начала списка (глубокий OFFSET меряет не хранение, а сканирование)
+                db.get_bookings_page(rng.randint(0, min(total, PAGE_SCROLL_ROWS)), 50)
+            elif kind == 1:
+                db.get_bookings_page(0, 50, status=Database.BOOKING_STATUS_ACTIVE)
+            elif kind == 2:
+                db.get_dashboard_stats()
+            else:
+                room_id = rng.randint(1, rooms)
+                booking_id = db.create_booking(
+                    room_id, 1, check_in.isoformat(), (check_in + timedelta(days=1)).isoformat(), 100.0
+                )
+                if booking_id:
+                    db.cancel_booking(booking_id)
+                check_in += timedelta(days=2)
+            timings.append((time.perf_counter() - started) * 1000)
+        return {"p50": _percentile(timings, 0.5), "p99": _percentile(timings, 0.99)}
+    finally:
+        db.close()
+
+
+def bench_report(db_file: str, profile: str) -> Dict[str, float]:
+    """
+    Секунд на отчет: выгрузка (проход iter_booking_details и выручка по месяцам)
+    и агрегирующий скан всех броней с соединением справочников - только SQL
+    """
+    db = Database(db_file, storage_profile=profile)
+    try:
+        started = time.perf_counter()
+        for _ in db.iter_booking_details():
+            pass
+        year = date.today().year - 1
+        for month in range(1, 13):
+            start = date(year, month, 1)
+            end = date(year + month // 12, month % 12 + 1, 1)
+            db.get_revenue_stats(start.isoformat(), end.isoformat())
+        report = time.perf_counter() - started
+
+        started = time.perf_counter()
+        db.conn.execute("""
+            SELECT r.type, g.email IS NULL, COUNT(*), SUM(b.total_price)
+            FROM bookings b
+            JOIN rooms r ON r.id = b.room_id
+            JOIN guests g ON g.id = b.guest_id
+            GROUP BY 1, 2
+        """).fetchall()
+        return {"report": report, "scan": time.perf_counter() - started}
+    finally:
+        db.close()
+
+
+def run_benchmark(base_file: str, profiles, import_rows: int, operations: int) -> List[Dict]:
+    results = []
+    work_dir = os.path.dirname(base_file)
+    for profile in profiles:
+        # Пишущие нагрузки - на свежей копии, чтобы профили были в равных условиях
+        work_file = os.path.join(work_dir, f"work_{profile}.db")
+        shutil.copyfile(base_file, work_file)
+        result = {"profile": profile}
+        result["import_rows_per_second"] = bench_import(work_file, profile, import_rows)
+        shutil.copyfile(base_file, work_file)
+        desk = bench_desk(work_file, profile, operations)
+        result["desk_p50_ms"] = desk["p50"]
+        result["desk_p99_ms"] = desk["p99"]
+        report = bench_report(work_file, profile)
+        result["report_seconds"] = report["report"]
+        result["scan_seconds"] = report["scan"]
+        os.remove(work_file)
+        results.append(result)
+    return results
+
+
+def format_results(results: List[Dict]) -> str:
+    lines = [
+        f"{'профиль':<15} {'импорт, строк/с':>16} {'стойка p50, мс':>15} "
+        f"{'стойка p99, мс':>15} {'отчет, с':>9} {'скан, с':>8}"
+    ]
+    for r in results:
+        lines.append(
+            f"{r['profile']:<15} {r['import_rows_per_second']:>16.0f} {r['desk_p50_ms']:>15.2f} "
+            f"{r['desk_p99_ms']:>15.2f} {r['report_seconds']:>9.2f} {r['scan_seconds']:>8.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    # Сообщения Database о каждой операции искажают замеры
+    logging.disable(logging.INFO)
+    parser = argparse.ArgumentParser(description="Сравнение профилей хранения")
+    parser.add_argument("--rooms", type=int, default=200)
+    parser.add_argument("--guests", type=int, default=50000)
+    parser.add_argument("--bookings", type=int, default=1000000)
+    parser.add_argument("--import-rows", type=int, default=20000,
+                        help="броней во вставке порциями")
+    parser.add_argument("--operations", type=int, default=400,
+                        help="операций стойки на профиль")
+    profiles = [BASELINE_PROFILE] + list(AppConfig.STORAGE_PROFILES)
+    parser.add_argument("--profiles", nargs="+", choices=profiles, default=profiles)
+    parser.add_argument("--dir", help="каталог для временных БД (по умолчанию системный)")
+    args = parser.parse_args(argv)
+    AppConfig.STORAGE_PROFILES.setdefault(BASELINE_PROFILE, BASELINE_SETTINGS)
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as work_dir:
+        base_file = os.path.join(work_dir, "base.db")
+        started = time.perf_counter()
+        generate_dataset(base_file, args.rooms, args.guests, args.bookings)
+        print(
+            f"Данные: номеров {args.rooms}, гостей {args.guests}, броней {args.bookings}, "
+            f"{os.path.getsize(base_file) / 1024 / 1024:.0f} МБ "
+            f"за {time.perf_counter() - started:.1f} с"
+        )
+        results = run_benchmark(base_file, args.profiles, args.import_rows, args.operations)
+    print(format_results(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Кэши для чтения из БД
+Инвалидация выполняется владельцем кэша (Database) по событиям изменений
+"""
+from collections import OrderedDict
+from typing import Dict
+
+
+class LRUCache:
+    """Ограниченный кэш с вытеснением давно не использованных записей"""
+    _MISSING = object()
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        value = self.data.get(key, self._MISSING)
+        if value is self._MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        self.data.pop(key, None)
+
+    def clear(self):
+        self.data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self.data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+class VersionedSnapshot:
+    """
+    Снимок целого набора данных (например, каталога номеров).
+    Действителен, пока версия источника совпадает с версией снимка.
+    """
+    def __init__(self):
+        self.version = 0           # текущая версия источника
+        self.value = None
+        self.value_version = None  # версия, на которой снят снимок
+        self.hits = 0
+        self.misses = 0
+
+    def get(self):
+        """Снимок или None, если он устарел"""
+        if self.value is not None and self.value_version == self.version:
+            self.hits += 1
+            return self.value
+        self.misses += 1
+        return None
+
+    def set(self, value):
+        self.value = value
+        self.value_version = self.version
+
+    def invalidate(self):
+        """Источник изменился"""
+        self.version += 1
+        self.value = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses
+        }
@@ -17,6 +17,107 @@ class AppConfig:
     ASSETS_PATH = "assets/images/"
     LOGS_PATH = "logs/"
     
+    # Максимальный возраст снимка, в котором выполняется отчет (с), см. Database.read_snapshot.
+    # Снимок открывается только в режиме WAL: с журналом отката он задержал бы запись
+    REPORT_SNAPSHOT_MAX_AGE = 300
+    
+    # Профили хранения: PRAGMA соединений Database (см. Database.apply_storage_profile)
+    # cache_size < 0 - размер в КиБ, mmap_size - в байтах, busy_timeout - в мс
+    # journal_mode - режим журнала файла, задается при открытии БД (без ключа - не меняется)
+    STORAGE_PROFILE = "desk"
+    STORAGE_PROFILES = {
+        # Работа за стойкой: короткие транзакции, каждая надежно записана на диск.
+        # Журнал отката (DELETE) безопасен и для файла на сетевом диске,
+        # с которым работают несколько терминалов
+        "desk": {
+            "cache_size": -16384,
+            "mmap_size": 256 * 1024 * 1024,
+            "synchronous": "FULL",
+            "temp_store": "MEMORY",
+            "busy_timeout": 5000,
+            "journal_mode": "DELETE"
+        },
+        # Стойка с БД на локальном диске, все процессы на одной машине:
+        # в WAL отчеты и выгрузки не блокируют запись. На сетевом диске WAL
+        # может повредить БД, поэтому там Database оставляет DELETE
+        "desk-local": {
+            "cache_size": -16384,
+            "mmap_size": 256 * 1024 * 1024,
+            "synchronous": "FULL",
+            "temp_store": "MEMORY",
+            "busy_timeout": 5000,
+            "journal_mode": "WAL"
+        },
+        # Массовая загрузка: крупный кэш, без fsync после каждой транзакции
+        "bulk-import": {
+            "cache_size": -131072,
+            "mmap_size": 256 * 1024 * 1024,
+            "synchronous": "OFF",
+            "temp_store": "MEMORY",
+            "busy_timeout": 30000
+        },
+        # Отчеты и выгрузки: чтение всего файла через отображение в память
+        "reporting": {
+            "cache_size": -65536,
+            "mmap_size": 1024 * 1024 * 1024,
+            "synchronous": "FULL",
+            "temp_store": "MEMORY",
+            "busy_timeout": 5000
+        }
+    }
+    
+    # Архив завершенных и отмененных броней (см. archive.py)
+    ARCHIVE_FILE = "hotel_archive.db"
+    ARCHIVE_AFTER_DAYS = 365   # переносить брони с выездом старше N дней
+    ARCHIVE_BATCH_SIZE = 500   # броней на одну транзакцию
+    
+    # Онлайн-резервное копирование (см. backup.py)
+    BACKUP_DIR = "backups/"
+    BACKUP_KEEP = 7                # сколько последних снимков хранить
+    BACKUP_INTERVAL_HOURS = 24
+    BACKUP_PAGES_PER_STEP = 256    # страниц за шаг backup API
+    BACKUP_STEP_SLEEP = 0.005      # пауза между шагами (с)
+    BACKUP_MAX_RESTARTS = 3        # перезапусков из-за записи других соединений до отсрочки
+    BACKUP_RETRY_MINUTES = 30      # через сколько повторить отложенное копирование
+    
+    # Обслуживание БД в простое (см. maintenance.py)
+    MAINTENANCE_IDLE_SECONDS = 120     # без нажатий и кликов перед запуском
+    MAINTENANCE_INTERVAL_HOURS = 6
+    MAINTENANCE_TASK_SECONDS = 30      # лимит времени на задачу
+    MAINTENANCE_VACUUM_PAGES = 256     # страниц за шаг incremental_vacuum
+    MAINTENANCE_STEP_SLEEP = 0.05      # пауза между шагами (с)
+    
+    # Цены предложений (см. quotes.py)
+    # Множитель цены номера за ночь по сезону utils.get_season
+    # (для ночей без тарифа, см. Database.set_rates)
+    SEASON_MULTIPLIERS = {
+        "Зима": 1.0,
+        "Весна": 1.0,
+        "Лето": 1.0,
+        "Осень": 1.0
+    }
+    
+    # Динамические цены (см. pricing.py): множитель спроса по загрузке типа номера
+    PRICING_ENABLED = True
+    PRICING_INTERVAL_HOURS = 6
+    PRICING_HORIZON_DAYS = 365
+    PRICING_EARLY_DAYS = 60    # дальше - без понижения цены (брони еще не набраны)
+    # Кривая спроса: точки (загрузка 0..1, множитель), между ними - линейно;
+    # свою кривую можно задать для типа номера по его названию
+    PRICING_DEMAND_CURVES = {
+        "default": [(0.0, 0.9), (0.4, 1.0), (0.7, 1.1), (0.9, 1.25), (1.0, 1.4)]
+    }
+    
+    # Моделирование перебронирования (см. simulation.py)
+    SIMULATION_HISTORY_DAYS = 365   # окно истории для калибровки
+    SIMULATION_NIGHTS = 30          # горизонт по умолчанию
+    SIMULATION_MAX_NIGHTS = 365
+    SIMULATION_SCENARIOS = 10000
+    SIMULATION_WALK_COST_ADR = 1.5  # стоимость переселения гостя в средних ценах ночи
+    
+    # Интервал проверки изменений от других терминалов (мс)
+    CHANGE_POLL_MS = 500
+    
     # Темы
     APPEARANCE_MODE = "System"  # "System", "Dark", "Light"
     COLOR_THEME = "blue"  # "blue", "green", "dark-blue"
@@ -1,8 +1,18 @@
+import os
 import sqlite3
+import time
+from contextlib import contextmanager
 from datetime import date
-from typing import Optional, List, Tuple, Dict
+from pathlib import Path
+from typing import Optional, List, Tuple, Dict, Iterator, Set
 import logging
 
+from cache import LRUCache, VersionedSnapshot
+from config import AppConfig
+from models import Room, Guest, Booking, BookingDetails
+from revenue import rebuild_nightly_revenue, refresh_nightly_revenue
+from utils import date_to_day, day_to_date, is_network_path, season_multipliers_by_month
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,6 +23,37 @@ class DatabaseError(Exception):
     pass
 
 
+class SnapshotExpired(DatabaseError):
+    """Снимок для отчета старше допустимого - отчет нужно перезапустить"""
+    pass
+
+
+class ChangeEvent:
+    """Событие изменения данных: сущность, действие и ID затронутых записей"""
+    __slots__ = ("entity", "action", "ids", "external")
+    
+    # Сущности
+    ROOM = "room"
+    GUEST = "guest"
+    BOOKING = "booking"
+    RATE = "rate"  # тарифы (ids - номера с собственными ценами, пусто для типа)
+    ENTITIES = (ROOM, GUEST, BOOKING, RATE)
+    
+    # Действия
+    INSERT = "insert"
+    UPDATE = "update"
+    DELETE = "delete"
+    
+    def __init__(self, entity: str, action: str, ids, external: bool = False):
+        self.entity = entity
+        self.action = action
+        self.ids = frozenset(ids)
+        self.external = external  # изменение сделано другим процессом
+    
+    def __repr__(self):
+        return f"ChangeEvent({self.entity}, {self.action}, {sorted(self.ids)})"
+
+
 class Database:
     # Константы для статусов
     ROOM_STATUS_FREE = "Свободен"
@@ -24,18 +65,171 @@ class Database:
     BOOKING_STATUS_COMPLETED = "Завершено"
     BOOKING_STATUS_CANCELLED = "Отменено"
     
-    def __init__(self, db_file="hotel.db"):
+    # Допустимые колонки сортировки для постраничных запросов
+    GUEST_SORT_COLUMNS = {
+        "id": "id",
+        "full_name": "full_name",
+        "phone": "phone_number",
+        "email": "email"
+    }
+    BOOKING_SORT_COLUMNS = {
+        "id": "b.id",
+        "room": "r.number",
+        "guest": "g.full_name",
+        "check_in": "b.ci_day",
+        "check_out": "b.co_day",
+        "total": "b.total_price",
+        "status": "b.status"
+    }
+    # Сортировка по колонке номера или гостя: соединение начинается с этой
+    # таблицы (CROSS JOIN фиксирует порядок), ее индекс задает порядок строк
+    BOOKING_SORT_JOINS = {
+        "room": "rooms r CROSS JOIN bookings b ON b.room_id = r.id "
+                "JOIN guests g ON b.guest_id = g.id",
+        "guest": "guests g CROSS JOIN bookings b ON b.guest_id = g.id "
+                 "JOIN rooms r ON b.room_id = r.id"
+    }
+    BOOKING_JOIN = "bookings b JOIN rooms r ON b.room_id = r.id JOIN guests g ON b.guest_id = g.id"
+    
+    # Таблицы, изменения которых пишутся в журнал changelog
+    # Таблица -> (сущность журнала, колонка ID записи). У тарифов нет id:
+    # запись журнала указывает день, реплика получает все строки этого дня
+    # (см. replication.py). Тарифы - не события шины: о них сообщает одна
+    # запись ChangeEvent.RATE на операцию (_log_rate_change)
+    CHANGELOG_TABLES = {
+        "rooms": (ChangeEvent.ROOM, "id"),
+        "guests": (ChangeEvent.GUEST, "id"),
+        "bookings": (ChangeEvent.BOOKING, "id"),
+        "type_rates": ("type_rate", "day"),
+        "room_rates": ("room_rate", "day"),
+        "demand_factors": ("demand", "day")
+    }
+    # Сколько последних записей журнала сохраняет обслуживание (maintenance.py);
+    # записи, еще не подтвержденные репликами, сохраняются и сверх этого
+    CHANGELOG_KEEP = 10000
+    
+    # Размер порции fetchmany для потокового чтения
+    ITER_CHUNK_SIZE = 1000
+    
+    # Версия схемы (PRAGMA user_version), см. _migrate
+    SCHEMA_VERSION = 7
+    
+    # Таблицы тарифов: цена ночи для типа номера или для конкретного номера
+    RATE_TABLES = {
+        "room_type": "type_rates",
+        "room_id": "room_rates"
+    }
+    
+    # Цена каждой ночи [первый день, день выезда) номера: своя цена номера,
+    # иначе цена его типа, иначе price_per_night с множителями сезона и спроса
+    # (demand_factors, см. pricing.py).
+    # Параметры: первый день, день выезда, 12 множителей по месяцам, ID номера
+    NIGHTLY_RATES_SQL = """
+        WITH RECURSIVE nights(day) AS (
+            SELECT ? UNION ALL SELECT day + 1 FROM nights WHERE day + 1 < ?
+        ),
+        season(month, factor) AS (VALUES {season})
+        SELECT n.day, COALESCE(
+            rr.price, tr.price, r.price_per_night * s.factor * COALESCE(df.factor, 1.0)
+        ) AS price
+        FROM rooms r
+        CROSS JOIN nights n
+        JOIN season s ON s.month = CAST(strftime('%m', n.day * 86400, 'unixepoch') AS INTEGER)
+        LEFT JOIN room_rates rr ON rr.room_id = r.id AND rr.day = n.day
+        LEFT JOIN type_rates tr ON tr.room_type = r.type AND tr.day = n.day
+        LEFT JOIN demand_factors df ON df.room_type = r.type AND df.day = n.day
+        WHERE r.id = ?
+    """.format(season=", ".join(f"({month}, ?)" for month in range(1, 13)))
+    
+    # Номер дня (дней от 1970-01-01) для даты 'ГГГГ-ММ-ДД' - см. utils.date_to_day
+    DAY_NUMBER_SQL = "CAST(julianday({}) - 2440587.5 AS INTEGER)"
+    
+    # Строк индекса, просматриваемых ANALYZE (PRAGMA analysis_limit)
+    ANALYSIS_LIMIT = 1000
+    
+    # Размеры кэшей поиска по ID
+    ROOM_CACHE_SIZE = 256
+    GUEST_CACHE_SIZE = 1024
+    
+    # PRAGMA профиля хранения в порядке применения (см. AppConfig.STORAGE_PROFILES)
+    STORAGE_PRAGMAS = ("busy_timeout", "cache_size", "mmap_size", "synchronous", "temp_store")
+    
+    # Колонки бронирования, общие для основной и архивной таблиц
+    BOOKING_COLUMNS = (
+        "id, room_id, guest_id, check_in_date, check_out_date, "
+        "total_price, status, created_at"
+    )
+    
+    def __init__(self, db_file="hotel.db", archive_file=None, storage_profile=None,
+                 read_only=False):
+        self.db_file = db_file
+        # Только чтение (mode=ro): схема не создается и не обновляется, журнал не трогается
+        self.read_only = read_only
+        self.archive_file = None
+        self.storage_profile = storage_profile or AppConfig.STORAGE_PROFILE
+        # Таблица броней для отчетов: bookings или all_bookings с архивом
+        self._report_bookings = "bookings"
+        self._search_conn = None
+        self._subscribers = []
+        self._last_seq = 0        # последняя обработанная запись журнала
+        self._data_version = None  # PRAGMA data_version на момент проверки
+        self._room_cache = LRUCache(self.ROOM_CACHE_SIZE)
+        self._guest_cache = LRUCache(self.GUEST_CACHE_SIZE)
+        self._rooms_snapshot = VersionedSnapshot()
+        self._backfill_archive_revenue = False  # см. _migrate, версия 5
+        self._snapshot_started = None  # время начала транзакции чтения read_snapshot
+        self._snapshot_max_age = None
+        self.journal_mode = None  # режим журнала файла БД (delete, wal, ...)
         try:
-            self.conn = sqlite3.connect(db_file, check_same_thread=False)
+            if read_only:
+                self.conn = sqlite3.connect(self._read_only_uri(db_file), uri=True,
+                                            check_same_thread=False)
+            else:
+                self.conn = sqlite3.connect(db_file, check_same_thread=False)
             # Убираем row_factory чтобы возвращались обычные tuples
             # self.conn.row_factory = sqlite3.Row
             self.cursor = self.conn.cursor()
-            self._create_tables()
+            settings = self._get_storage_settings(self.storage_profile)
+            self._apply_pragmas(self.conn, settings)
+            if read_only:
+                self._check_schema_version()
+            else:
+                if "journal_mode" in settings:
+                    self._set_journal_mode(settings["journal_mode"])
+                self._create_tables()
+                self._init_changelog_position()
+            self.cursor.execute("PRAGMA journal_mode")
+            self.journal_mode = self.cursor.fetchone()[0].lower()
+            if archive_file and os.path.exists(archive_file):
+                self.attach_archive(archive_file)
             logger.info(f"Подключение к БД '{db_file}' успешно")
         except sqlite3.Error as e:
             logger.error(f"Ошибка подключения к БД: {e}")
             raise DatabaseError(f"Не удалось подключиться к базе данных: {e}")
 
+    def _set_journal_mode(self, mode: str):
+        """
+        Режим журнала из профиля хранения. WAL требует общей памяти всех
+        процессов, поэтому для файла на сетевом диске остается журнал отката
+        (DELETE). Смена режима не удается, пока файл открыт другими процессами
+        - тогда режим остается прежним.
+        """
+        mode = mode.upper()
+        if mode == "WAL" and is_network_path(self.db_file):
+            logger.warning(
+                f"БД '{self.db_file}' на сетевом диске: WAL может повредить файл, "
+                "используется журнал DELETE"
+            )
+            mode = "DELETE"
+        try:
+            self.cursor.execute(f"PRAGMA journal_mode = {mode}")
+            current = self.cursor.fetchone()[0].upper()
+        except sqlite3.Error as e:
+            logger.warning(f"Не удалось включить режим журнала {mode}: {e}")
+            return
+        if current != mode:
+            logger.warning(f"Режим журнала {current} вместо {mode}: БД открыта другими процессами")
+
     def _create_tables(self):
         """Создание таблиц с индексами для оптимизации"""
         try:
@@ -63,7 +257,7 @@ class Database:
                 );
             """)
             
-            # Таблица бронирований
+            # Таблица бронирований (ci_day/co_day - даты как номера дней)
             self.cursor.execute("""
                 CREATE TABLE IF NOT EXISTS bookings (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -74,25 +268,122 @@ class Database:
                     total_price REAL NOT NULL CHECK(total_price >= 0),
                     status TEXT NOT NULL DEFAULT 'Активно',
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    ci_day INTEGER GENERATED ALWAYS AS ({ci_day}) VIRTUAL,
+                    co_day INTEGER GENERATED ALWAYS AS ({co_day}) VIRTUAL,
                     FOREIGN KEY (room_id) REFERENCES rooms (id) ON DELETE CASCADE,
                     FOREIGN KEY (guest_id) REFERENCES guests (id) ON DELETE CASCADE,
                     CHECK(check_out_date > check_in_date)
                 );
+            """.format(
+                ci_day=self.DAY_NUMBER_SQL.format("check_in_date"),
+                co_day=self.DAY_NUMBER_SQL.format("check_out_date")
+            ))
+            
+            # Выручка по ночам проживания в копейках (см. revenue.py)
+            self.cursor.execute("""
+                CREATE TABLE IF NOT EXISTS nightly_revenue (
+                    day INTEGER NOT NULL,
+                    booking_id INTEGER NOT NULL,
+                    gross INTEGER NOT NULL,
+                    discount INTEGER NOT NULL,
+                    PRIMARY KEY (day, booking_id)
+                ) WITHOUT ROWID;
+            """)
+            self.cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_nightly_revenue_booking 
+                ON nightly_revenue(booking_id);
+            """)
+            
+            # Тарифы по ночам (номер дня): для типа номера и для отдельного номера.
+            # Ночь без тарифа стоит rooms.price_per_night (см. NIGHTLY_RATES_SQL)
+            self.cursor.execute("""
+                CREATE TABLE IF NOT EXISTS type_rates (
+                    room_type TEXT NOT NULL,
+                    day INTEGER NOT NULL,
+                    price REAL NOT NULL CHECK(price > 0),
+                    PRIMARY KEY (room_type, day)
+                ) WITHOUT ROWID;
+            """)
+            self.cursor.execute("""
+                CREATE TABLE IF NOT EXISTS room_rates (
+                    room_id INTEGER NOT NULL,
+                    day INTEGER NOT NULL,
+                    price REAL NOT NULL CHECK(price > 0),
+                    PRIMARY KEY (room_id, day)
+                ) WITHOUT ROWID;
             """)
+            # Множители спроса по типам номеров (pricing.py); нет строки - множитель 1
+            self.cursor.execute("""
+                CREATE TABLE IF NOT EXISTS demand_factors (
+                    room_type TEXT NOT NULL,
+                    day INTEGER NOT NULL,
+                    factor REAL NOT NULL CHECK(factor > 0),
+                    PRIMARY KEY (room_type, day)
+                ) WITHOUT ROWID;
+            """)
+            
+            self._migrate()
             
             # Индексы для ускорения запросов
             self.cursor.execute("""
                 CREATE INDEX IF NOT EXISTS idx_rooms_status 
                 ON rooms(status);
             """)
+            # Проверка доступности номера
+            self.cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_bookings_room_days 
+                ON bookings(room_id, status, ci_day, co_day);
+            """)
+            # Заезды/выезды за день, доходы за период, список с фильтром по статусу
+            # (ORDER BY ci_day, id идет по индексу - id входит в него как rowid)
+            self.cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_bookings_status_ci 
+                ON bookings(status, ci_day);
+            """)
+            self.cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_bookings_status_co 
+                ON bookings(status, co_day);
+            """)
+            # Сортировка полного списка по датам
             self.cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_bookings_dates 
-                ON bookings(check_in_date, check_out_date);
+                CREATE INDEX IF NOT EXISTS idx_bookings_ci 
+                ON bookings(ci_day);
             """)
             self.cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_bookings_status 
-                ON bookings(status);
+                CREATE INDEX IF NOT EXISTS idx_bookings_co 
+                ON bookings(co_day);
+            """)
+            # Остальные сортировки списка броней (BOOKING_SORT_COLUMNS) с фильтром
+            # по статусу и без: страница читается по индексу, без сортировки всей таблицы
+            for name, columns in (("status", "status"),
+                                  ("total", "total_price"),
+                                  ("status_total", "status, total_price"),
+                                  ("room_status", "room_id, status"),
+                                  ("guest_status", "guest_id, status")):
+                self.cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_bookings_{name} ON bookings({columns})"
+                )
+            
+            # Журнал изменений для других процессов, работающих с тем же файлом
+            self.cursor.execute("""
+                CREATE TABLE IF NOT EXISTS changelog (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    entity TEXT NOT NULL,
+                    entity_id INTEGER NOT NULL,
+                    op TEXT NOT NULL,
+                    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
             """)
+            for table, (entity, key) in self.CHANGELOG_TABLES.items():
+                for op, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+                    self.cursor.execute(f"""
+                        CREATE TRIGGER IF NOT EXISTS trg_{table}_{op.lower()}_changelog
+                        AFTER {op} ON {table}
+                        BEGIN
+                            INSERT INTO changelog (entity, entity_id, op)
+                            VALUES ('{entity}', {row}.{key}, '{op.lower()}');
+                        END;
+                    """)
             
             self.conn.commit()
             logger.info("Таблицы и индексы успешно созданы/проверены")
@@ -100,6 +391,114 @@ class Database:
             logger.error(f"Ошибка создания таблиц: {e}")
             raise DatabaseError(f"Не удалось создать таблицы: {e}")
 
+    def _migrate(self):
+        """Обновление схемы БД, созданной прошлыми версиями, по PRAGMA user_version"""
+        self.cursor.execute("PRAGMA user_version")
+        version = self.cursor.fetchone()[0]
+        
+        if version < 1:
+            # Ранние версии создавали таблицы без created_at
+            for table in ("rooms", "guests", "bookings"):
+                self.cursor.execute(f"PRAGMA table_info({table})")
+                if "created_at" not in [row[1] for row in self.cursor.fetchall()]:
+                    self.cursor.execute(f"ALTER TABLE {table} ADD COLUMN created_at TIMESTAMP")
+                    logger.info(f"Миграция: в таблицу {table} добавлена колонка created_at")
+        
+        if version < 2:
+            # Даты броней как номера дней: целочисленные сравнения и индексы
+            self.cursor.execute("PRAGMA table_xinfo(bookings)")
+            columns = [row[1] for row in self.cursor.fetchall()]
+            for column, source in (("ci_day", "check_in_date"), ("co_day", "check_out_date")):
+                if column not in columns:
+                    self.cursor.execute(
+                        f"""ALTER TABLE bookings ADD COLUMN {column} INTEGER 
+                            GENERATED ALWAYS AS ({self.DAY_NUMBER_SQL.format(source)}) VIRTUAL"""
+                    )
+            # Текстовые индексы заменены индексами по номерам дней
+            self.cursor.execute("DROP INDEX IF EXISTS idx_bookings_dates")
+            self.cursor.execute("DROP INDEX IF EXISTS idx_bookings_status")
+            logger.info("Миграция: добавлены колонки ci_day/co_day")
+        
+        if version < 3:
+            # Составные индексы по двум датам не давали сортировку ORDER BY день, id
+            self.cursor.execute("DROP INDEX IF EXISTS idx_bookings_status_days")
+            self.cursor.execute("DROP INDEX IF EXISTS idx_bookings_days")
+        
+        if version < 4:
+            # Свободные страницы возвращаются обслуживанием по частям (maintenance.py).
+            # Режим auto_vacuum существующего файла меняется только полным VACUUM
+            self.cursor.execute("PRAGMA auto_vacuum")
+            if self.cursor.fetchone()[0] != 2:
+                self.cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                self.conn.commit()
+                self.cursor.execute("VACUUM")
+                logger.info("Миграция: включен auto_vacuum = INCREMENTAL")
+        
+        if version < 5:
+            # Выручка раньше относилась целиком к дате заезда - раскладываем по ночам.
+            # Архив (если есть) дозаполняется при подключении
+            count = rebuild_nightly_revenue(self.conn)
+            self._backfill_archive_revenue = True
+            logger.info(f"Миграция: выручка разложена по ночам для броней: {count}")
+        
+        # Версия 6: таблицы тарифов type_rates/room_rates (создаются пустыми выше)
+        # Версия 7: множители спроса demand_factors (заполняет pricing.py)
+        
+        if version < self.SCHEMA_VERSION:
+            self.cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    @staticmethod
+    def _read_only_uri(db_file: str) -> str:
+        if not os.path.exists(db_file):
+            raise sqlite3.OperationalError(f"файл '{db_file}' не найден")
+        return Path(db_file).resolve().as_uri() + "?mode=ro"
+
+    def _check_schema_version(self):
+        """Соединение только для чтения не может обновить схему - нужна актуальная"""
+        self.cursor.execute("PRAGMA user_version")
+        version = self.cursor.fetchone()[0]
+        if version < self.SCHEMA_VERSION:
+            raise sqlite3.OperationalError(
+                f"схема версии {version}, требуется {self.SCHEMA_VERSION} - "
+                "откройте БД в приложении для обновления"
+            )
+
+    def _fetch_all(self, record, query: str, params=(), conn=None) -> list:
+        """Выполнение запроса с построением записей через row_factory курсора"""
+        cursor = (conn or self.conn).cursor()
+        cursor.row_factory = record.row_factory
+        try:
+            return cursor.execute(query, params).fetchall()
+        finally:
+            cursor.close()
+
+    def _fetch_one(self, record, query: str, params=()):
+        cursor = self.conn.cursor()
+        cursor.row_factory = record.row_factory
+        try:
+            return cursor.execute(query, params).fetchone()
+        finally:
+            cursor.close()
+
+    def _fetch_iter(self, record, query: str, params=(), chunk_size: Optional[int] = None) -> Iterator:
+        """
+        Потоковое чтение записей порциями fetchmany из отдельного курсора.
+        Курсор закрывается и при досрочном прекращении обхода (close генератора)
+        """
+        cursor = self.conn.cursor()
+        cursor.row_factory = record.row_factory
+        cursor.arraysize = chunk_size or self.ITER_CHUNK_SIZE
+        try:
+            cursor.execute(query, params)
+            while True:
+                self.check_snapshot()
+                rows = cursor.fetchmany()
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+
     # --- Room Methods ---
     def add_room(self, number: str, r_type: str, price: float) -> bool:
         """Добавление нового номера"""
@@ -109,10 +508,13 @@ class Database:
                 return False
             
             self.cursor.execute(
-                "INSERT INTO rooms (number, type, price_per_night, status) VALUES (?, ?, ?, ?)",
+                """INSERT INTO rooms (number, type, price_per_night, status, created_at) 
+                   VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)""",
                 (number.strip(), r_type.strip(), price, self.ROOM_STATUS_FREE)
             )
+            room_id = self.cursor.lastrowid
             self.conn.commit()
+            self._emit(ChangeEvent(ChangeEvent.ROOM, ChangeEvent.INSERT, (room_id,)))
             logger.info(f"Номер '{number}' успешно добавлен")
             return True
         except sqlite3.IntegrityError:
@@ -123,32 +525,92 @@ class Database:
             self.conn.rollback()
             return False
 
-    def get_all_rooms(self) -> List[Tuple]:
-        """Получение всех номеров"""
+    def get_all_rooms(self) -> List[Room]:
+        """Получение всех номеров (из снимка каталога, если он актуален)"""
+        rooms = self._rooms_snapshot.get()
+        if rooms is not None:
+            return list(rooms)
         try:
-            self.cursor.execute("SELECT * FROM rooms ORDER BY CAST(number AS INTEGER)")
-            return self.cursor.fetchall()
+            rooms = self._fetch_all(
+                Room, f"SELECT {Room.SELECT} FROM rooms ORDER BY CAST(number AS INTEGER)"
+            )
+            self._rooms_snapshot.set(tuple(rooms))
+            return rooms
         except sqlite3.Error as e:
             logger.error(f"Ошибка получения номеров: {e}")
             return []
 
-    def get_room_by_id(self, room_id: int) -> Optional[Tuple]:
+    def count_rooms(self) -> int:
+        """Общее количество номеров"""
+        try:
+            self.cursor.execute("SELECT COUNT(*) FROM rooms")
+            return self.cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка подсчета номеров: {e}")
+            return 0
+
+    def search_rooms_cancellable(self, query: str) -> Optional[List[Room]]:
+        """
+        Поиск номеров по номеру комнаты с возможностью прерывания
+        через interrupt_search(). Возвращает None, если запрос прерван
+        """
+        try:
+            return self._fetch_all(
+                Room,
+                f"""SELECT {Room.SELECT} FROM rooms 
+                    WHERE number LIKE ? ORDER BY CAST(number AS INTEGER)""",
+                (f"%{query}%",),
+                conn=self._get_search_conn()
+            )
+        except sqlite3.OperationalError as e:
+            if "interrupted" not in str(e):
+                logger.error(f"Ошибка поиска номеров: {e}")
+            return None
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка поиска номеров: {e}")
+            return None
+
+    def get_room_by_id(self, room_id: int) -> Optional[Room]:
         """Получение номера по ID"""
+        room = self._room_cache.get(room_id)
+        if room is not None:
+            return room
         try:
-            self.cursor.execute("SELECT * FROM rooms WHERE id = ?", (room_id,))
-            return self.cursor.fetchone()
+            room = self._fetch_one(Room, f"SELECT {Room.SELECT} FROM rooms WHERE id = ?", (room_id,))
+            if room is not None:
+                self._room_cache.put(room_id, room)
+            return room
         except sqlite3.Error as e:
             logger.error(f"Ошибка получения номера #{room_id}: {e}")
             return None
 
+    def _set_room_status(self, room_id: int, status: str):
+        """Смена статуса номера внутри текущей транзакции (без commit)"""
+        self.cursor.execute(
+            "UPDATE rooms SET status = ? WHERE id = ?", 
+            (status, room_id)
+        )
+
+    def get_rooms_by_ids(self, room_ids) -> List[Room]:
+        """Получение номеров по списку ID"""
+        room_ids = list(room_ids)
+        if not room_ids:
+            return []
+        try:
+            placeholders = ", ".join("?" * len(room_ids))
+            return self._fetch_all(
+                Room, f"SELECT {Room.SELECT} FROM rooms WHERE id IN ({placeholders})", room_ids
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка получения номеров: {e}")
+            return []
+
     def update_room_status(self, room_id: int, status: str) -> bool:
         """Обновление статуса номера"""
         try:
-            self.cursor.execute(
-                "UPDATE rooms SET status = ? WHERE id = ?", 
-                (status, room_id)
-            )
+            self._set_room_status(room_id, status)
             self.conn.commit()
+            self._emit(ChangeEvent(ChangeEvent.ROOM, ChangeEvent.UPDATE, (room_id,)))
             logger.info(f"Статус номера #{room_id} изменен на '{status}'")
             return True
         except sqlite3.Error as e:
@@ -156,6 +618,26 @@ class Database:
             self.conn.rollback()
             return False
 
+    def update_room(self, room_id: int, r_type: str, price: float, status: str) -> bool:
+        """Обновление типа, цены и статуса номера"""
+        try:
+            if not r_type or price <= 0:
+                logger.warning("Попытка сохранить номер с некорректными данными")
+                return False
+            
+            self.cursor.execute(
+                "UPDATE rooms SET type = ?, price_per_night = ?, status = ? WHERE id = ?",
+                (r_type.strip(), price, status, room_id)
+            )
+            self.conn.commit()
+            self._emit(ChangeEvent(ChangeEvent.ROOM, ChangeEvent.UPDATE, (room_id,)))
+            logger.info(f"Номер #{room_id} обновлен")
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка обновления номера: {e}")
+            self.conn.rollback()
+            return False
+
     def delete_room(self, room_id: int) -> bool:
         """Удаление номера (если нет активных броней)"""
         try:
@@ -169,7 +651,9 @@ class Database:
                 return False
             
             self.cursor.execute("DELETE FROM rooms WHERE id = ?", (room_id,))
+            self.cursor.execute("DELETE FROM room_rates WHERE room_id = ?", (room_id,))
             self.conn.commit()
+            self._emit(ChangeEvent(ChangeEvent.ROOM, ChangeEvent.DELETE, (room_id,)))
             logger.info(f"Номер #{room_id} удален")
             return True
         except sqlite3.Error as e:
@@ -186,11 +670,13 @@ class Database:
                 return None
             
             self.cursor.execute(
-                "INSERT INTO guests (full_name, phone_number, email) VALUES (?, ?, ?)",
+                """INSERT INTO guests (full_name, phone_number, email, created_at) 
+                   VALUES (?, ?, ?, CURRENT_TIMESTAMP)""",
                 (full_name.strip(), phone.strip(), email.strip())
             )
-            self.conn.commit()
             guest_id = self.cursor.lastrowid
+            self.conn.commit()
+            self._emit(ChangeEvent(ChangeEvent.GUEST, ChangeEvent.INSERT, (guest_id,)))
             logger.info(f"Гость '{full_name}' добавлен с ID {guest_id}")
             return guest_id
         except sqlite3.IntegrityError:
@@ -207,33 +693,111 @@ class Database:
             self.conn.rollback()
             return None
 
-    def get_all_guests(self) -> List[Tuple]:
+    def get_all_guests(self) -> List[Guest]:
         """Получение всех гостей"""
         try:
-            self.cursor.execute(
-                "SELECT id, full_name, phone_number, email FROM guests ORDER BY full_name"
-            )
-            return self.cursor.fetchall()
+            return self._fetch_all(Guest, f"SELECT {Guest.SELECT} FROM guests ORDER BY full_name")
         except sqlite3.Error as e:
             logger.error(f"Ошибка получения гостей: {e}")
             return []
 
-    def search_guests(self, query: str) -> List[Tuple]:
+    def search_guests(self, query: str) -> List[Guest]:
         """Поиск гостей по имени, телефону или email"""
         try:
             search_pattern = f"%{query}%"
-            self.cursor.execute(
-                """SELECT id, full_name, phone_number, email 
-                   FROM guests 
-                   WHERE full_name LIKE ? OR phone_number LIKE ? OR email LIKE ?
-                   ORDER BY full_name""",
+            return self._fetch_all(
+                Guest,
+                f"""SELECT {Guest.SELECT} 
+                    FROM guests 
+                    WHERE full_name LIKE ? OR phone_number LIKE ? OR email LIKE ?
+                    ORDER BY full_name""",
                 (search_pattern, search_pattern, search_pattern)
             )
-            return self.cursor.fetchall()
         except sqlite3.Error as e:
             logger.error(f"Ошибка поиска гостей: {e}")
             return []
 
+    def _guest_filter(self, query: str) -> Tuple[str, tuple]:
+        """Условие WHERE для поиска гостей"""
+        if not query:
+            return "", ()
+        search_pattern = f"%{query}%"
+        return (
+            "WHERE full_name LIKE ? OR phone_number LIKE ? OR email LIKE ?",
+            (search_pattern, search_pattern, search_pattern)
+        )
+
+    def count_guests(self, query: str = "") -> int:
+        """Количество гостей (с учетом поиска)"""
+        try:
+            where, params = self._guest_filter(query)
+            self.cursor.execute(f"SELECT COUNT(*) FROM guests {where}", params)
+            return self.cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка подсчета гостей: {e}")
+            return 0
+
+    def get_guests_page(self, offset: int, limit: int, query: str = "",
+                        order_by: str = "full_name", descending: bool = False) -> List[Guest]:
+        """Страница списка гостей для постраничного отображения"""
+        try:
+            where, params = self._guest_filter(query)
+            column = self.GUEST_SORT_COLUMNS.get(order_by, "full_name")
+            direction = "DESC" if descending else "ASC"
+            return self._fetch_all(
+                Guest,
+                f"""SELECT {Guest.SELECT} 
+                    FROM guests 
+                    {where}
+                    ORDER BY {column} {direction}, id {direction}
+                    LIMIT ? OFFSET ?""",
+                params + (limit, offset)
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка получения страницы гостей: {e}")
+            return []
+
+    # --- Прерываемый поиск (отдельное соединение для фонового потока) ---
+    def _get_search_conn(self) -> sqlite3.Connection:
+        """Соединение для поисковых запросов из фонового потока"""
+        if self._search_conn is None:
+            self._search_conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            self._apply_pragmas(self._search_conn, self._get_storage_settings(self.storage_profile))
+        return self._search_conn
+
+    def interrupt_search(self):
+        """Прерывание выполняющегося поискового запроса"""
+        if self._search_conn is not None:
+            self._search_conn.interrupt()
+
+    def search_guests_cancellable(self, query: str, limit: int = 500) -> Optional[Tuple[int, List[Guest]]]:
+        """
+        Поиск гостей с возможностью прерывания через interrupt_search()
+        Возвращает (всего найдено, первые limit строк) или None, если прерван
+        """
+        try:
+            conn = self._get_search_conn()
+            where, params = self._guest_filter(query)
+            total = conn.execute(f"SELECT COUNT(*) FROM guests {where}", params).fetchone()[0]
+            rows = self._fetch_all(
+                Guest,
+                f"""SELECT {Guest.SELECT} 
+                    FROM guests 
+                    {where}
+                    ORDER BY full_name, id
+                    LIMIT ?""",
+                params + (limit,),
+                conn=conn
+            )
+            return total, rows
+        except sqlite3.OperationalError as e:
+            if "interrupted" not in str(e):
+                logger.error(f"Ошибка поиска гостей: {e}")
+            return None
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка поиска гостей: {e}")
+            return None
+
     def update_guest(self, guest_id: int, full_name: str, phone: str = "", email: str = "") -> bool:
         """Обновление данных гостя"""
         try:
@@ -246,6 +810,7 @@ class Database:
                 (full_name.strip(), phone.strip(), email.strip(), guest_id)
             )
             self.conn.commit()
+            self._emit(ChangeEvent(ChangeEvent.GUEST, ChangeEvent.UPDATE, (guest_id,)))
             logger.info(f"Гость #{guest_id} обновлен")
             return True
         except sqlite3.Error as e:
@@ -267,6 +832,7 @@ class Database:
             
             self.cursor.execute("DELETE FROM guests WHERE id = ?", (guest_id,))
             self.conn.commit()
+            self._emit(ChangeEvent(ChangeEvent.GUEST, ChangeEvent.DELETE, (guest_id,)))
             logger.info(f"Гость #{guest_id} удален")
             return True
         except sqlite3.Error as e:
@@ -274,18 +840,36 @@ class Database:
             self.conn.rollback()
             return False
 
-    def get_guest_by_id(self, guest_id: int) -> Optional[Tuple]:
+    def get_guest_by_id(self, guest_id: int) -> Optional[Guest]:
         """Получение гостя по ID"""
+        guest = self._guest_cache.get(guest_id)
+        if guest is not None:
+            return guest
         try:
-            self.cursor.execute(
-                "SELECT id, full_name, phone_number, email FROM guests WHERE id = ?",
-                (guest_id,)
+            guest = self._fetch_one(
+                Guest, f"SELECT {Guest.SELECT} FROM guests WHERE id = ?", (guest_id,)
             )
-            return self.cursor.fetchone()
+            if guest is not None:
+                self._guest_cache.put(guest_id, guest)
+            return guest
         except sqlite3.Error as e:
             logger.error(f"Ошибка получения гостя #{guest_id}: {e}")
             return None
 
+    def get_guests_by_ids(self, guest_ids) -> List[Guest]:
+        """Получение гостей по списку ID"""
+        guest_ids = list(guest_ids)
+        if not guest_ids:
+            return []
+        try:
+            placeholders = ", ".join("?" * len(guest_ids))
+            return self._fetch_all(
+                Guest, f"SELECT {Guest.SELECT} FROM guests WHERE id IN ({placeholders})", guest_ids
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка получения гостей: {e}")
+            return []
+
     def get_guest_bookings_count(self, guest_id: int) -> Tuple[int, int]:
         """
         Получение статистики броней гостя
@@ -321,13 +905,18 @@ class Database:
             
             self.cursor.execute(
                 """INSERT INTO bookings 
-                   (room_id, guest_id, check_in_date, check_out_date, total_price, status) 
-                   VALUES (?, ?, ?, ?, ?, ?)""",
+                   (room_id, guest_id, check_in_date, check_out_date, total_price, status, created_at) 
+                   VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)""",
                 (room_id, guest_id, check_in, check_out, total_price, self.BOOKING_STATUS_ACTIVE)
             )
             booking_id = self.cursor.lastrowid
-            self.update_room_status(room_id, self.ROOM_STATUS_OCCUPIED)
+            refresh_nightly_revenue(self.conn, (booking_id,))
+            self._set_room_status(room_id, self.ROOM_STATUS_OCCUPIED)
             self.conn.commit()
+            self._emit(
+                ChangeEvent(ChangeEvent.BOOKING, ChangeEvent.INSERT, (booking_id,)),
+                ChangeEvent(ChangeEvent.ROOM, ChangeEvent.UPDATE, (room_id,))
+            )
             logger.info(f"Бронь #{booking_id} создана")
             return booking_id
         except sqlite3.Error as e:
@@ -338,41 +927,217 @@ class Database:
     def _is_room_available(self, room_id: int, check_in: str, check_out: str) -> bool:
         """Проверка доступности номера на указанные даты"""
         try:
+            # Пересечение периодов: заезд раньше нашего выезда, выезд позже нашего заезда
             self.cursor.execute(
-                """SELECT COUNT(*) FROM bookings 
-                   WHERE room_id = ? 
-                   AND status = ?
-                   AND NOT (check_out_date <= ? OR check_in_date >= ?)""",
-                (room_id, self.BOOKING_STATUS_ACTIVE, check_in, check_out)
+                """SELECT EXISTS(
+                       SELECT 1 FROM bookings 
+                       WHERE room_id = ? 
+                       AND status = ?
+                       AND ci_day < ?
+                       AND co_day > ?
+                   )""",
+                (room_id, self.BOOKING_STATUS_ACTIVE, date_to_day(check_out), date_to_day(check_in))
             )
             return self.cursor.fetchone()[0] == 0
-        except sqlite3.Error as e:
+        except (sqlite3.Error, ValueError) as e:
             logger.error(f"Ошибка проверки доступности: {e}")
             return False
 
-    def get_all_bookings(self) -> List[Tuple]:
+    def get_busy_room_ids(self, ci_day: int, co_day: int) -> Optional[Set[int]]:
+        """
+        ID номеров с активной бронью, пересекающей ночи [ci_day, co_day)
+        Возвращает None при ошибке чтения
+        """
+        try:
+            # По номерам через idx_bookings_room_days: поиск по индексу на номер
+            # вместо просмотра всех активных броней по status
+            self.cursor.execute(
+                """SELECT id FROM rooms r WHERE EXISTS (
+                       SELECT 1 FROM bookings b 
+                       WHERE b.room_id = r.id 
+                       AND b.status = ?
+                       AND b.ci_day < ?
+                       AND b.co_day > ?
+                   )""",
+                (self.BOOKING_STATUS_ACTIVE, co_day, ci_day)
+            )
+            return {row[0] for row in self.cursor.fetchall()}
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка проверки занятости номеров: {e}")
+            return None
+
+    def get_all_bookings(self) -> List[Booking]:
         """Получение всех бронирований"""
         try:
-            query = """
-                SELECT
-                    b.id,
-                    r.number,
-                    g.full_name,
-                    b.check_in_date,
-                    b.check_out_date,
-                    b.total_price,
-                    b.status
+            query = f"""
+                SELECT {Booking.SELECT}
                 FROM bookings b
                 JOIN rooms r ON b.room_id = r.id
                 JOIN guests g ON b.guest_id = g.id
-                ORDER BY b.check_in_date DESC
+                ORDER BY b.ci_day DESC
             """
-            self.cursor.execute(query)
-            return self.cursor.fetchall()
+            return self._fetch_all(Booking, query)
         except sqlite3.Error as e:
             logger.error(f"Ошибка получения броней: {e}")
             return []
 
+    def count_bookings(self, status: Optional[str] = None) -> int:
+        """Количество бронирований (с учетом фильтра по статусу)"""
+        try:
+            if status:
+                self.cursor.execute(
+                    "SELECT COUNT(*) FROM bookings WHERE status = ?", (status,)
+                )
+            else:
+                self.cursor.execute("SELECT COUNT(*) FROM bookings")
+            return self.cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка подсчета броней: {e}")
+            return 0
+
+    @staticmethod
+    def _booking_sort_value(booking: Booking, order_by: str):
+        """Значение колонки сортировки BOOKING_SORT_COLUMNS у загруженной брони"""
+        if order_by == "room":
+            return booking.room_number
+        if order_by == "guest":
+            return booking.guest_name
+        if order_by == "check_out":
+            return date_to_day(booking.check_out_date)
+        if order_by == "total":
+            return booking.total_price
+        if order_by == "status":
+            return booking.status
+        if order_by == "id":
+            return booking.id
+        return date_to_day(booking.check_in_date)
+
+    def get_bookings_page(self, offset: int, limit: int, status: Optional[str] = None,
+                          order_by: str = "check_in", descending: bool = True,
+                          after: Optional[Booking] = None,
+                          before: Optional[Booking] = None) -> List[Booking]:
+        """
+        Страница списка бронирований для постраничного отображения
+        after - последняя бронь предыдущей страницы, before - первая бронь
+        следующей: страница читается поиском по индексу от соседней (keyset),
+        а не пропуском offset строк. Без соседей - по offset (переход
+        ползунком); порядок строк по индексу, поэтому без сортировки таблицы.
+        """
+        try:
+            if order_by not in self.BOOKING_SORT_COLUMNS:
+                order_by = "check_in"
+            column = self.BOOKING_SORT_COLUMNS[order_by]
+            source = self.BOOKING_SORT_JOINS.get(order_by, self.BOOKING_JOIN)
+            status_filter = "b.status = ? AND" if status else ""
+            status_params = (status,) if status else ()
+            # Страница перед before читается в обратном порядке и разворачивается
+            backward = after is None and before is not None
+            seek = before if backward else after
+            direction = "DESC" if descending != backward else "ASC"
+            query = f"""
+                SELECT {Booking.SELECT}
+                FROM {source}
+                WHERE {status_filter} {{}}
+                ORDER BY {{}}
+                LIMIT ? OFFSET ?
+            """
+            if seek is None:
+                rows = self._fetch_all(
+                    Booking,
+                    query.format("1", f"{column} {direction}, b.id {direction}"),
+                    status_params + (limit, offset)
+                )
+            else:
+                # Два поиска по индексу (колонка, id): остаток строк с тем же
+                # значением колонки, затем следующие значения
+                op = "<" if direction == "DESC" else ">"
+                value = self._booking_sort_value(seek, order_by)
+                rows = self._fetch_all(
+                    Booking,
+                    query.format(f"{column} = ? AND b.id {op} ?", f"b.id {direction}"),
+                    status_params + (value, seek.id, limit, 0)
+                )
+                if len(rows) < limit:
+                    rows += self._fetch_all(
+                        Booking,
+                        query.format(f"{column} {op} ?", f"{column} {direction}, b.id {direction}"),
+                        status_params + (value, limit - len(rows), 0)
+                    )
+            return rows[::-1] if backward else rows
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка получения страницы броней: {e}")
+            return []
+
+    def _bookings_by_ids(self, booking_ids: list, conn: Optional[sqlite3.Connection] = None) -> List[Booking]:
+        placeholders = ", ".join("?" * len(booking_ids))
+        query = f"""
+            SELECT {Booking.SELECT}
+            FROM bookings b
+            JOIN rooms r ON b.room_id = r.id
+            JOIN guests g ON b.guest_id = g.id
+            WHERE b.id IN ({placeholders})
+        """
+        return self._fetch_all(Booking, query, booking_ids, conn=conn)
+
+    def get_bookings_by_ids(self, booking_ids) -> List[Booking]:
+        """Получение бронирований по списку ID (в формате get_all_bookings)"""
+        booking_ids = list(booking_ids)
+        if not booking_ids:
+            return []
+        try:
+            return self._bookings_by_ids(booking_ids)
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка получения броней: {e}")
+            return []
+
+    def get_bookings_state_cancellable(self, status: Optional[str],
+                                       booking_ids) -> Optional[Tuple[int, List[Booking]]]:
+        """
+        Сверка загруженных строк списка бронирований из фонового потока
+        (соединение поиска, прерывается через interrupt_search)
+        Возвращает (количество броней с фильтром status, текущие версии
+        броней booking_ids - удаленных среди них нет) или None, если прерван
+        """
+        try:
+            conn = self._get_search_conn()
+            if status:
+                total = conn.execute(
+                    "SELECT COUNT(*) FROM bookings WHERE status = ?", (status,)
+                ).fetchone()[0]
+            else:
+                total = conn.execute("SELECT COUNT(*) FROM bookings").fetchone()[0]
+            booking_ids = list(booking_ids)
+            rows = self._bookings_by_ids(booking_ids, conn) if booking_ids else []
+            return total, rows
+        except sqlite3.OperationalError as e:
+            if "interrupted" not in str(e):
+                logger.error(f"Ошибка сверки списка броней: {e}")
+            return None
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка сверки списка броней: {e}")
+            return None
+
+    def _recent_bookings(self, limit: int, conn: Optional[sqlite3.Connection] = None) -> List[Booking]:
+        return self._fetch_all(
+            Booking,
+            f"""SELECT {Booking.SELECT}
+                FROM bookings b
+                JOIN rooms r ON b.room_id = r.id
+                JOIN guests g ON b.guest_id = g.id
+                ORDER BY b.id DESC
+                LIMIT ?""",
+            (limit,),
+            conn=conn
+        )
+
+    def get_recent_bookings(self, limit: int = 8) -> List[Booking]:
+        """Последние созданные бронирования"""
+        try:
+            return self._recent_bookings(limit)
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка получения последних броней: {e}")
+            return []
+
     def cancel_booking(self, booking_id: int) -> bool:
         """Отмена бронирования"""
         try:
@@ -392,11 +1157,16 @@ class Database:
                 "UPDATE bookings SET status = ? WHERE id = ?",
                 (self.BOOKING_STATUS_CANCELLED, booking_id)
             )
+            refresh_nightly_revenue(self.conn, (booking_id,))
             
             # Освобождаем номер
-            self.update_room_status(room_id, self.ROOM_STATUS_FREE)
+            self._set_room_status(room_id, self.ROOM_STATUS_FREE)
             
             self.conn.commit()
+            self._emit(
+                ChangeEvent(ChangeEvent.BOOKING, ChangeEvent.UPDATE, (booking_id,)),
+                ChangeEvent(ChangeEvent.ROOM, ChangeEvent.UPDATE, (room_id,))
+            )
             logger.info(f"Бронь #{booking_id} отменена")
             return True
         except sqlite3.Error as e:
@@ -421,9 +1191,13 @@ class Database:
                 "UPDATE bookings SET status = ? WHERE id = ?",
                 (self.BOOKING_STATUS_COMPLETED, booking_id)
             )
-            self.update_room_status(room_id, self.ROOM_STATUS_CLEANING)
+            self._set_room_status(room_id, self.ROOM_STATUS_CLEANING)
             
             self.conn.commit()
+            self._emit(
+                ChangeEvent(ChangeEvent.BOOKING, ChangeEvent.UPDATE, (booking_id,)),
+                ChangeEvent(ChangeEvent.ROOM, ChangeEvent.UPDATE, (room_id,))
+            )
             logger.info(f"Бронь #{booking_id} завершена")
             return True
         except sqlite3.Error as e:
@@ -431,72 +1205,856 @@ class Database:
             self.conn.rollback()
             return False
 
+    def _dashboard_stats(self, conn: sqlite3.Connection) -> Dict[str, int]:
+        """Счетчики панели управления через указанное соединение"""
+        today = date_to_day(date.today())
+        rooms = dict(conn.execute(
+            "SELECT status, COUNT(*) FROM rooms WHERE status IN (?, ?) GROUP BY status",
+            (self.ROOM_STATUS_FREE, self.ROOM_STATUS_OCCUPIED)
+        ).fetchall())
+        check_ins = conn.execute(
+            "SELECT COUNT(*) FROM bookings WHERE status = ? AND ci_day = ?", 
+            (self.BOOKING_STATUS_ACTIVE, today)
+        ).fetchone()[0]
+        check_outs = conn.execute(
+            "SELECT COUNT(*) FROM bookings WHERE status = ? AND co_day = ?", 
+            (self.BOOKING_STATUS_ACTIVE, today)
+        ).fetchone()[0]
+        return {
+            "free": rooms.get(self.ROOM_STATUS_FREE, 0),
+            "occupied": rooms.get(self.ROOM_STATUS_OCCUPIED, 0),
+            "check_ins": check_ins,
+            "check_outs": check_outs
+        }
+
     def get_dashboard_stats(self) -> Dict[str, int]:
         """Получение статистики для дашборда"""
         try:
-            today = date.today().strftime("%Y-%m-%d")
-            
+            return self._dashboard_stats(self.conn)
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка получения статистики: {e}")
+            return {"free": 0, "occupied": 0, "check_ins": 0, "check_outs": 0}
+
+    def get_dashboard_cancellable(self, recent_limit: int = 8) -> Optional[Tuple[Dict[str, int], List[Booking]]]:
+        """
+        Статистика и последние брони для фонового потока (соединение поиска,
+        прерывается через interrupt_search)
+        Возвращает (статистика, последние брони) или None, если прерван
+        """
+        try:
+            conn = self._get_search_conn()
+            stats = self._dashboard_stats(conn)
+            return stats, self._recent_bookings(recent_limit, conn)
+        except sqlite3.OperationalError as e:
+            if "interrupted" not in str(e):
+                logger.error(f"Ошибка получения статистики: {e}")
+            return None
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка получения статистики: {e}")
+            return None
+
+    def get_revenue_breakdown(self, start_date: str = None, end_date: str = None) -> Dict[str, float]:
+        """
+        Выручка по ночам проживания за период (обе даты включительно):
+        стоимость, скидка за длительность и итог. Без дат - за все время.
+        """
+        try:
+            if start_date and end_date:
+                self.cursor.execute(
+                    """SELECT SUM(gross), SUM(discount) FROM nightly_revenue 
+                       WHERE day BETWEEN ? AND ?""",
+                    (date_to_day(start_date), date_to_day(end_date))
+                )
+            else:
+                self.cursor.execute("SELECT SUM(gross), SUM(discount) FROM nightly_revenue")
+            gross, discount = self.cursor.fetchone()
+            gross, discount = (gross or 0) / 100, (discount or 0) / 100
+            return {"gross": gross, "discount": discount, "net": gross - discount}
+        except (sqlite3.Error, ValueError) as e:
+            logger.error(f"Ошибка получения статистики доходов: {e}")
+            return {"gross": 0.0, "discount": 0.0, "net": 0.0}
+
+    def get_booking_revenue(self, booking_id: int) -> Optional[Dict[str, float]]:
+        """
+        Признанная выручка брони по ее ночам: стоимость (bookings.total_price),
+        скидка за длительность и итог к оплате. None при ошибке.
+        """
+        try:
             self.cursor.execute(
-                "SELECT COUNT(*) FROM rooms WHERE status = ?", 
-                (self.ROOM_STATUS_FREE,)
+                "SELECT SUM(gross), SUM(discount) FROM nightly_revenue WHERE booking_id = ?",
+                (booking_id,)
             )
-            free_rooms = self.cursor.fetchone()[0]
-            
+            gross, discount = self.cursor.fetchone()
+            gross, discount = (gross or 0) / 100, (discount or 0) / 100
+            return {"gross": gross, "discount": discount, "net": round(gross - discount, 2)}
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка получения выручки брони #{booking_id}: {e}")
+            return None
+
+    def get_revenue_stats(self, start_date: str = None, end_date: str = None) -> float:
+        """
+        Выручка за период с учетом скидок (обе даты включительно)
+        Бронь, переходящая через границу периода, учитывается только своими ночами в нем
+        """
+        return self.get_revenue_breakdown(start_date, end_date)["net"]
+
+    def get_stays(self, start_date: str, end_date: str) -> List[Tuple[int, int, int]]:
+        """
+        Проживания, пересекающие период [start_date, end_date), для аналитики:
+        (room_id, ci_day, co_day). Отмененные брони не учитываются.
+        """
+        try:
             self.cursor.execute(
-                "SELECT COUNT(*) FROM rooms WHERE status = ?", 
-                (self.ROOM_STATUS_OCCUPIED,)
+                f"""SELECT room_id, ci_day, co_day 
+                    FROM {self._report_bookings} 
+                    WHERE status IN (?, ?) AND ci_day < ? AND co_day > ?""",
+                (self.BOOKING_STATUS_ACTIVE, self.BOOKING_STATUS_COMPLETED,
+                 date_to_day(end_date), date_to_day(start_date))
             )
-            occupied_rooms = self.cursor.fetchone()[0]
-            
+            return self.cursor.fetchall()
+        except (sqlite3.Error, ValueError) as e:
+            logger.error(f"Ошибка получения проживаний: {e}")
+            return []
+
+    def get_room_night_revenue(self, start_date: str, end_date: str) -> List[Tuple[int, int, float]]:
+        """
+        Признанная выручка (со скидкой за длительность) по номерам и ночам
+        периода [start_date, end_date): (room_id, номер дня, сумма).
+        Те же ночи nightly_revenue, что и в get_revenue_stats.
+        """
+        try:
+            self.cursor.execute(
+                f"""SELECT b.room_id, n.day, SUM(n.gross - n.discount) / 100.0 
+                    FROM nightly_revenue n 
+                    JOIN {self._report_bookings} b ON b.id = n.booking_id 
+                    WHERE n.day >= ? AND n.day < ? 
+                    GROUP BY b.room_id, n.day""",
+                (date_to_day(start_date), date_to_day(end_date))
+            )
+            return self.cursor.fetchall()
+        except (sqlite3.Error, ValueError) as e:
+            logger.error(f"Ошибка получения выручки по ночам: {e}")
+            return []
+
+    # --- Тарифы ---
+    def _rate_target(self, room_type: Optional[str], room_id: Optional[int]) -> Tuple[str, str, object]:
+        """Таблица, колонка и значение ключа тарифа: задается тип номера или номер"""
+        if (room_type is None) == (room_id is None):
+            raise ValueError("нужно указать тип номера или номер (одно из двух)")
+        column = "room_type" if room_type is not None else "room_id"
+        return self.RATE_TABLES[column], column, room_type if room_type is not None else room_id
+
+    def _log_rate_change(self, room_id: Optional[int]):
+        """
+        Запись в changelog для других процессов (одна на операцию, а не на ночь;
+        0 - тариф типа номера)
+        """
+        self.cursor.execute(
+            "INSERT INTO changelog (entity, entity_id, op) VALUES (?, ?, ?)",
+            (ChangeEvent.RATE, room_id or 0, ChangeEvent.UPDATE)
+        )
+
+    def _emit_rate_change(self, room_id: Optional[int]):
+        self._emit(ChangeEvent(ChangeEvent.RATE, ChangeEvent.UPDATE, (room_id,) if room_id else ()))
+
+    def set_rates(self, price: float, start_date: str, end_date: str,
+                  room_type: Optional[str] = None, room_id: Optional[int] = None,
+                  weekdays=None) -> Optional[int]:
+        """
+        Цена ночей [start_date, end_date) для типа номера или номера одним запросом
+        weekdays - только эти дни недели (0 - понедельник), например (4, 5) - пт и сб.
+        Возвращает количество установленных ночей
+        """
+        try:
+            if price <= 0:
+                logger.warning("Попытка задать тариф с некорректной ценой")
+                return None
+            table, column, key = self._rate_target(room_type, room_id)
+            start_day, end_day = date_to_day(start_date), date_to_day(end_date)
+            if end_day <= start_day:
+                return 0
+            weekday_filter = ""
+            if weekdays is not None:
+                # День 0 (1970-01-01) - четверг
+                weekday_filter = "WHERE (day + 3) % 7 IN ({})".format(
+                    ", ".join(str(int(weekday)) for weekday in weekdays) or "NULL"
+                )
+            self.cursor.execute(
+                f"""WITH RECURSIVE nights(day) AS (
+                        SELECT ? UNION ALL SELECT day + 1 FROM nights WHERE day + 1 < ?
+                    )
+                    INSERT OR REPLACE INTO {table} ({column}, day, price)
+                    SELECT ?, day, ? FROM nights {weekday_filter}""",
+                (start_day, end_day, key, price)
+            )
+            # rowcount не считается для запроса, начинающегося с WITH
+            count = self.cursor.execute("SELECT changes()").fetchone()[0]
+            self._log_rate_change(room_id)
+            self.conn.commit()
+            self._emit_rate_change(room_id)
+            logger.info(f"Тариф {price} установлен на ночей: {count}")
+            return count
+        except (sqlite3.Error, ValueError) as e:
+            logger.error(f"Ошибка установки тарифа: {e}")
+            self.conn.rollback()
+            return None
+
+    def clear_rates(self, start_date: str, end_date: str,
+                    room_type: Optional[str] = None, room_id: Optional[int] = None) -> Optional[int]:
+        """Удаление тарифа на ночи [start_date, end_date) - действует цена по умолчанию"""
+        try:
+            table, column, key = self._rate_target(room_type, room_id)
+            self.cursor.execute(
+                f"DELETE FROM {table} WHERE {column} = ? AND day >= ? AND day < ?",
+                (key, date_to_day(start_date), date_to_day(end_date))
+            )
+            count = self.cursor.rowcount
+            self._log_rate_change(room_id)
+            self.conn.commit()
+            self._emit_rate_change(room_id)
+            logger.info(f"Тариф удален для ночей: {count}")
+            return count
+        except (sqlite3.Error, ValueError) as e:
+            logger.error(f"Ошибка удаления тарифа: {e}")
+            self.conn.rollback()
+            return None
+
+    def copy_rates(self, start_date: str, end_date: str, to_date: str,
+                   room_type: Optional[str] = None, room_id: Optional[int] = None,
+                   to_room_type: Optional[str] = None, to_room_id: Optional[int] = None) -> Optional[int]:
+        """
+        Копирование тарифа ночей [start_date, end_date) на период с to_date
+        (например, сезон прошлого года на этот) для того же или другого типа/номера.
+        Тариф в целевом периоде заменяется целиком: ночи без цены в источнике
+        остаются без цены. Возвращает количество скопированных ночей
+        """
+        try:
+            table, column, key = self._rate_target(room_type, room_id)
+            if to_room_type is None and to_room_id is None:
+                to_room_type, to_room_id = room_type, room_id
+            to_table, to_column, to_key = self._rate_target(to_room_type, to_room_id)
+            start_day, end_day = date_to_day(start_date), date_to_day(end_date)
+            shift = date_to_day(to_date) - start_day
+            # Источник читается до удаления: периоды одного ключа могут пересекаться
+            self.cursor.execute(
+                f"SELECT day, price FROM {table} WHERE {column} = ? AND day >= ? AND day < ?",
+                (key, start_day, end_day)
+            )
+            rows = [(to_key, day + shift, price) for day, price in self.cursor.fetchall()]
+            self.cursor.execute(
+                f"DELETE FROM {to_table} WHERE {to_column} = ? AND day >= ? AND day < ?",
+                (to_key, start_day + shift, end_day + shift)
+            )
+            self.cursor.executemany(
+                f"INSERT INTO {to_table} ({to_column}, day, price) VALUES (?, ?, ?)", rows
+            )
+            self._log_rate_change(to_room_id)
+            self.conn.commit()
+            self._emit_rate_change(to_room_id)
+            logger.info(f"Скопирован тариф ночей: {len(rows)}")
+            return len(rows)
+        except (sqlite3.Error, ValueError) as e:
+            logger.error(f"Ошибка копирования тарифа: {e}")
+            self.conn.rollback()
+            return None
+
+    def publish_demand_factors(self, rows) -> bool:
+        """
+        Замена всех множителей спроса одной транзакцией
+        rows - (тип номера, день, множитель). Другие соединения видят либо
+        прежний набор, либо новый целиком. Записываются только отличия от
+        прежнего набора - журнал изменений (и пакет репликации) получает
+        лишь измененные дни.
+        """
+        try:
+            new = {(room_type, day): factor for room_type, day, factor in rows}
+            self.cursor.execute("SELECT room_type, day, factor FROM demand_factors")
+            old = {(room_type, day): factor for room_type, day, factor in self.cursor.fetchall()}
+            self.cursor.executemany(
+                "DELETE FROM demand_factors WHERE room_type = ? AND day = ?",
+                [key for key in old if key not in new]
+            )
+            self.cursor.executemany(
+                "INSERT OR REPLACE INTO demand_factors (room_type, day, factor) VALUES (?, ?, ?)",
+                [key + (factor,) for key, factor in new.items() if old.get(key) != factor]
+            )
+            self._log_rate_change(None)
+            self.conn.commit()
+            self._emit_rate_change(None)
+            logger.info("Множители спроса обновлены")
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка публикации множителей спроса: {e}")
+            self.conn.rollback()
+            return False
+
+    def get_rates_in_range(self, start_day: int, end_day: int) -> Optional[Tuple[list, list, list]]:
+        """
+        Тарифы и множители спроса ночей [start_day, end_day) для расчета предложений:
+        ([(тип номера, день, цена)], [(ID номера, день, цена)],
+        [(тип номера, день, множитель спроса)]).
+        Чтение по диапазону первичного ключа для каждого типа и номера каталога.
+        Возвращает None при ошибке чтения
+        """
+        try:
+            self.cursor.execute(
+                """SELECT room_type, day, price FROM type_rates 
+                   WHERE room_type IN (SELECT DISTINCT type FROM rooms) AND day >= ? AND day < ?""",
+                (start_day, end_day)
+            )
+            type_rates = self.cursor.fetchall()
+            self.cursor.execute(
+                """SELECT room_id, day, price FROM room_rates 
+                   WHERE room_id IN (SELECT id FROM rooms) AND day >= ? AND day < ?""",
+                (start_day, end_day)
+            )
+            room_rates = self.cursor.fetchall()
+            self.cursor.execute(
+                """SELECT room_type, day, factor FROM demand_factors 
+                   WHERE room_type IN (SELECT DISTINCT type FROM rooms) AND day >= ? AND day < ?""",
+                (start_day, end_day)
+            )
+            return type_rates, room_rates, self.cursor.fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка чтения тарифов: {e}")
+            return None
+
+    def _nightly_rates_params(self, room_id: int, check_in: str, check_out: str) -> tuple:
+        start_day, end_day = date_to_day(check_in), date_to_day(check_out)
+        if end_day <= start_day:
+            raise ValueError("дата выезда должна быть позже даты заезда")
+        return (start_day, end_day, *season_multipliers_by_month(AppConfig.SEASON_MULTIPLIERS), room_id)
+
+    def get_nightly_rates(self, room_id: int, check_in: str, check_out: str) -> List[Tuple[str, float]]:
+        """Цена каждой ночи проживания в номере: [(дата 'ГГГГ-ММ-ДД', цена)]"""
+        try:
+            self.cursor.execute(
+                f"SELECT day, price FROM ({self.NIGHTLY_RATES_SQL}) ORDER BY day",
+                self._nightly_rates_params(room_id, check_in, check_out)
+            )
+            return [(day_to_date(day).isoformat(), price) for day, price in self.cursor.fetchall()]
+        except (sqlite3.Error, ValueError) as e:
+            logger.error(f"Ошибка получения цен номера #{room_id}: {e}")
+            return []
+
+    def get_stay_price(self, room_id: int, check_in: str, check_out: str) -> Optional[float]:
+        """
+        Стоимость проживания в номере без скидки за длительность - один агрегирующий запрос
+        Возвращает None, если номера нет или даты некорректны
+        """
+        try:
+            self.cursor.execute(
+                f"SELECT ROUND(SUM(price), 2) FROM ({self.NIGHTLY_RATES_SQL})",
+                self._nightly_rates_params(room_id, check_in, check_out)
+            )
+            return self.cursor.fetchone()[0]
+        except (sqlite3.Error, ValueError) as e:
+            logger.error(f"Ошибка расчета стоимости проживания: {e}")
+            return None
+
+    def get_booking_leads(self, start_date: str, end_date: str,
+                          room_type: Optional[str] = None) -> List[Tuple[int, int, int, float, str]]:
+        """
+        Брони всех статусов, пересекающие период [start_date, end_date), для модели
+        спроса: (ci_day, co_day, дней от создания до заезда, total_price, status).
+        Брони без created_at (созданные до его появления) не возвращаются.
+        """
+        try:
+            type_filter = "AND b.room_id IN (SELECT id FROM rooms WHERE type = ?)" if room_type else ""
+            self.cursor.execute(
+                f"""SELECT b.ci_day, b.co_day, b.ci_day - {self.DAY_NUMBER_SQL.format("b.created_at")},
+                           b.total_price, b.status
+                    FROM {self._report_bookings} b
+                    WHERE b.ci_day < ? AND b.co_day > ? AND b.created_at IS NOT NULL {type_filter}""",
+                (date_to_day(end_date), date_to_day(start_date)) + ((room_type,) if room_type else ())
+            )
+            return self.cursor.fetchall()
+        except (sqlite3.Error, ValueError) as e:
+            logger.error(f"Ошибка получения истории броней: {e}")
+            return []
+
+    # --- Потоковое чтение для экспорта и отчетов ---
+    def iter_rooms(self, query: str = "", chunk_size: Optional[int] = None) -> Iterator[Room]:
+        """Обход номеров (фильтр по номеру комнаты как в search_rooms_cancellable)"""
+        try:
+            yield from self._fetch_iter(
+                Room,
+                f"""SELECT {Room.SELECT} FROM rooms 
+                    WHERE number LIKE ? ORDER BY CAST(number AS INTEGER)""",
+                (f"%{query}%",),
+                chunk_size
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка чтения номеров: {e}")
+
+    def iter_guests(self, query: str = "", order_by: str = "full_name",
+                    descending: bool = False, chunk_size: Optional[int] = None) -> Iterator[Guest]:
+        """Обход гостей с поиском и сортировкой как в get_guests_page"""
+        try:
+            where, params = self._guest_filter(query)
+            column = self.GUEST_SORT_COLUMNS.get(order_by, "full_name")
+            direction = "DESC" if descending else "ASC"
+            yield from self._fetch_iter(
+                Guest,
+                f"""SELECT {Guest.SELECT} 
+                    FROM guests 
+                    {where}
+                    ORDER BY {column} {direction}, id {direction}""",
+                params,
+                chunk_size
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка чтения гостей: {e}")
+
+    def iter_bookings(self, status: Optional[str] = None, order_by: str = "check_in",
+                      descending: bool = True, chunk_size: Optional[int] = None) -> Iterator[Booking]:
+        """Обход бронирований с фильтром и сортировкой как в get_bookings_page"""
+        try:
+            column = self.BOOKING_SORT_COLUMNS.get(order_by, "b.ci_day")
+            direction = "DESC" if descending else "ASC"
+            where = "WHERE b.status = ?" if status else ""
+            params = (status,) if status else ()
+            yield from self._fetch_iter(
+                Booking,
+                f"""SELECT {Booking.SELECT}
+                    FROM {self.BOOKING_SORT_JOINS.get(order_by, self.BOOKING_JOIN)}
+                    {where}
+                    ORDER BY {column} {direction}, b.id {direction}""",
+                params,
+                chunk_size
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка чтения броней: {e}")
+
+    def iter_booking_details(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                             status: Optional[str] = None,
+                             chunk_size: Optional[int] = None) -> Iterator[BookingDetails]:
+        """
+        Обход бронирований с данными номера и гостя для отчетов
+        Период по дате заезда: start_date <= заезд < end_date
+        Читается порциями по ключу (заезд, id): каждая порция - отдельный
+        короткий запрос, и между порциями БД не заблокирована для записи.
+        Согласованность всей выгрузки дает только read_snapshot (режим WAL)
+        """
+        conditions, params = [], []
+        if start_date:
+            conditions.append("b.ci_day >= ?")
+            params.append(date_to_day(start_date))
+        if end_date:
+            conditions.append("b.ci_day < ?")
+            params.append(date_to_day(end_date))
+        if status:
+            conditions.append("b.status = ?")
+            params.append(status)
+        chunk_size = chunk_size or self.ITER_CHUNK_SIZE
+        query = f"""SELECT {BookingDetails.SELECT}
+                    FROM {self._report_bookings} b
+                    JOIN rooms r ON b.room_id = r.id
+                    JOIN guests g ON b.guest_id = g.id
+                    WHERE {' AND '.join(conditions + ['{seek}'])}
+                    ORDER BY b.ci_day, b.id
+                    LIMIT ?"""
+        first = query.format(seek="1")
+        # Следующая порция: (заезд, id) > последней строки предыдущей
+        following = query.format(seek="b.ci_day >= ? AND (b.ci_day > ? OR b.id > ?)")
+        last = None
+        try:
+            while True:
+                self.check_snapshot()
+                if last is None:
+                    rows = self._fetch_all(BookingDetails, first, (*params, chunk_size))
+                else:
+                    last_day = date_to_day(last.check_in_date)
+                    rows = self._fetch_all(
+                        BookingDetails, following,
+                        (*params, last_day, last_day, last.id, chunk_size)
+                    )
+                yield from rows
+                if len(rows) < chunk_size:
+                    break
+                last = rows[-1]
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка чтения броней для отчета: {e}")
+
+    # --- Подписка на изменения ---
+    def subscribe(self, callback):
+        """
+        Подписка на изменения данных
+        callback(events) вызывается после каждого commit со списком ChangeEvent
+        """
+        self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        """Отмена подписки"""
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def _invalidate_caches(self, events):
+        """Сброс закэшированных записей, затронутых изменениями"""
+        for event in events:
+            if event.entity == ChangeEvent.ROOM:
+                self._rooms_snapshot.invalidate()
+                for room_id in event.ids:
+                    self._room_cache.invalidate(room_id)
+            elif event.entity == ChangeEvent.GUEST:
+                for guest_id in event.ids:
+                    self._guest_cache.invalidate(guest_id)
+
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Статистика попаданий и промахов кэшей"""
+        return {
+            "rooms": self._room_cache.stats(),
+            "guests": self._guest_cache.stats(),
+            "room_catalog": self._rooms_snapshot.stats()
+        }
+
+    def _emit(self, *events: ChangeEvent):
+        """Рассылка событий подписчикам (ошибка подписчика не ломает запись)"""
+        # Кэши сбрасываются до подписчиков - они сразу читают свежие данные
+        self._invalidate_caches(events)
+        if not any(event.external for event in events):
+            self._sync_changelog_position()
+        for callback in list(self._subscribers):
+            try:
+                callback(events)
+            except Exception as e:
+                logger.error(f"Ошибка обработчика изменений: {e}")
+
+    # --- Архив бронирований ---
+    def attach_archive(self, archive_file: str) -> bool:
+        """
+        Подключение архива завершенных и отмененных броней (ATTACH AS archive).
+        Отчеты после этого читают временное представление all_bookings,
+        объединяющее основную и архивную таблицы.
+        """
+        if self.archive_file:
+            return True
+        try:
+            self.conn.commit()
+            if self.read_only:
+                self.cursor.execute("ATTACH DATABASE ? AS archive", (self._read_only_uri(archive_file),))
+                self._create_all_bookings_view()
+                self.archive_file = archive_file
+                self._report_bookings = "all_bookings"
+                return True
+            self.cursor.execute("ATTACH DATABASE ? AS archive", (archive_file,))
+            self.cursor.execute("""
+                CREATE TABLE IF NOT EXISTS archive.bookings (
+                    id INTEGER PRIMARY KEY,
+                    room_id INTEGER NOT NULL,
+                    guest_id INTEGER NOT NULL,
+                    check_in_date TEXT NOT NULL,
+                    check_out_date TEXT NOT NULL,
+                    total_price REAL NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at TIMESTAMP,
+                    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    ci_day INTEGER GENERATED ALWAYS AS ({ci_day}) VIRTUAL,
+                    co_day INTEGER GENERATED ALWAYS AS ({co_day}) VIRTUAL
+                );
+            """.format(
+                ci_day=self.DAY_NUMBER_SQL.format("check_in_date"),
+                co_day=self.DAY_NUMBER_SQL.format("check_out_date")
+            ))
+            self.cursor.execute("""
+                CREATE INDEX IF NOT EXISTS archive.idx_archive_bookings_days 
+                ON bookings(status, ci_day, co_day);
+            """)
+            self._create_all_bookings_view()
+            if self._backfill_archive_revenue:
+                rebuild_nightly_revenue(self.conn, "archive.bookings")
+                self._backfill_archive_revenue = False
+            self.conn.commit()
+            self.archive_file = archive_file
+            self._report_bookings = "all_bookings"
+            logger.info(f"Архив броней '{archive_file}' подключен")
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка подключения архива: {e}")
+            self.conn.rollback()
+            return False
+
+    def _create_all_bookings_view(self):
+        """Временное представление основной и архивной таблиц броней"""
+        self.cursor.execute(f"""
+            CREATE TEMP VIEW IF NOT EXISTS all_bookings AS
+            SELECT {self.BOOKING_COLUMNS}, ci_day, co_day FROM main.bookings
+            UNION ALL
+            SELECT {self.BOOKING_COLUMNS}, ci_day, co_day FROM archive.bookings a
+            WHERE NOT EXISTS (SELECT 1 FROM main.bookings b WHERE b.id = a.id)
+        """)
+
+    def archive_bookings_batch(self, cutoff_day: int, batch_size: int) -> List[int]:
+        """
+        Перенос одной порции завершенных/отмененных броней с выездом раньше
+        cutoff_day в архив. Возвращает ID перенесенных броней.
+        Транзакция над двумя файлами атомарна не во всех режимах журнала
+        (в WAL - нет), поэтому сначала копия фиксируется в архиве и
+        проверяется, и только потом брони удаляются из основной БД отдельной
+        транзакцией. После сбоя между ними бронь остается в обоих файлах
+        (all_bookings показывает ее один раз), следующий запуск ее перенесет.
+        """
+        if not self.archive_file:
+            raise DatabaseError("Архив не подключен")
+        try:
+            self.cursor.execute("BEGIN IMMEDIATE")
             self.cursor.execute(
-                "SELECT COUNT(*) FROM bookings WHERE check_in_date = ? AND status = ?", 
-                (today, self.BOOKING_STATUS_ACTIVE)
+                """SELECT id FROM bookings 
+                   WHERE status IN (?, ?) AND co_day < ?
+                   LIMIT ?""",
+                (self.BOOKING_STATUS_COMPLETED, self.BOOKING_STATUS_CANCELLED,
+                 cutoff_day, batch_size)
             )
-            check_ins_today = self.cursor.fetchone()[0]
+            booking_ids = [row[0] for row in self.cursor.fetchall()]
+            if not booking_ids:
+                self.conn.commit()
+                return []
+            placeholders = ", ".join("?" * len(booking_ids))
+            self.cursor.execute(
+                f"""INSERT OR REPLACE INTO archive.bookings ({self.BOOKING_COLUMNS})
+                    SELECT {self.BOOKING_COLUMNS} FROM main.bookings 
+                    WHERE id IN ({placeholders})""",
+                booking_ids
+            )
+            self.conn.commit()
             
             self.cursor.execute(
-                "SELECT COUNT(*) FROM bookings WHERE check_out_date = ? AND status = ?", 
-                (today, self.BOOKING_STATUS_ACTIVE)
+                f"SELECT COUNT(*) FROM archive.bookings WHERE id IN ({placeholders})",
+                booking_ids
             )
-            check_outs_today = self.cursor.fetchone()[0]
+            archived = self.cursor.fetchone()[0]
+            if archived != len(booking_ids):
+                raise DatabaseError(
+                    f"В архиве {archived} броней из {len(booking_ids)} - удаление отменено"
+                )
             
-            return {
-                "free": free_rooms,
-                "occupied": occupied_rooms,
-                "check_ins": check_ins_today,
-                "check_outs": check_outs_today
-            }
+            # Удаляются только брони, совпадающие с архивной копией: изменения,
+            # сделанные между транзакциями, не теряются
+            same = " AND ".join(
+                f"a.{column} IS main.bookings.{column}"
+                for column in self.BOOKING_COLUMNS.replace(" ", "").split(",")
+            )
+            self.cursor.execute("BEGIN IMMEDIATE")
+            self.cursor.execute(
+                f"""DELETE FROM main.bookings 
+                    WHERE id IN ({placeholders})
+                      AND EXISTS (SELECT 1 FROM archive.bookings a 
+                                  WHERE a.id = main.bookings.id AND {same})
+                    RETURNING id""",
+                booking_ids
+            )
+            booking_ids = [row[0] for row in self.cursor.fetchall()]
+            self.conn.commit()
         except sqlite3.Error as e:
-            logger.error(f"Ошибка получения статистики: {e}")
-            return {"free": 0, "occupied": 0, "check_ins": 0, "check_outs": 0}
+            logger.error(f"Ошибка переноса броней в архив: {e}")
+            self.conn.rollback()
+            raise DatabaseError(f"Не удалось перенести брони в архив: {e}")
+        
+        if booking_ids:
+            self._emit(ChangeEvent(ChangeEvent.BOOKING, ChangeEvent.DELETE, booking_ids))
+        return booking_ids
 
-    def get_revenue_stats(self, start_date: str = None, end_date: str = None) -> float:
-        """Получение статистики по доходам за период"""
+    # --- Профили хранения ---
+    @staticmethod
+    def _get_storage_settings(name: str) -> Dict:
+        settings = AppConfig.STORAGE_PROFILES.get(name)
+        if settings is None:
+            raise DatabaseError(f"Неизвестный профиль хранения '{name}'")
+        return settings
+
+    def _apply_pragmas(self, conn: sqlite3.Connection, settings: Dict):
+        for name in self.STORAGE_PRAGMAS:
+            if name in settings:
+                conn.execute(f"PRAGMA {name} = {settings[name]}")
+
+    def apply_storage_profile(self, name: str) -> bool:
+        """
+        Переключение профиля хранения для всех соединений Database.
+        Смена temp_store удаляет временные объекты, поэтому представление
+        архива создается заново.
+        """
         try:
-            if start_date and end_date:
-                self.cursor.execute(
-                    """SELECT SUM(total_price) FROM bookings 
-                       WHERE status IN (?, ?) 
-                       AND check_in_date BETWEEN ? AND ?""",
-                    (self.BOOKING_STATUS_ACTIVE, self.BOOKING_STATUS_COMPLETED, 
-                     start_date, end_date)
-                )
-            else:
-                self.cursor.execute(
-                    """SELECT SUM(total_price) FROM bookings 
-                       WHERE status IN (?, ?)""",
-                    (self.BOOKING_STATUS_ACTIVE, self.BOOKING_STATUS_COMPLETED)
-                )
+            settings = self._get_storage_settings(name)
+            self.conn.commit()
+            for conn in (self.conn, self._search_conn):
+                if conn is not None:
+                    self._apply_pragmas(conn, settings)
+            if self.archive_file:
+                self._create_all_bookings_view()
+            self.storage_profile = name
+            logger.info(f"Профиль хранения '{name}' применен")
+            return True
+        except (sqlite3.Error, DatabaseError) as e:
+            logger.error(f"Ошибка применения профиля хранения: {e}")
+            return False
+
+    @contextmanager
+    def use_storage_profile(self, name: str):
+        """Временное переключение профиля, например на время импорта"""
+        previous = self.storage_profile
+        self.apply_storage_profile(name)
+        try:
+            yield self
+        finally:
+            self.apply_storage_profile(previous)
+
+    # --- Снимок для отчетов ---
+    @contextmanager
+    def read_snapshot(self, max_age: Optional[float] = None):
+        """
+        Все чтения внутри блока идут в одной транзакции чтения и видят один
+        согласованный снимок БД. В режиме WAL снимок не блокирует запись
+        других соединений, но удерживает WAL от контрольной точки, поэтому
+        его возраст ограничен (AppConfig.REPORT_SNAPSHOT_MAX_AGE):
+        потоковое чтение старого снимка прерывается SnapshotExpired.
+        С журналом отката (DELETE) транзакция чтения держала бы блокировку
+        SHARED, и запись с рабочих мест ждала бы конца отчета дольше
+        busy_timeout. Поэтому там снимок не открывается: каждый запрос -
+        своя короткая транзакция, согласованы строки одного запроса.
+        Только для Database(read_only=True); вложенный вызов использует внешний снимок.
+        """
+        if not self.read_only:
+            # Записи внутри блока были бы отменены вместе с транзакцией чтения
+            raise DatabaseError("Снимок для отчета открывается только в режиме read_only")
+        if self._snapshot_started is not None or not self.has_snapshots():
+            yield self
+            return
+        try:
+            self.conn.commit()
+            self.cursor.execute("BEGIN")
+            # Снимок фиксируется первым чтением файла БД
+            self.cursor.execute("SELECT COUNT(*) FROM sqlite_master")
+            self.cursor.fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка открытия снимка для отчета: {e}")
+            raise DatabaseError(f"Не удалось открыть снимок БД: {e}")
+        self._snapshot_started = time.monotonic()
+        self._snapshot_max_age = AppConfig.REPORT_SNAPSHOT_MAX_AGE if max_age is None else max_age
+        try:
+            yield self
+        finally:
+            self._snapshot_started = None
+            self.conn.rollback()
+
+    def has_snapshots(self) -> bool:
+        """Открывает ли read_snapshot транзакцию чтения (только в режиме WAL)"""
+        return self.journal_mode == "wal"
+
+    def snapshot_age(self) -> Optional[float]:
+        """Возраст текущего снимка в секундах (None вне read_snapshot)"""
+        if self._snapshot_started is None:
+            return None
+        return time.monotonic() - self._snapshot_started
+
+    def check_snapshot(self):
+        """SnapshotExpired, если текущий снимок старше допустимого"""
+        age = self.snapshot_age()
+        if age is not None and age > self._snapshot_max_age:
+            raise SnapshotExpired(
+                f"Снимок БД открыт {age:.0f} с (допустимо {self._snapshot_max_age:.0f} с) - "
+                "перезапустите отчет"
+            )
+
+    # --- Изменения из других процессов ---
+    def _init_changelog_position(self):
+        """
+        Чтение журнала начинается с текущего конца
+        (старые записи удаляет обслуживание, см. maintenance.py)
+        """
+        try:
+            self.cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM changelog")
+            self._last_seq = self.cursor.fetchone()[0]
+            self.cursor.execute("PRAGMA data_version")
+            self._data_version = self.cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка инициализации журнала изменений: {e}")
+            self.conn.rollback()
+
+    def _sync_changelog_position(self):
+        """
+        Пропуск собственных записей журнала после commit.
+        Если с последней проверки писали другие процессы, позицию не двигаем -
+        их записи заберет poll_external_changes (свои придут повторно, это безопасно)
+        """
+        try:
+            self.cursor.execute("PRAGMA data_version")
+            if self.cursor.fetchone()[0] != self._data_version:
+                return
+            self.cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM changelog")
+            self._last_seq = self.cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка чтения журнала изменений: {e}")
+
+    def poll_external_changes(self) -> List[ChangeEvent]:
+        """
+        Проверка изменений, сделанных другими процессами.
+        Дешевый PRAGMA data_version на каждом вызове; журнал читается,
+        только если версия изменилась. События рассылаются подписчикам.
+        """
+        try:
+            self.cursor.execute("PRAGMA data_version")
+            data_version = self.cursor.fetchone()[0]
+            if data_version == self._data_version:
+                return []
+            self._data_version = data_version
             
-            result = self.cursor.fetchone()[0]
-            return result if result else 0.0
+            self.cursor.execute(
+                "SELECT seq, entity, entity_id, op FROM changelog WHERE seq > ? ORDER BY seq",
+                (self._last_seq,)
+            )
+            rows = self.cursor.fetchall()
         except sqlite3.Error as e:
-            logger.error(f"Ошибка получения статистики доходов: {e}")
-            return 0.0
+            logger.error(f"Ошибка чтения журнала изменений: {e}")
+            return []
+        
+        if not rows:
+            return []
+        self._last_seq = rows[-1][0]
+        
+        changes = {}  # (сущность, действие) -> ID
+        for _, entity, entity_id, op in rows:
+            if entity in ChangeEvent.ENTITIES:
+                changes.setdefault((entity, op), set()).add(entity_id)
+        events = [
+            ChangeEvent(entity, op, ids, external=True)
+            for (entity, op), ids in changes.items()
+        ]
+        if not events:
+            return []
+        logger.info(f"Получено изменений из других процессов: {len(rows)}")
+        self._emit(*events)
+        return events
+
+    def get_change_token(self) -> Tuple[int, int]:
+        """
+        Маркер состояния БД для проверки "изменилось ли что-то с прошлого раза"
+        total_changes - собственные записи, data_version - записи других соединений
+        """
+        try:
+            self.cursor.execute("PRAGMA data_version")
+            return self.conn.total_changes, self.cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка получения версии данных: {e}")
+            return -1, -1
+
+    def reload_statistics(self):
+        """Перечитать статистику планировщика после ANALYZE в другом соединении"""
+        try:
+            self.cursor.execute("ANALYZE sqlite_schema")
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка загрузки статистики: {e}")
 
     def close(self):
         """Закрытие соединения с БД"""
         try:
+            if self._search_conn is not None:
+                self._search_conn.close()
+            if not self.read_only:
+                # Рекомендуемое SQLite обновление статистики по запросам этого соединения
+                self.cursor.execute(f"PRAGMA analysis_limit = {self.ANALYSIS_LIMIT}")
+                self.cursor.execute("PRAGMA optimize")
             self.conn.close()
             logger.info("Соединение с БД закрыто")
         except sqlite3.Error as e:
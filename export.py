@@ -0,0 +1,217 @@
+"""
+Экспорт бронирований в CSV/XLSX
+
+Строки читаются из БД потоком (Database.iter_booking_details) и пишутся
+порциями, поэтому память не зависит от размера выгрузки. Выгрузка идет через
+отдельное соединение только для чтения. Каждая порция - короткий запрос,
+поэтому запись с рабочих мест не ждет конца выгрузки. В режиме WAL (профиль
+desk-local) вся выгрузка читается из одного снимка БД и строки согласованы
+между собой; с журналом отката порции видят изменения, сделанные между ними.
+
+CLI:  python export.py bookings_2025_10.xlsx --month 2025-10
+"""
+import argparse
+import csv
+import logging
+import os
+import sys
+from datetime import date
+from itertools import islice
+from typing import Callable, Optional
+
+from config import AppConfig
+from database import Database, DatabaseError
+from utils import format_currency, format_date, parse_date
+
+logger = logging.getLogger(__name__)
+
+# Размер порции строк, передаваемой писателю
+CHUNK_SIZE = 1000
+
+EXPORT_COLUMNS = [
+    "ID брони",
+    "Номер",
+    "Тип номера",
+    "Гость",
+    "Телефон",
+    "Email",
+    "Дата заезда",
+    "Дата выезда",
+    "Ночей",
+    "Сумма",
+    "Статус"
+]
+
+FORMATS = ("csv", "xlsx")
+
+
+class ExportError(Exception):
+    """Ошибка экспорта"""
+    pass
+
+
+class ExportCancelled(ExportError):
+    """Экспорт прерван пользователем"""
+    pass
+
+
+def month_range(month: str):
+    """'2025-10' -> ('2025-10-01', '2025-11-01')"""
+    start = parse_date(f"{month}-01")
+    if start is None:
+        raise ExportError(f"Некорректный месяц '{month}', ожидается ГГГГ-ММ")
+    if start.month == 12:
+        end = date(start.year + 1, 1, 1)
+    else:
+        end = date(start.year, start.month + 1, 1)
+    return start.isoformat(), end.isoformat()
+
+
+def format_report_row(booking) -> list:
+    """Значения строки отчета"""
+    check_in = parse_date(booking.check_in_date)
+    check_out = parse_date(booking.check_out_date)
+    nights = (check_out - check_in).days if check_in and check_out else ""
+    return [
+        booking.id,
+        booking.room_number,
+        booking.room_type,
+        booking.guest_name,
+        booking.phone_number or "",
+        booking.email or "",
+        format_date(check_in) if check_in else booking.check_in_date,
+        format_date(check_out) if check_out else booking.check_out_date,
+        nights,
+        format_currency(booking.total_price),
+        booking.status
+    ]
+
+
+class CsvWriter:
+    """CSV для Excel: UTF-8 с BOM и разделитель ';'"""
+    def __init__(self, path: str):
+        try:
+            self.file = open(path, "w", newline="", encoding="utf-8-sig")
+        except OSError as e:
+            raise ExportError(f"Не удалось создать файл '{path}': {e}")
+        self.writer = csv.writer(self.file, delimiter=";")
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class XlsxWriter:
+    """XLSX в режиме write_only: строки сразу уходят во временный файл openpyxl"""
+    def __init__(self, path: str):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise ExportError("Для экспорта в XLSX установите пакет openpyxl")
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet("Бронирования")
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.sheet.append(row)
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+def get_writer(path: str, fmt: Optional[str] = None):
+    """Писатель по формату или расширению файла"""
+    fmt = (fmt or os.path.splitext(path)[1].lstrip(".")).lower()
+    if fmt == "csv":
+        return CsvWriter(path)
+    if fmt == "xlsx":
+        return XlsxWriter(path)
+    raise ExportError(f"Неподдерживаемый формат '{fmt}', доступны: {', '.join(FORMATS)}")
+
+
+def export_bookings(db_file: str, path: str, fmt: Optional[str] = None,
+                    month: Optional[str] = None, status: Optional[str] = None,
+                    progress: Optional[Callable[[int], None]] = None,
+                    cancelled: Optional[Callable[[], bool]] = None,
+                    archive_file: Optional[str] = None) -> int:
+    """
+    Экспорт бронирований в файл
+    Использует собственное соединение - можно вызывать из фонового потока.
+    С archive_file в выгрузку попадают и архивные брони.
+    progress(число строк) вызывается после каждой порции,
+    cancelled() -> True прерывает экспорт (недописанный файл удаляется).
+    Возвращает количество выгруженных строк.
+    """
+    start_date, end_date = month_range(month) if month else (None, None)
+    writer = get_writer(path, fmt)
+    db = None
+    count = 0
+    completed = False
+    try:
+        try:
+            db = Database(db_file, archive_file=archive_file, storage_profile="reporting",
+                          read_only=True)
+        except DatabaseError as e:
+            raise ExportError(str(e))
+        writer.write_rows([EXPORT_COLUMNS])
+        try:
+            with db.read_snapshot():
+                bookings = db.iter_booking_details(start_date, end_date, status,
+                                                   chunk_size=CHUNK_SIZE)
+                try:
+                    while True:
+                        chunk = [format_report_row(b) for b in islice(bookings, CHUNK_SIZE)]
+                        if not chunk:
+                            break
+                        writer.write_rows(chunk)
+                        count += len(chunk)
+                        if progress:
+                            progress(count)
+                        if cancelled and cancelled():
+                            raise ExportCancelled("Экспорт прерван")
+                finally:
+                    bookings.close()
+        except DatabaseError as e:
+            raise ExportError(str(e))
+        writer.close()
+        completed = True
+    finally:
+        if not completed:
+            try:
+                writer.close()
+            except Exception:
+                pass
+            if os.path.exists(path):
+                os.remove(path)
+        if db is not None:
+            db.close()
+
+    logger.info(f"Экспортировано броней: {count} -> {path}")
+    return count
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Экспорт бронирований в CSV/XLSX")
+    parser.add_argument("output", help="файл отчета (.csv или .xlsx)")
+    parser.add_argument("--db", default=AppConfig.DB_FILE, help="файл БД")
+    parser.add_argument("--archive", default=AppConfig.ARCHIVE_FILE, help="файл архива броней")
+    parser.add_argument("--month", help="месяц заезда в формате ГГГГ-ММ")
+    parser.add_argument("--status", help="статус брони (Активно, Завершено, Отменено)")
+    parser.add_argument("--format", choices=FORMATS, help="формат (по умолчанию по расширению)")
+    args = parser.parse_args(argv)
+
+    try:
+        export_bookings(args.db, args.output, args.format, args.month, args.status,
+                        archive_file=args.archive)
+    except ExportError as e:
+        logger.error(str(e))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,38 @@
+import time
+_START_TIME = time.perf_counter()
+
+import argparse
+
 import customtkinter as ctk
 from ui.main_app_window import MainAppWindow
 from database import Database
+from config import AppConfig
+from utils import StartupProfiler
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hotel Harmony")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="вывести разбивку времени от старта процесса до первой отрисовки"
+    )
+    args = parser.parse_args()
+    
+    profiler = StartupProfiler(_START_TIME) if args.profile_startup else None
+    if profiler:
+        profiler.mark("Импорт модулей")
+    
     # Устанавливаем тему и цвет по умолчанию
     ctk.set_appearance_mode("System")  # Варианты: "System", "Dark", "Light"
     ctk.set_default_color_theme("blue") # Варианты: "blue", "green", "dark-blue"
     
-    db = Database()
+    db = Database(AppConfig.DB_FILE, archive_file=AppConfig.ARCHIVE_FILE)
+    if profiler:
+        profiler.mark("Подключение к БД")
     
-    app = MainAppWindow(db)
+    app = MainAppWindow(db, profiler=profiler)
     app.mainloop()
     
-    db.close()
\ No newline at end of file
+    if app.pricing_scheduler:
+        app.pricing_scheduler.shutdown()
+    db.close()
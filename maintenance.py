@@ -0,0 +1,254 @@
+"""
+Обслуживание БД: статистика планировщика, очистка журнала изменений,
+возврат свободных страниц, контрольная точка WAL и быстрая проверка целостности
+
+Задачи выполняются через отдельное соединение, каждая ограничена по времени
+и прерывается по запросу (например, когда пользователь снова начал работать).
+
+CLI:  python maintenance.py [--db hotel.db] [--tasks analyze quick_check]
+"""
+import argparse
+import logging
+import sqlite3
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from config import AppConfig
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+TASKS = ("analyze", "changelog_trim", "incremental_vacuum", "wal_checkpoint", "quick_check")
+
+# Итог задачи
+DONE = "done"
+SKIPPED = "skipped"
+ABORTED = "aborted"
+TIMEOUT = "timeout"
+FAILED = "error"
+
+# Инструкций виртуальной машины SQLite между проверками прерывания
+PROGRESS_OPS = 1000
+
+# Записей журнала изменений, удаляемых одной транзакцией
+CHANGELOG_TRIM_BATCH = 5000
+
+
+class _Stop(Exception):
+    """Задача остановлена между шагами или завершилась с ошибкой"""
+    def __init__(self, status: str, details: str = ""):
+        super().__init__(status)
+        self.status = status
+        self.details = details
+
+
+class _TaskContext:
+    """Соединение задачи с лимитом времени и флагом прерывания"""
+    def __init__(self, conn: sqlite3.Connection, seconds: float,
+                 should_abort: Optional[Callable[[], bool]]):
+        self.conn = conn
+        self.deadline = time.monotonic() + seconds
+        self.should_abort = should_abort
+        self.stop_status = None
+        self.progress = ""  # что успели сделать - для отчета о прерванной задаче
+        conn.set_progress_handler(self._on_progress, PROGRESS_OPS)
+
+    def _on_progress(self):
+        """Ненулевой результат прерывает текущий запрос"""
+        self.stop_status = self._stop_reason()
+        return 1 if self.stop_status else 0
+
+    def _stop_reason(self) -> Optional[str]:
+        if self.should_abort and self.should_abort():
+            return ABORTED
+        if time.monotonic() > self.deadline:
+            return TIMEOUT
+        return None
+
+    def checkpoint(self):
+        """
+        Проверка между шагами задачи
+        Пауза дает другим соединениям взять блокировку между транзакциями обслуживания
+        """
+        time.sleep(AppConfig.MAINTENANCE_STEP_SLEEP)
+        status = self._stop_reason()
+        if status:
+            raise _Stop(status)
+
+    def close(self):
+        self.conn.set_progress_handler(None, 0)
+
+
+def _analyze(ctx: _TaskContext) -> str:
+    """ANALYZE по таблицам; analysis_limit ограничивает число просматриваемых строк индекса"""
+    ctx.conn.execute(f"PRAGMA analysis_limit = {Database.ANALYSIS_LIMIT}")
+    tables = [row[0] for row in ctx.conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+        "ORDER BY name"
+    )]
+    for done, table in enumerate(tables):
+        ctx.progress = f"таблиц: {done} из {len(tables)}"
+        ctx.checkpoint()
+        ctx.conn.execute(f"ANALYZE {table}")
+        ctx.conn.commit()
+    return f"таблиц: {len(tables)}"
+
+
+def _changelog_trim(ctx: _TaskContext) -> Optional[str]:
+    """
+    Удаление старых записей журнала изменений порциями. Сохраняются последние
+    Database.CHANGELOG_KEEP записей (их читают другие терминалы) и все записи
+    после наименьшей позиции, подтвержденной репликами (replication.py)
+    """
+    first_seq, last_seq = ctx.conn.execute("SELECT MIN(seq), MAX(seq) FROM changelog").fetchone()
+    if last_seq is None:
+        return None
+    limit = last_seq - Database.CHANGELOG_KEEP
+    has_acks = ctx.conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'replication_acks'"
+    ).fetchone()
+    if has_acks:
+        acked = ctx.conn.execute("SELECT MIN(applied_seq) FROM replication_acks").fetchone()[0]
+        if acked is not None:
+            limit = min(limit, acked)
+    if first_seq > limit:
+        return None
+    removed = 0
+    for bound in range(first_seq + CHANGELOG_TRIM_BATCH - 1, limit + CHANGELOG_TRIM_BATCH,
+                       CHANGELOG_TRIM_BATCH):
+        ctx.progress = f"удалено записей журнала: {removed}"
+        ctx.checkpoint()
+        removed += ctx.conn.execute(
+            "DELETE FROM changelog WHERE seq <= ?", (min(bound, limit),)
+        ).rowcount
+        ctx.conn.commit()
+    return f"удалено записей журнала: {removed}, хранятся после seq {limit}"
+
+
+def _incremental_vacuum(ctx: _TaskContext) -> Optional[str]:
+    """Возврат свободных страниц порциями, каждая в своей транзакции"""
+    if ctx.conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return None
+    page_size = ctx.conn.execute("PRAGMA page_size").fetchone()[0]
+    free_before = ctx.conn.execute("PRAGMA freelist_count").fetchone()[0]
+    free = free_before
+    while True:
+        freed = free_before - free
+        ctx.progress = f"освобождено страниц: {freed} ({freed * page_size / 1024 / 1024:.1f} МБ)"
+        if not free:
+            return ctx.progress
+        ctx.checkpoint()
+        # execute() выполняет один шаг прагмы (одна страница), executescript - до конца
+        ctx.conn.executescript(f"PRAGMA incremental_vacuum({AppConfig.MAINTENANCE_VACUUM_PAGES})")
+        free = ctx.conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def _wal_checkpoint(ctx: _TaskContext) -> Optional[str]:
+    """PASSIVE не ждет читателей и писателей - переносится то, что можно"""
+    if ctx.conn.execute("PRAGMA journal_mode").fetchone()[0].lower() != "wal":
+        return None
+    busy, log_pages, done_pages = ctx.conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+    return f"перенесено страниц WAL: {done_pages} из {log_pages}" + (" (БД занята)" if busy else "")
+
+
+def _quick_check(ctx: _TaskContext) -> str:
+    rows = ctx.conn.execute("PRAGMA quick_check").fetchall()
+    result = "; ".join(row[0] for row in rows)
+    if result != "ok":
+        logger.error(f"PRAGMA quick_check: {result}")
+        raise _Stop(FAILED, result)
+    return result
+
+
+TASK_FUNCTIONS = {
+    "analyze": _analyze,
+    "changelog_trim": _changelog_trim,
+    "incremental_vacuum": _incremental_vacuum,
+    "wal_checkpoint": _wal_checkpoint,
+    "quick_check": _quick_check
+}
+
+
+def run_task(conn: sqlite3.Connection, task: str, seconds: float,
+             should_abort: Optional[Callable[[], bool]] = None) -> Dict:
+    """
+    Выполнение одной задачи с лимитом времени
+    Возвращает отчет: задача, итог (done/skipped/aborted/timeout/error), время, подробности
+    """
+    started = time.perf_counter()
+    ctx = _TaskContext(conn, seconds, should_abort)
+    details = ""
+    try:
+        details = TASK_FUNCTIONS[task](ctx)
+        status = DONE if details is not None else SKIPPED
+    except _Stop as e:
+        status = e.status
+        details = e.details or ctx.progress
+    except sqlite3.Error as e:
+        # Прерывание из обработчика прогресса приходит как OperationalError
+        status = ctx.stop_status or FAILED
+        details = str(e) if status == FAILED else ctx.progress
+        conn.rollback()
+    finally:
+        ctx.close()
+    return {
+        "task": task,
+        "status": status,
+        "seconds": round(time.perf_counter() - started, 3),
+        "details": details or ""
+    }
+
+
+def run_maintenance(db_file: str, tasks=TASKS, task_seconds: Optional[float] = None,
+                    should_abort: Optional[Callable[[], bool]] = None) -> List[Dict]:
+    """
+    Последовательное выполнение задач обслуживания
+    После прерывания оставшиеся задачи не запускаются (итог aborted).
+    """
+    task_seconds = task_seconds or AppConfig.MAINTENANCE_TASK_SECONDS
+    report = []
+    try:
+        conn = sqlite3.connect(db_file)
+    except sqlite3.Error as e:
+        logger.error(f"Не удалось открыть БД для обслуживания: {e}")
+        return [{"task": task, "status": FAILED, "seconds": 0.0, "details": str(e)} for task in tasks]
+    try:
+        for task in tasks:
+            if should_abort and should_abort():
+                report.append({"task": task, "status": ABORTED, "seconds": 0.0, "details": ""})
+                continue
+            report.append(run_task(conn, task, task_seconds, should_abort))
+    finally:
+        conn.close()
+    return report
+
+
+def format_report(report: List[Dict]) -> str:
+    """Отчет одной строкой на задачу"""
+    lines = []
+    for item in report:
+        line = f"{item['task']}: {item['status']} за {item['seconds']} с"
+        if item["details"]:
+            line += f" - {item['details']}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Обслуживание БД")
+    parser.add_argument("--db", default=AppConfig.DB_FILE, help="файл БД")
+    parser.add_argument("--tasks", nargs="+", choices=TASKS, default=list(TASKS),
+                        help="задачи по порядку")
+    parser.add_argument("--seconds", type=float, default=AppConfig.MAINTENANCE_TASK_SECONDS,
+                        help="лимит времени на задачу")
+    args = parser.parse_args(argv)
+
+    report = run_maintenance(args.db, args.tasks, args.seconds)
+    print(format_report(report))
+    return 1 if any(item["status"] == FAILED for item in report) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+Записи, возвращаемые Database
+Компактные объекты со __slots__ вместо позиционных кортежей
+"""
+
+
+class Record:
+    """Базовый класс записи: сравнение, хеш и вывод по значениям полей"""
+    __slots__ = ()
+
+    # Список колонок SELECT в порядке полей записи
+    SELECT = ""
+
+    @classmethod
+    def row_factory(cls, cursor, row):
+        """Фабрика строк для sqlite3.Cursor.row_factory"""
+        return cls(*row)
+
+    def astuple(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.astuple() == other.astuple()
+
+    def __hash__(self):
+        return hash(self.astuple())
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class Room(Record):
+    """Номер"""
+    __slots__ = ("id", "number", "type", "price_per_night", "status", "created_at")
+
+    SELECT = "id, number, type, price_per_night, status, created_at"
+
+    id: int
+    number: str
+    type: str
+    price_per_night: float
+    status: str
+    created_at: str
+
+    def __init__(self, id, number, type, price_per_night, status, created_at=None):
+        self.id = id
+        self.number = number
+        self.type = type
+        self.price_per_night = price_per_night
+        self.status = status
+        self.created_at = created_at
+
+
+class Guest(Record):
+    """Гость"""
+    __slots__ = ("id", "full_name", "phone_number", "email", "created_at")
+
+    SELECT = "id, full_name, phone_number, email, created_at"
+
+    id: int
+    full_name: str
+    phone_number: str
+    email: str
+    created_at: str
+
+    def __init__(self, id, full_name, phone_number, email, created_at=None):
+        self.id = id
+        self.full_name = full_name
+        self.phone_number = phone_number
+        self.email = email
+        self.created_at = created_at
+
+
+class Booking(Record):
+    """Бронирование с номером комнаты и именем гостя"""
+    __slots__ = (
+        "id", "room_id", "guest_id", "room_number", "guest_name",
+        "check_in_date", "check_out_date", "total_price", "status", "created_at"
+    )
+
+    # Запрос к bookings b JOIN rooms r JOIN guests g
+    SELECT = (
+        "b.id, b.room_id, b.guest_id, r.number, g.full_name, "
+        "b.check_in_date, b.check_out_date, b.total_price, b.status, b.created_at"
+    )
+
+    id: int
+    room_id: int
+    guest_id: int
+    room_number: str
+    guest_name: str
+    check_in_date: str
+    check_out_date: str
+    total_price: float
+    status: str
+    created_at: str
+
+    def __init__(self, id, room_id, guest_id, room_number, guest_name,
+                 check_in_date, check_out_date, total_price, status, created_at=None):
+        self.id = id
+        self.room_id = room_id
+        self.guest_id = guest_id
+        self.room_number = room_number
+        self.guest_name = guest_name
+        self.check_in_date = check_in_date
+        self.check_out_date = check_out_date
+        self.total_price = total_price
+        self.status = status
+        self.created_at = created_at
+
+
+class BookingDetails(Record):
+    """Бронирование с данными номера и гостя для отчетов"""
+    __slots__ = (
+        "id", "room_number", "room_type", "guest_name", "phone_number", "email",
+        "check_in_date", "check_out_date", "total_price", "status"
+    )
+
+    # Запрос к bookings b JOIN rooms r JOIN guests g
+    SELECT = (
+        "b.id, r.number, r.type, g.full_name, g.phone_number, g.email, "
+        "b.check_in_date, b.check_out_date, b.total_price, b.status"
+    )
+
+    id: int
+    room_number: str
+    room_type: str
+    guest_name: str
+    phone_number: str
+    email: str
+    check_in_date: str
+    check_out_date: str
+    total_price: float
+    status: str
+
+    def __init__(self, id, room_number, room_type, guest_name, phone_number, email,
+                 check_in_date, check_out_date, total_price, status):
+        self.id = id
+        self.room_number = room_number
+        self.room_type = room_type
+        self.guest_name = guest_name
+        self.phone_number = phone_number
+        self.email = email
+        self.check_in_date = check_in_date
+        self.check_out_date = check_out_date
+        self.total_price = total_price
+        self.status = status
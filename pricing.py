@@ -0,0 +1,177 @@
+"""
+Динамические цены: множители спроса по типам номеров на год вперед
+
+Для каждого типа номера и каждой ночи горизонта (AppConfig.PRICING_HORIZON_DAYS)
+считается загрузка по активным броням, и по кривой спроса
+(AppConfig.PRICING_DEMAND_CURVES, кусочно-линейная: загрузка -> множитель)
+получается множитель цены. Вся матрица типы x ночи - один расчет NumPy.
+
+Множитель применяется к цене ночи без тарифа поверх сезона:
+  price_per_night x множитель сезона (utils.get_season) x множитель спроса.
+Тарифы type_rates/room_rates (rates.py) важнее, скидка за длительность
+(utils.calculate_discount) вычитается из суммы проживания, как и раньше.
+
+Для далеких ночей брони еще не набраны, поэтому дальше
+AppConfig.PRICING_EARLY_DAYS от сегодня множитель не опускается ниже 1.
+
+Результат заменяет таблицу demand_factors одной транзакцией
+(Database.publish_demand_factors): читатели видят либо старые, либо новые
+множители целиком. Приложение запускает пересчет в отдельном процессе
+(ui.scheduler.PricingScheduler). Реплика (replication.py) получает
+множители с основной БД вместе с бронями - пересчет на ней не нужен.
+
+CLI:  python pricing.py [--db hotel.db] [--dry-run]
+"""
+import argparse
+import logging
+import sys
+import time
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from analytics import daily_sold
+from config import AppConfig
+from database import Database, DatabaseError
+from utils import date_to_day, day_to_date
+
+logger = logging.getLogger(__name__)
+
+# Кривая спроса для типов без своей в AppConfig.PRICING_DEMAND_CURVES
+DEFAULT_CURVE = "default"
+
+
+class PricingError(Exception):
+    """Ошибка расчета динамических цен"""
+    pass
+
+
+def demand_curve(room_type: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Точки кривой спроса типа номера: загрузка (0..1) и множитель"""
+    curves = AppConfig.PRICING_DEMAND_CURVES
+    points = sorted(curves.get(room_type, curves[DEFAULT_CURVE]))
+    return np.array([x for x, _ in points]), np.array([y for _, y in points])
+
+
+def forward_occupancy(db: Database, start_day: int, days: int) -> Tuple[List[str], np.ndarray]:
+    """
+    Загрузка по типам номеров на ночи [start_day, start_day + days)
+    Возвращает типы и массив (типы, ночи) со значениями 0..1.
+    Номера на ремонте в доступные не входят.
+    """
+    rooms = [room for room in db.get_all_rooms() if room.status != Database.ROOM_STATUS_REPAIR]
+    names = sorted({room.type for room in rooms})
+    type_index = {name: i for i, name in enumerate(names)}
+    room_types = np.full(max((room.id for room in rooms), default=0) + 1, -1, dtype=np.int64)
+    for room in rooms:
+        room_types[room.id] = type_index[room.type]
+    capacity = np.bincount(room_types[room_types >= 0], minlength=len(names))
+
+    end_day = start_day + days
+    stays = db.get_stays(day_to_date(start_day).isoformat(), day_to_date(end_day).isoformat())
+    stays = np.array(stays, dtype=np.int64).reshape(-1, 3)
+    sold = daily_sold(stays, room_types, len(names), start_day, end_day)
+    # Перебронирование может дать больше 1 - кривая все равно ограничена своими точками
+    return names, sold / np.maximum(capacity, 1)[:, None]
+
+
+def demand_factors(names: List[str], occupancy: np.ndarray) -> np.ndarray:
+    """Множители спроса (типы, ночи) по загрузке; первая ночь - сегодня"""
+    factors = np.empty(occupancy.shape)
+    for i, name in enumerate(names):
+        xs, ys = demand_curve(name)
+        factors[i] = np.interp(occupancy[i], xs, ys)
+    early = np.arange(occupancy.shape[1]) >= AppConfig.PRICING_EARLY_DAYS
+    factors[:, early] = np.maximum(factors[:, early], 1.0)
+    return np.round(factors, 2)
+
+
+def compute_demand_factors(db: Database, start_date: Optional[str] = None,
+                           days: Optional[int] = None) -> Tuple[int, List[str], np.ndarray, np.ndarray]:
+    """
+    Расчет множителей на горизонт от start_date (по умолчанию сегодня)
+    Возвращает (первый день, типы номеров, загрузка, множители)
+    """
+    days = days or AppConfig.PRICING_HORIZON_DAYS
+    try:
+        start_day = date_to_day(start_date or date.today())
+    except ValueError as e:
+        raise PricingError(f"Некорректная дата: {e}")
+    names, occupancy = forward_occupancy(db, start_day, days)
+    return start_day, names, occupancy, demand_factors(names, occupancy)
+
+
+def _factor_rows(start_day: int, names: List[str], factors: np.ndarray):
+    """Строки demand_factors; множитель 1 не хранится - это цена без изменений"""
+    type_rows, nights = np.nonzero(factors != 1.0)
+    for i, night, factor in zip(type_rows.tolist(), nights.tolist(), factors[type_rows, nights].tolist()):
+        yield names[i], start_day + night, factor
+
+
+def run_pricing(db_file: str, start_date: Optional[str] = None, publish: bool = True) -> Dict:
+    """
+    Пересчет и публикация множителей спроса (выполняется в отдельном процессе)
+    Возвращает сводку: ночей, строк множителей, средний множитель и загрузка по типам, время
+    """
+    started = time.perf_counter()
+    try:
+        db = Database(db_file)
+    except DatabaseError as e:
+        raise PricingError(str(e))
+    try:
+        start_day, names, occupancy, factors = compute_demand_factors(db, start_date)
+        rows = list(_factor_rows(start_day, names, factors))
+        if publish and not db.publish_demand_factors(rows):
+            raise PricingError("Не удалось сохранить множители спроса")
+    finally:
+        db.close()
+    return {
+        "start": day_to_date(start_day).isoformat(),
+        "nights": factors.shape[1],
+        "rows": len(rows),
+        "types": {
+            name: {
+                "occupancy": round(float(occupancy[i].mean()), 3),
+                "mean_factor": round(float(factors[i].mean()), 3),
+                "max_factor": float(factors[i].max()) if factors.shape[1] else 1.0
+            }
+            for i, name in enumerate(names)
+        },
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
+
+def format_summary(summary: Dict) -> str:
+    lines = [
+        f"С {summary['start']} на {summary['nights']} ночей, строк множителей: "
+        f"{summary['rows']}, за {summary['seconds']} с",
+        f"{'Тип номера':<22} {'Загрузка':>9} {'Средний':>8} {'Макс.':>6}"
+    ]
+    for name, item in summary["types"].items():
+        lines.append(
+            f"{name:<22} {item['occupancy'] * 100:>8.1f}% {item['mean_factor']:>8.2f} "
+            f"{item['max_factor']:>6.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Пересчет динамических цен на год вперед")
+    parser.add_argument("--db", default=AppConfig.DB_FILE, help="файл БД")
+    parser.add_argument("--start", help="первая ночь ГГГГ-ММ-ДД (по умолчанию сегодня)")
+    parser.add_argument("--dry-run", action="store_true", help="только расчет, без публикации")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = run_pricing(args.db, args.start, publish=not args.dry_run)
+    except PricingError as e:
+        logger.error(str(e))
+        return 1
+    print(format_summary(summary))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""
+Предложения цены на проживание: все подходящие номера за один расчет
+
+Цена ночи - тариф номера или его типа на эту ночь (таблицы room_rates и
+type_rates, см. Database.set_rates), а без тарифа - цена номера
+(rooms.price_per_night) с множителем сезона (utils.get_season,
+AppConfig.SEASON_MULTIPLIERS) и множителем спроса (pricing.py). Со всей суммы вычитается скидка за
+длительность (utils.calculate_discount). Так же считает
+Database.get_stay_price для одного номера.
+
+Цены считаются матрицей номера x ночи и кэшируются по (тип номера, даты);
+кэш сбрасывается при добавлении и удалении номеров, смене их цены, типа или
+ремонта и при изменении тарифов. Занятость проверяется при каждом запросе
+одним индексным запросом, поэтому брони и смена статуса номера при заезде,
+выезде и отмене кэш не сбрасывают.
+
+CLI:  python quotes.py 2025-07-01 2025-07-08 [--type Люкс] [--limit 10]
+"""
+import argparse
+import logging
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from cache import LRUCache
+from config import AppConfig
+from database import ChangeEvent, Database, DatabaseError
+from models import Record
+from utils import calculate_discount, date_to_day, format_currency, season_multipliers_by_month
+
+logger = logging.getLogger(__name__)
+
+
+class QuoteError(Exception):
+    """Некорректный запрос предложения"""
+    pass
+
+
+class Quote(Record):
+    """Предложение: номер и стоимость проживания"""
+    __slots__ = ("room_id", "number", "room_type", "nights", "gross", "discount", "total")
+
+    def __init__(self, room_id, number, room_type, nights, gross, discount, total):
+        self.room_id = room_id
+        self.number = number
+        self.room_type = room_type
+        self.nights = nights
+        self.gross = gross          # сумма по ночам без скидки
+        self.discount = discount    # скидка за длительность
+        self.total = total          # к оплате
+
+    @property
+    def average_rate(self) -> float:
+        """Средняя цена ночи с учетом скидки"""
+        return self.total / self.nights
+
+
+def night_multipliers(ci_day: int, co_day: int) -> np.ndarray:
+    """Множители сезона для ночей [ci_day, co_day)"""
+    days = np.arange(ci_day, co_day, dtype=np.int64).astype("datetime64[D]")
+    months = days.astype("datetime64[M]").astype(np.int64) % 12
+    return np.array(season_multipliers_by_month(AppConfig.SEASON_MULTIPLIERS))[months]
+
+
+def _rate_matrix(keys: list, rates, ci_day: int, co_day: int) -> np.ndarray:
+    """
+    Матрица ключ x ночь по строкам (ключ, день, значение); NaN - значения нет
+    Ключи - типы номеров или ID номеров
+    """
+    matrix = np.full((len(keys), co_day - ci_day), np.nan)
+    if rates:
+        index = {key: i for i, key in enumerate(keys)}
+        rows = [(index[key], day - ci_day, price) for key, day, price in rates if key in index]
+        if rows:
+            rows = np.array(rows)
+            matrix[rows[:, 0].astype(np.int64), rows[:, 1].astype(np.int64)] = rows[:, 2]
+    return matrix
+
+
+def price_rooms(rooms, ci_day: int, co_day: int, type_rates=(), room_rates=(),
+                demand=()) -> List[Quote]:
+    """
+    Стоимость проживания [ci_day, co_day) во всех номерах rooms
+    type_rates, room_rates, demand - тарифы и множители спроса
+    (см. Database.get_rates_in_range)
+    Возвращает предложения по возрастанию суммы (при равенстве - по номеру)
+    """
+    nights = co_day - ci_day
+    if not rooms or nights <= 0:
+        return []
+    names = sorted({room.type for room in rooms})
+    type_rows = np.array([names.index(room.type) for room in rooms])
+    base = np.array([room.price_per_night for room in rooms], dtype=np.float64)
+
+    # номера x ночи: тариф номера, иначе тариф типа, иначе цена номера по сезону и спросу
+    factors = np.nan_to_num(_rate_matrix(names, demand, ci_day, co_day), nan=1.0)[type_rows]
+    nightly = base[:, None] * night_multipliers(ci_day, co_day)[None, :] * factors
+    for rates in (_rate_matrix(names, type_rates, ci_day, co_day)[type_rows],
+                  _rate_matrix([room.id for room in rooms], room_rates, ci_day, co_day)):
+        nightly = np.where(np.isnan(rates), nightly, rates)
+
+    gross = np.round(nightly.sum(axis=1), 2)
+    # Скидка зависит только от числа ночей - одна доля на все номера
+    discount_rate, _ = calculate_discount(1.0, nights)
+    discount = np.round(gross * discount_rate, 2)
+    total = np.round(gross - discount, 2)
+
+    order = sorted(range(len(rooms)), key=lambda i: (total[i], _number_key(rooms[i].number)))
+    return [
+        Quote(rooms[i].id, rooms[i].number, rooms[i].type, nights,
+              float(gross[i]), float(discount[i]), float(total[i]))
+        for i in order
+    ]
+
+
+def _number_key(number: str) -> Tuple[int, str]:
+    """Номера комнат сортируются как числа (как в Database.get_all_rooms)"""
+    return (int(number), "") if number.isdigit() else (sys.maxsize, number)
+
+
+class QuoteEngine:
+    """
+    Предложения по свободным номерам на даты
+    Цены кэшируются по (тип номера, день заезда, день выезда).
+    """
+    CACHE_SIZE = 256
+
+    def __init__(self, db: Database):
+        self.db = db
+        self._cache = LRUCache(self.CACHE_SIZE)
+        # Что из номера влияет на цены в кэше: ID -> (тип, цена, на ремонте)
+        self._priced_rooms: Dict[int, Tuple[str, float, bool]] = {}
+        db.subscribe(self._on_db_change)
+
+    @staticmethod
+    def _pricing_key(room) -> Tuple[str, float, bool]:
+        return room.type, room.price_per_night, room.status == Database.ROOM_STATUS_REPAIR
+
+    def _on_db_change(self, events):
+        # Брони влияют только на занятость, а создание и отмена брони меняют
+        # лишь статус номера (Свободен/Занят) - такие события кэш не сбрасывают
+        updated = set()
+        for event in events:
+            if event.entity == ChangeEvent.RATE or (
+                    event.entity == ChangeEvent.ROOM and event.action != ChangeEvent.UPDATE):
+                self.clear()
+                return
+            if event.entity == ChangeEvent.ROOM:
+                updated |= event.ids
+        updated &= self._priced_rooms.keys()
+        if updated and any(
+            self._pricing_key(room) != self._priced_rooms.get(room.id)
+            for room in self.db.get_rooms_by_ids(updated)
+        ):
+            self.clear()
+
+    def clear(self):
+        """Сброс кэша (например, после изменения AppConfig.SEASON_MULTIPLIERS)"""
+        self._cache.clear()
+        self._priced_rooms.clear()
+
+    def close(self):
+        self.db.unsubscribe(self._on_db_change)
+
+    def cache_stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+
+    def _priced(self, room_type: Optional[str], ci_day: int, co_day: int) -> List[Quote]:
+        """Цены всех номеров типа (None - всех типов), кроме номеров на ремонте"""
+        key = (room_type, ci_day, co_day)
+        quotes = self._cache.get(key)
+        if quotes is None:
+            all_rooms = self.db.get_all_rooms()
+            self._priced_rooms.update((room.id, self._pricing_key(room)) for room in all_rooms)
+            rooms = [
+                room for room in all_rooms
+                if room.status != Database.ROOM_STATUS_REPAIR
+                and (room_type is None or room.type == room_type)
+            ]
+            rates = self.db.get_rates_in_range(ci_day, co_day)
+            if rates is None:
+                raise QuoteError("Не удалось прочитать тарифы")
+            quotes = price_rooms(rooms, ci_day, co_day, *rates)
+            self._cache.put(key, quotes)
+        return quotes
+
+    def quote(self, check_in, check_out, room_type: Optional[str] = None,
+              limit: Optional[int] = None) -> List[Quote]:
+        """
+        Свободные на даты номера по возрастанию стоимости
+        check_in, check_out - date или 'ГГГГ-ММ-ДД'; room_type=None - все типы
+        """
+        try:
+            ci_day, co_day = date_to_day(check_in), date_to_day(check_out)
+        except (TypeError, ValueError) as e:
+            raise QuoteError(f"Некорректная дата: {e}")
+        if co_day <= ci_day:
+            raise QuoteError("Дата выезда должна быть позже даты заезда")
+        busy = self.db.get_busy_room_ids(ci_day, co_day)
+        if busy is None:
+            raise QuoteError("Не удалось проверить занятость номеров")
+        quotes = [q for q in self._priced(room_type, ci_day, co_day) if q.room_id not in busy]
+        return quotes[:limit] if limit else quotes
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Предложения по свободным номерам на даты")
+    parser.add_argument("check_in", help="дата заезда ГГГГ-ММ-ДД")
+    parser.add_argument("check_out", help="дата выезда ГГГГ-ММ-ДД")
+    parser.add_argument("--type", dest="room_type", help="тип номера")
+    parser.add_argument("--limit", type=int, default=20, help="сколько предложений показать")
+    parser.add_argument("--db", default=AppConfig.DB_FILE, help="файл БД")
+    args = parser.parse_args(argv)
+
+    try:
+        db = Database(args.db, read_only=True)
+    except DatabaseError as e:
+        logger.error(str(e))
+        return 1
+    try:
+        quotes = QuoteEngine(db).quote(args.check_in, args.check_out, args.room_type, args.limit)
+    except QuoteError as e:
+        logger.error(str(e))
+        return 1
+    finally:
+        db.close()
+
+    print(f"{'Номер':<8} {'Тип номера':<22} {'Ночей':>5} {'Без скидки':>16} {'Скидка':>14} {'Итого':>16}")
+    for q in quotes:
+        print(
+            f"{q.number:<8} {q.room_type:<22} {q.nights:>5} {format_currency(q.gross):>16} "
+            f"{format_currency(q.discount):>14} {format_currency(q.total):>16}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
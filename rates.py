@@ -0,0 +1,118 @@
+"""
+Тарифы по ночам: массовая установка, копирование и просмотр
+
+Тариф задается для типа номера (--type) или отдельного номера (--room);
+тариф номера важнее тарифа типа. Ночь без тарифа стоит rooms.price_per_night
+с множителем сезона (см. Database.NIGHTLY_RATES_SQL).
+
+CLI:
+  python rates.py set 5000 2025-06-01 2025-09-01 --type Люкс [--weekdays 4 5]
+  python rates.py copy 2025-06-01 2025-09-01 2026-06-01 --type Люкс
+  python rates.py clear 2025-06-01 2025-09-01 --room 101
+  python rates.py show 101 2025-07-01 2025-07-08
+"""
+import argparse
+import logging
+import sys
+from typing import Optional
+
+from config import AppConfig
+from database import Database, DatabaseError
+from utils import format_currency
+
+logger = logging.getLogger(__name__)
+
+
+class RatesError(Exception):
+    """Ошибка команды тарифов"""
+    pass
+
+
+def _room_id(db: Database, number: Optional[str]) -> Optional[int]:
+    """ID номера по номеру комнаты"""
+    if number is None:
+        return None
+    for room in db.get_all_rooms():
+        if room.number == number:
+            return room.id
+    raise RatesError(f"Номер '{number}' не найден")
+
+
+def _add_target(parser, prefix: str = "", help_suffix: str = ""):
+    group = parser.add_mutually_exclusive_group(required=not prefix)
+    group.add_argument(f"--{prefix}type", dest=f"{prefix.replace('-', '_')}room_type",
+                       choices=AppConfig.ROOM_TYPES, help=f"тип номера{help_suffix}")
+    group.add_argument(f"--{prefix}room", dest=f"{prefix.replace('-', '_')}room_number",
+                       help=f"номер комнаты{help_suffix}")
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Тарифы номеров по ночам")
+    parser.add_argument("--db", default=AppConfig.DB_FILE, help="файл БД")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    set_parser = commands.add_parser("set", help="установить цену на ночи периода")
+    set_parser.add_argument("price", type=float, help="цена за ночь")
+    set_parser.add_argument("start", help="первая ночь ГГГГ-ММ-ДД")
+    set_parser.add_argument("end", help="конец периода ГГГГ-ММ-ДД (не включается)")
+    set_parser.add_argument("--weekdays", type=int, nargs="+", choices=range(7),
+                            help="только дни недели (0 - понедельник)")
+    _add_target(set_parser)
+
+    clear_parser = commands.add_parser("clear", help="удалить тариф на ночи периода")
+    clear_parser.add_argument("start", help="первая ночь ГГГГ-ММ-ДД")
+    clear_parser.add_argument("end", help="конец периода ГГГГ-ММ-ДД (не включается)")
+    _add_target(clear_parser)
+
+    copy_parser = commands.add_parser("copy", help="скопировать тариф периода на другие даты")
+    copy_parser.add_argument("start", help="первая ночь источника ГГГГ-ММ-ДД")
+    copy_parser.add_argument("end", help="конец источника ГГГГ-ММ-ДД (не включается)")
+    copy_parser.add_argument("to", help="первая ночь назначения ГГГГ-ММ-ДД")
+    _add_target(copy_parser)
+    _add_target(copy_parser, "to-", " назначения (по умолчанию тот же)")
+
+    show_parser = commands.add_parser("show", help="цены ночей номера и стоимость проживания")
+    show_parser.add_argument("room", help="номер комнаты")
+    show_parser.add_argument("check_in", help="дата заезда ГГГГ-ММ-ДД")
+    show_parser.add_argument("check_out", help="дата выезда ГГГГ-ММ-ДД")
+
+    args = parser.parse_args(argv)
+    try:
+        db = Database(args.db, read_only=args.command == "show")
+    except DatabaseError as e:
+        logger.error(str(e))
+        return 1
+    try:
+        if args.command == "show":
+            room_id = _room_id(db, args.room)
+            for night, price in db.get_nightly_rates(room_id, args.check_in, args.check_out):
+                print(f"{night}  {format_currency(price):>16}")
+            total = db.get_stay_price(room_id, args.check_in, args.check_out)
+            if total is None:
+                return 1
+            print(f"{'Итого':<10}  {format_currency(total):>16} (без скидки за длительность)")
+            return 0
+
+        room_id = _room_id(db, args.room_number)
+        if args.command == "set":
+            count = db.set_rates(args.price, args.start, args.end,
+                                 args.room_type, room_id, args.weekdays)
+        elif args.command == "clear":
+            count = db.clear_rates(args.start, args.end, args.room_type, room_id)
+        else:
+            count = db.copy_rates(args.start, args.end, args.to, args.room_type, room_id,
+                                  args.to_room_type, _room_id(db, args.to_room_number))
+    except RatesError as e:
+        logger.error(str(e))
+        return 1
+    finally:
+        db.close()
+    if count is None:
+        return 1
+    print(f"Ночей: {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
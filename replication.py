@@ -0,0 +1,336 @@
+"""
+Инкрементальная репликация hotel.db по журналу изменений changelog
+
+Экспорт:  python replication.py export hotel.db batch.jsonl.gz --since 120 [--replica standby]
+Импорт:   python replication.py apply standby.db batch.jsonl.gz
+Позиция:  python replication.py position standby.db
+
+Пакет - gzip-файл из JSON-строк: заголовок с диапазоном seq, затем
+по одной строке на измененную запись (актуальные значения или удаление).
+Несколько изменений одной записи схлопываются в одно. Таблицы тарифов
+и множителей спроса без id реплицируются по дням: строка пакета содержит
+все строки таблицы за день, и реплика заменяет ими свои.
+
+Позиция --since, с которой реплика запросила пакет, уже ею применена:
+экспорт запоминает ее в таблице replication_acks источника, и обслуживание
+(maintenance.py) не удаляет записи журнала после нее.
+"""
+import argparse
+import gzip
+import json
+import logging
+import sqlite3
+import sys
+from typing import Dict, List, Tuple
+
+from revenue import refresh_nightly_revenue
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Формат 2: добавлены строки замены дня ("replace"); пакеты формата 1 тоже применяются
+BATCH_FORMAT = 2
+SUPPORTED_FORMATS = (1, 2)
+
+# Сущность журнала -> таблица (порядок важен для внешних ключей)
+ENTITY_TABLES = {
+    "room": "rooms",
+    "guest": "guests",
+    "booking": "bookings",
+    "type_rate": "type_rates",
+    "room_rate": "room_rates",
+    "demand": "demand_factors"
+}
+
+# Таблицы без id: сущность -> колонка, которую указывает журнал
+# (см. Database.CHANGELOG_TABLES); реплицируются все строки с этим значением
+GROUP_KEYS = {
+    "type_rate": "day",
+    "room_rate": "day",
+    "demand": "day"
+}
+
+# Порция значений в одном запросе IN (...)
+ID_CHUNK = 500
+
+# Имя реплики, если у источника она одна
+DEFAULT_REPLICA = "standby"
+
+
+class ReplicationError(Exception):
+    """Ошибка экспорта или применения пакета"""
+    pass
+
+
+def _connect(db_file: str) -> sqlite3.Connection:
+    try:
+        return sqlite3.connect(db_file)
+    except sqlite3.Error as e:
+        raise ReplicationError(f"Не удалось открыть '{db_file}': {e}")
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    """Хранимые колонки таблицы (генерируемые пропускаются)"""
+    rows = conn.execute(f"PRAGMA table_xinfo({table})").fetchall()
+    return [row[1] for row in rows if row[6] == 0]
+
+
+def get_position(conn: sqlite3.Connection) -> int:
+    """
+    Последний примененный seq источника.
+    Для свежей полной копии файла это конец ее собственного журнала.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS replication_state (
+            id INTEGER PRIMARY KEY CHECK(id = 1),
+            applied_seq INTEGER NOT NULL
+        )
+    """)
+    row = conn.execute("SELECT applied_seq FROM replication_state WHERE id = 1").fetchone()
+    if row:
+        return row[0]
+    row = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changelog").fetchone()
+    return row[0]
+
+
+def record_ack(conn: sqlite3.Connection, replica: str, seq: int):
+    """Реплика подтвердила применение журнала до seq (таблица источника)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS replication_acks (
+            replica TEXT PRIMARY KEY,
+            applied_seq INTEGER NOT NULL,
+            acked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute(
+        """INSERT OR REPLACE INTO replication_acks (replica, applied_seq, acked_at) 
+           VALUES (?, ?, CURRENT_TIMESTAMP)""",
+        (replica, seq)
+    )
+
+
+def _export_groups(conn: sqlite3.Connection, entity: str, table: str,
+                   columns: List[str], keys: List[int]) -> List[dict]:
+    """Строки замены: все строки таблицы для каждого измененного значения ключа"""
+    key = GROUP_KEYS[entity]
+    found: Dict[int, List[dict]] = {value: [] for value in keys}
+    # Одно чтение диапазона вместо поиска по каждому значению (индекса по ключу нет)
+    for row in conn.execute(
+        f"SELECT {', '.join(columns)} FROM {table} WHERE {key} BETWEEN ? AND ?",
+        (keys[0], keys[-1])
+    ):
+        row = dict(zip(columns, row))
+        if row[key] in found:
+            found[row[key]].append(row)
+    return [
+        {"entity": entity, "op": "replace", "key": value, "rows": rows}
+        for value, rows in found.items()
+    ]
+
+
+def export_changes(db_file: str, out_file: str, since: int,
+                   replica: str = DEFAULT_REPLICA) -> Tuple[int, int]:
+    """
+    Экспорт изменений с seq > since в пакет
+    since - позиция реплики replica: записывается как подтвержденная
+    Возвращает (последний seq, количество записей в пакете)
+    """
+    conn = _connect(db_file)
+    try:
+        # Подтверждение сохраняется и тогда, когда пакет собрать не удалось
+        record_ack(conn, replica, since)
+        conn.commit()
+
+        # Одна транзакция чтения - журнал и строки согласованы
+        conn.execute("BEGIN")
+        min_seq, max_seq = conn.execute(
+            "SELECT MIN(seq), MAX(seq) FROM changelog"
+        ).fetchone()
+        row = conn.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'changelog'"
+        ).fetchone()
+        last_seq = row[0] if row else 0
+
+        # Журнал обрезается обслуживанием - проверяем, что нет пропуска
+        if since < last_seq and (min_seq is None or min_seq > since + 1):
+            raise ReplicationError(
+                f"Записи журнала после seq {since} уже удалены - нужна полная копия файла"
+            )
+
+        # Последнее изменение каждой записи
+        changed: Dict[Tuple[str, int], int] = {}
+        for entity, entity_id, seq in conn.execute(
+            "SELECT entity, entity_id, seq FROM changelog WHERE seq > ? ORDER BY seq",
+            (since,)
+        ):
+            changed[(entity, entity_id)] = seq
+
+        records = []
+        for entity, table in ENTITY_TABLES.items():
+            ids = sorted(entity_id for (e, entity_id) in changed if e == entity)
+            if not ids:
+                continue
+            columns = _table_columns(conn, table)
+            if entity in GROUP_KEYS:
+                records.extend(_export_groups(conn, entity, table, columns, ids))
+                continue
+            found = {}
+            for start in range(0, len(ids), ID_CHUNK):
+                chunk = ids[start:start + ID_CHUNK]
+                placeholders = ", ".join("?" * len(chunk))
+                for row in conn.execute(
+                    f"SELECT {', '.join(columns)} FROM {table} WHERE id IN ({placeholders})",
+                    chunk
+                ):
+                    found[row[0]] = dict(zip(columns, row))
+            for entity_id in ids:
+                if entity_id in found:
+                    records.append({"entity": entity, "op": "upsert", "row": found[entity_id]})
+                else:
+                    records.append({"entity": entity, "op": "delete", "id": entity_id})
+        conn.rollback()
+    except sqlite3.Error as e:
+        raise ReplicationError(f"Ошибка чтения журнала: {e}")
+    finally:
+        conn.close()
+
+    to_seq = max(since, max_seq or 0)
+    header = {"format": BATCH_FORMAT, "from_seq": since, "to_seq": to_seq, "count": len(records)}
+    with gzip.open(out_file, "wt", encoding="utf-8") as f:
+        f.write(json.dumps(header, ensure_ascii=False) + "\n")
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    logger.info(f"Экспортировано записей: {len(records)} (seq {since} -> {to_seq})")
+    return to_seq, len(records)
+
+
+def _read_batch(batch_file: str) -> Tuple[dict, List[dict]]:
+    try:
+        with gzip.open(batch_file, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            records = [json.loads(line) for line in f if line.strip()]
+    except (OSError, ValueError) as e:
+        raise ReplicationError(f"Не удалось прочитать пакет '{batch_file}': {e}")
+    if header.get("format") not in SUPPORTED_FORMATS:
+        raise ReplicationError(f"Неподдерживаемый формат пакета: {header.get('format')}")
+    if len(records) != header.get("count"):
+        raise ReplicationError("Пакет поврежден: число записей не совпадает с заголовком")
+    return header, records
+
+
+def apply_batch(db_file: str, batch_file: str) -> int:
+    """
+    Применение пакета к реплике в одной транзакции
+    Возвращает новую позицию реплики
+    """
+    header, records = _read_batch(batch_file)
+    conn = _connect(db_file)
+    try:
+        position = get_position(conn)
+        if header["from_seq"] > position:
+            raise ReplicationError(
+                f"Пакет начинается с seq {header['from_seq']}, а реплика на {position} - "
+                "пропущены изменения"
+            )
+        if header["to_seq"] <= position:
+            logger.info("Пакет уже применен")
+            return position
+
+        # Записи идемпотентны, поэтому перекрывающийся пакет безопасен
+        conn.execute("BEGIN IMMEDIATE")
+        upserts = [r for r in records if r["op"] == "upsert"]
+        deletes = [r for r in records if r["op"] == "delete"]
+        replaces = [r for r in records if r["op"] == "replace"]
+
+        # Удаления: сначала зависимые таблицы
+        for entity in reversed(list(ENTITY_TABLES)):
+            ids = [(r["id"],) for r in deletes if r["entity"] == entity]
+            if ids:
+                conn.executemany(f"DELETE FROM {ENTITY_TABLES[entity]} WHERE id = ?", ids)
+            keys = [r["key"] for r in replaces if r["entity"] == entity]
+            for start in range(0, len(keys), ID_CHUNK):
+                chunk = keys[start:start + ID_CHUNK]
+                conn.execute(
+                    f"""DELETE FROM {ENTITY_TABLES[entity]} 
+                        WHERE {GROUP_KEYS[entity]} IN ({', '.join('?' * len(chunk))})""",
+                    chunk
+                )
+
+        # Вставки и обновления: сначала справочники
+        for entity, table in ENTITY_TABLES.items():
+            rows = [r["row"] for r in upserts if r["entity"] == entity]
+            rows += [row for r in replaces if r["entity"] == entity for row in r["rows"]]
+            if not rows:
+                continue
+            columns = _table_columns(conn, table)
+            placeholders = ", ".join("?" * len(columns))
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                [tuple(row.get(col) for col in columns) for row in rows]
+            )
+
+        # Выручка по ночам не реплицируется - пересчитывается из примененных броней.
+        # Удаления броней в журнале - перенос в архив, их ночи остаются, как на источнике
+        booking_ids = [r["row"]["id"] for r in upserts if r["entity"] == "booking"]
+        has_revenue = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'nightly_revenue'"
+        ).fetchone()
+        if booking_ids and has_revenue:
+            refresh_nightly_revenue(conn, booking_ids)
+
+        conn.execute(
+            "INSERT OR REPLACE INTO replication_state (id, applied_seq) VALUES (1, ?)",
+            (header["to_seq"],)
+        )
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        raise ReplicationError(f"Ошибка применения пакета: {e}")
+    finally:
+        conn.close()
+
+    logger.info(f"Применено записей: {len(records)}, позиция реплики {header['to_seq']}")
+    return header["to_seq"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Инкрементальная репликация hotel.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="выгрузить изменения в пакет")
+    export_parser.add_argument("db", help="исходная БД")
+    export_parser.add_argument("out", help="файл пакета (.jsonl.gz)")
+    export_parser.add_argument("--since", type=int, required=True,
+                               help="позиция реплики (вывод команды position)")
+    export_parser.add_argument("--replica", default=DEFAULT_REPLICA,
+                               help="имя реплики, для которой выгружается пакет")
+
+    apply_parser = commands.add_parser("apply", help="применить пакет к реплике")
+    apply_parser.add_argument("db", help="БД реплики")
+    apply_parser.add_argument("batch", help="файл пакета")
+
+    position_parser = commands.add_parser("position", help="позиция реплики")
+    position_parser.add_argument("db", help="БД реплики")
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "export":
+            export_changes(args.db, args.out, args.since, args.replica)
+        elif args.command == "apply":
+            apply_batch(args.db, args.batch)
+        elif args.command == "position":
+            conn = _connect(args.db)
+            try:
+                print(get_position(conn))
+                conn.commit()
+            finally:
+                conn.close()
+    except ReplicationError as e:
+        logger.error(str(e))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
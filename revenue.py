@@ -0,0 +1,100 @@
+"""
+Признание выручки по ночам проживания
+
+Стоимость брони (bookings.total_price - сумма ночей без скидки) делится
+между ее ночами, скидка за длительность (utils.calculate_discount) - так же;
+к оплате - их разность. Суммы хранятся в копейках в таблице
+nightly_revenue (одна строка на ночь), поэтому выручка за любой период -
+сумма по диапазону дней, а бронь с 28 марта по 10 апреля честно делится
+между мартом и апрелем.
+
+Таблица поддерживается в тех же транзакциях, что меняют брони (Database,
+replication.py).
+"""
+import sqlite3
+from typing import Iterable, List, Tuple
+
+from utils import calculate_discount
+
+# Статусы броней, выручка которых признается (Database.BOOKING_STATUS_ACTIVE
+# и BOOKING_STATUS_COMPLETED); отмененные брони не учитываются
+RECOGNIZED_STATUSES = ("Активно", "Завершено")
+
+# Порция ID в одном запросе IN (...)
+ID_CHUNK = 500
+
+
+def _spread(total: int, parts: int) -> List[int]:
+    """Деление целой суммы на части: остаток по копейке в первые части"""
+    base, remainder = divmod(total, parts)
+    return [base + 1] * remainder + [base] * (parts - remainder)
+
+
+def split_nights(ci_day: int, co_day: int, total_price: float) -> List[Tuple[int, int, int]]:
+    """
+    Ночи брони: (номер дня, стоимость, скидка) в копейках.
+    Суммы по ночам в точности равны стоимости и скидке брони.
+    """
+    nights = co_day - ci_day
+    if nights <= 0:
+        return []
+    discount, _ = calculate_discount(total_price, nights)
+    gross = _spread(round(total_price * 100), nights)
+    discounts = _spread(round(discount * 100), nights)
+    return [(ci_day + i, gross[i], discounts[i]) for i in range(nights)]
+
+
+def _nightly_rows(bookings: Iterable[Tuple[int, int, int, float, str]]):
+    for booking_id, ci_day, co_day, total_price, status in bookings:
+        if status not in RECOGNIZED_STATUSES:
+            continue
+        for day, gross, discount in split_nights(ci_day, co_day, total_price):
+            yield day, booking_id, gross, discount
+
+
+def refresh_nightly_revenue(conn: sqlite3.Connection, booking_ids, table: str = "main.bookings"):
+    """
+    Пересчет ночей для броней по их текущему состоянию (удаленные и
+    отмененные брони просто убираются). Выполняется в текущей транзакции conn.
+    """
+    booking_ids = list(booking_ids)
+    for start in range(0, len(booking_ids), ID_CHUNK):
+        chunk = booking_ids[start:start + ID_CHUNK]
+        placeholders = ", ".join("?" * len(chunk))
+        conn.execute(f"DELETE FROM nightly_revenue WHERE booking_id IN ({placeholders})", chunk)
+        rows = conn.execute(
+            f"""SELECT id, ci_day, co_day, total_price, status FROM {table}
+                WHERE id IN ({placeholders})""",
+            chunk
+        ).fetchall()
+        conn.executemany(
+            "INSERT INTO nightly_revenue (day, booking_id, gross, discount) VALUES (?, ?, ?, ?)",
+            _nightly_rows(rows)
+        )
+
+
+def rebuild_nightly_revenue(conn: sqlite3.Connection, table: str = "main.bookings") -> int:
+    """
+    Заполнение ночей для всех броней таблицы, у которых их еще нет.
+    Возвращает количество обработанных броней.
+    """
+    cursor = conn.execute(
+        f"""SELECT id, ci_day, co_day, total_price, status FROM {table} b
+            WHERE status IN ({", ".join("?" * len(RECOGNIZED_STATUSES))})
+            AND NOT EXISTS (SELECT 1 FROM nightly_revenue n WHERE n.booking_id = b.id)""",
+        RECOGNIZED_STATUSES
+    )
+    count = 0
+    try:
+        while True:
+            rows = cursor.fetchmany(10000)
+            if not rows:
+                break
+            conn.executemany(
+                "INSERT INTO nightly_revenue (day, booking_id, gross, discount) VALUES (?, ?, ?, ?)",
+                _nightly_rows(rows)
+            )
+            count += len(rows)
+    finally:
+        cursor.close()
+    return count
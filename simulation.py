@@ -0,0 +1,333 @@
+"""
+Моделирование перебронирования методом Монте-Карло
+
+Модель калибруется по истории броней (AppConfig.SIMULATION_HISTORY_DAYS):
+  - доля отмен по сроку бронирования (дней от создания до заезда) и
+    длительности проживания; в малых группах сглаживается к общей доле;
+  - кривая набора: сколько номеро-ночей в среднем бронируется на ночь
+    позже, чем за L дней до нее, и какая доля из них отменяется;
+  - средняя цена проданной ночи (ADR).
+
+Для каждой ночи горизонта и уровня перебронирования k (продаем до
+вместимость + k) разыгрываются сценарии: каждая текущая активная бронь
+доезжает или отменяется целиком; новый спрос на ночь - пуассоновский, из
+него принимается не больше свободного остатка, и часть принятых отменяется.
+Гости сверх вместимости - переселенные (walk), каждый стоит
+AppConfig.SIMULATION_WALK_COST_ADR средних цен ночи.
+
+Сценарии делятся на порции и считаются в пуле процессов; внутри порции все
+броски - массивы NumPy (сценарии x брони, сценарии x уровни x ночи).
+
+Допущения: время отмены в БД не хранится, поэтому для текущих броней берется
+доля отмен их группы целиком, без учета того, что бронь уже дожила до сегодня;
+кривая набора усреднена по году без сезонности; история ограничена
+вместимостью (отказы в продаже в ней не видны).
+
+CLI:  python simulation.py [--nights 30] [--levels 0 1 2 5 10] [--scenarios 10000]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from config import AppConfig
+from database import Database, DatabaseError
+from utils import date_to_day, format_currency
+
+logger = logging.getLogger(__name__)
+
+# Границы групп: срок бронирования (дней до заезда) и длительность (ночей)
+LEAD_BUCKETS = (0, 1, 3, 7, 14, 30, 60, 90)
+LOS_BUCKETS = (1, 2, 4, 7, 14)
+# Вес общей доли отмен при сглаживании группы (в "броненях")
+PRIOR_WEIGHT = 20
+# Сценариев в одной порции пула
+CHUNK_SCENARIOS = 2000
+
+
+class SimulationError(Exception):
+    """Ошибка моделирования"""
+    pass
+
+
+class BookingModel:
+    """Параметры, откалиброванные по истории броней"""
+    def __init__(self, cancel_rates: np.ndarray, pickup: np.ndarray,
+                 pickup_cancel: np.ndarray, adr: float, bookings: int):
+        self.cancel_rates = cancel_rates    # (группы срока, группы длительности)
+        self.pickup = pickup                # [L] номеро-ночей на ночь, бронируемых позже, чем за L дней
+        self.pickup_cancel = pickup_cancel  # [L] доля отмен среди них
+        self.adr = adr
+        self.bookings = bookings            # броней в истории
+
+    def cancel_rate(self, lead: np.ndarray, nights: np.ndarray) -> np.ndarray:
+        """Доля отмен для броней со сроком lead и длительностью nights"""
+        return self.cancel_rates[_bucket(lead, LEAD_BUCKETS), _bucket(nights, LOS_BUCKETS)]
+
+
+class SimulationInput:
+    """Данные горизонта: текущие брони и ожидаемый спрос по ночам"""
+    def __init__(self, capacity: int, survive: np.ndarray, cover: np.ndarray,
+                 demand: np.ndarray, new_cancel: np.ndarray, adr: float, walk_cost: float):
+        self.capacity = capacity
+        self.survive = survive          # (брони,) вероятность заезда текущей брони
+        self.cover = cover              # (брони, ночи) 1 - бронь занимает ночь
+        self.on_books = cover.sum(axis=0)
+        self.demand = demand            # (ночи,) средний новый спрос
+        self.new_cancel = new_cancel    # (ночи,) доля отмен нового спроса
+        self.adr = adr
+        self.walk_cost = walk_cost      # стоимость одного переселения
+
+
+class SimulationResult:
+    """Итоги сценариев по уровням перебронирования (строки - уровни)"""
+    def __init__(self, levels: List[int], walked: np.ndarray, revenue: np.ndarray, seconds: float):
+        self.levels = levels
+        self.walked = walked      # (уровни, сценарии) переселенных гостей за горизонт
+        self.revenue = revenue    # (уровни, сценарии) выручка минус стоимость переселений
+        self.seconds = seconds
+
+    @property
+    def best_level(self) -> int:
+        """Уровень с наибольшей средней выручкой"""
+        return self.levels[int(np.argmax(self.revenue.mean(axis=1)))]
+
+    def summary(self) -> List[Dict]:
+        """Распределения по уровням: переселения и выручка (среднее и процентили)"""
+        rows = []
+        for i, level in enumerate(self.levels):
+            walked, revenue = self.walked[i], self.revenue[i]
+            rows.append({
+                "level": level,
+                "walked_mean": float(walked.mean()),
+                "walked_p95": float(np.percentile(walked, 95)),
+                "walk_probability": float((walked > 0).mean()),
+                "revenue_mean": float(revenue.mean()),
+                "revenue_p5": float(np.percentile(revenue, 5)),
+                "revenue_p50": float(np.percentile(revenue, 50)),
+                "revenue_p95": float(np.percentile(revenue, 95))
+            })
+        return rows
+
+
+def _bucket(values: np.ndarray, edges: Sequence[int]) -> np.ndarray:
+    """Номер группы: последняя граница, не превышающая значение"""
+    return np.clip(np.searchsorted(edges, values, side="right") - 1, 0, len(edges) - 1)
+
+
+def calibrate(db: Database, today: date, history_days: Optional[int] = None,
+              room_type: Optional[str] = None) -> BookingModel:
+    """Калибровка модели по броням с ночами в [today - history_days, today)"""
+    history_days = history_days or AppConfig.SIMULATION_HISTORY_DAYS
+    start = today - timedelta(days=history_days)
+    rows = db.get_booking_leads(start.isoformat(), today.isoformat(), room_type)
+    if not rows:
+        raise SimulationError("Нет истории броней для калибровки")
+    ci_day = np.array([row[0] for row in rows], dtype=np.int64)
+    co_day = np.array([row[1] for row in rows], dtype=np.int64)
+    lead = np.maximum(np.array([row[2] for row in rows], dtype=np.int64), 0)
+    price = np.array([row[3] for row in rows], dtype=np.float64)
+    cancelled = np.array([row[4] == Database.BOOKING_STATUS_CANCELLED for row in rows])
+    nights = co_day - ci_day
+
+    # Доля отмен по группам, сглаженная к общей доле
+    overall = cancelled.mean()
+    groups = _bucket(lead, LEAD_BUCKETS) * len(LOS_BUCKETS) + _bucket(nights, LOS_BUCKETS)
+    size = len(LEAD_BUCKETS) * len(LOS_BUCKETS)
+    totals = np.bincount(groups, minlength=size)
+    cancels = np.bincount(groups, weights=cancelled, minlength=size)
+    cancel_rates = ((cancels + PRIOR_WEIGHT * overall) / (totals + PRIOR_WEIGHT)).reshape(
+        len(LEAD_BUCKETS), len(LOS_BUCKETS)
+    )
+
+    # Ночи броней внутри окна истории; срок ночи = срок брони + номер ночи в брони
+    first_day, last_day = date_to_day(start), date_to_day(today)
+    booking = np.repeat(np.arange(len(rows)), nights)
+    offset = np.arange(len(booking)) - np.repeat(np.cumsum(nights) - nights, nights)
+    night = ci_day[booking] + offset
+    inside = (night >= first_day) & (night < last_day)
+    booking, night_lead = booking[inside], (lead[booking] + offset)[inside]
+    night_cancelled = cancelled[booking]
+
+    horizon = AppConfig.SIMULATION_MAX_NIGHTS + 1
+    night_lead = np.minimum(night_lead, horizon)
+    # pickup[L] - ночи, забронированные не ранее чем за L дней (срок <= L)
+    per_lead = np.bincount(night_lead, minlength=horizon + 1)[:horizon]
+    per_lead_cancelled = np.bincount(night_lead, weights=night_cancelled, minlength=horizon + 1)[:horizon]
+    booked = np.cumsum(per_lead)
+    pickup = booked / history_days
+    pickup_cancel = np.where(booked > 0, np.cumsum(per_lead_cancelled) / np.maximum(booked, 1), overall)
+
+    sold = ~night_cancelled
+    nightly_price = (price / nights)[booking]
+    adr = float(nightly_price[sold].mean()) if sold.any() else float((price / nights).mean())
+    return BookingModel(cancel_rates, pickup, pickup_cancel, adr, len(rows))
+
+
+def prepare(db: Database, model: BookingModel, today: date, nights: int,
+            room_type: Optional[str] = None) -> SimulationInput:
+    """Текущие активные брони и ожидаемый спрос на ночи [today, today + nights)"""
+    rooms = [
+        room for room in db.get_all_rooms()
+        if room.status != Database.ROOM_STATUS_REPAIR and (room_type is None or room.type == room_type)
+    ]
+    if not rooms:
+        raise SimulationError("Нет номеров для моделирования")
+    end = today + timedelta(days=nights)
+    rows = [
+        row for row in db.get_booking_leads(today.isoformat(), end.isoformat(), room_type)
+        if row[4] == Database.BOOKING_STATUS_ACTIVE
+    ]
+    first_day = date_to_day(today)
+    ci_day = np.array([row[0] for row in rows], dtype=np.int64)
+    co_day = np.array([row[1] for row in rows], dtype=np.int64)
+    lead = np.maximum(np.array([row[2] for row in rows], dtype=np.int64), 0)
+
+    days = first_day + np.arange(nights)
+    cover = ((ci_day[:, None] <= days[None, :]) & (co_day[:, None] > days[None, :])).astype(np.float32)
+    survive = 1.0 - model.cancel_rate(lead, co_day - ci_day)
+    # Спрос, который еще придет на ночь через i дней: брони со сроком не больше i
+    days_out = np.arange(nights)
+    demand = model.pickup[np.minimum(days_out, len(model.pickup) - 1)]
+    new_cancel = model.pickup_cancel[np.minimum(days_out, len(model.pickup_cancel) - 1)]
+    return SimulationInput(
+        len(rooms), survive.astype(np.float32), cover, demand, new_cancel,
+        model.adr, model.adr * AppConfig.SIMULATION_WALK_COST_ADR
+    )
+
+
+def _simulate_chunk(data: SimulationInput, levels: List[int], scenarios: int, seed) -> tuple:
+    """Порция сценариев (выполняется в процессе пула)"""
+    rng = np.random.default_rng(seed)
+    # Текущие брони: заезд или отмена целиком, гостей по ночам - (сценарии, ночи)
+    arrived = rng.random((scenarios, len(data.survive)), dtype=np.float32) < data.survive
+    shows = arrived.astype(np.float32) @ data.cover
+
+    # Новый спрос: принимается до вместимость + k, часть принятых отменяется
+    demand = rng.poisson(data.demand, size=(scenarios, len(data.demand)))
+    room_left = np.maximum(
+        data.capacity + np.asarray(levels)[:, None] - data.on_books[None, :], 0
+    ).astype(np.int64)
+    accepted = np.minimum(demand[:, None, :], room_left[None, :, :])
+    new_shows = rng.binomial(accepted, 1.0 - data.new_cancel)
+
+    guests = shows[:, None, :] + new_shows                       # (сценарии, уровни, ночи)
+    walked = np.maximum(guests - data.capacity, 0).sum(axis=2)
+    sold = np.minimum(guests, data.capacity).sum(axis=2)
+    revenue = sold * data.adr - walked * data.walk_cost
+    return walked.T, revenue.T
+
+
+def _check_parameters(levels: Sequence[int], scenarios: int) -> List[int]:
+    """Проверка уровней и числа сценариев; возвращает уровни по возрастанию без повторов"""
+    levels = sorted(set(int(level) for level in levels))
+    if not levels or levels[0] < 0:
+        raise SimulationError("Уровни перебронирования - неотрицательные числа")
+    if scenarios < 1:
+        raise SimulationError("Число сценариев должно быть не меньше 1")
+    return levels
+
+
+def simulate(data: SimulationInput, levels: Sequence[int], scenarios: int,
+             workers: Optional[int] = None, seed: Optional[int] = None) -> SimulationResult:
+    """Сценарии порциями в пуле процессов (workers=1 - в текущем процессе)"""
+    started = time.perf_counter()
+    levels = _check_parameters(levels, scenarios)
+    if not len(data.demand):
+        raise SimulationError("Горизонт моделирования пуст - нужна хотя бы одна ночь")
+    sizes = [min(CHUNK_SCENARIOS, scenarios - start) for start in range(0, scenarios, CHUNK_SCENARIOS)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(sizes) == 1:
+        parts = [_simulate_chunk(data, levels, size, s) for size, s in zip(sizes, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(sizes))) as pool:
+            parts = list(pool.map(_simulate_chunk, [data] * len(sizes), [levels] * len(sizes),
+                                  sizes, seeds))
+    walked = np.concatenate([part[0] for part in parts], axis=1)
+    revenue = np.concatenate([part[1] for part in parts], axis=1)
+    return SimulationResult(levels, walked, revenue, time.perf_counter() - started)
+
+
+def run_simulation(db: Database, nights: Optional[int] = None, levels: Sequence[int] = range(11),
+                   scenarios: Optional[int] = None, workers: Optional[int] = None,
+                   room_type: Optional[str] = None, seed: Optional[int] = None,
+                   today: Optional[date] = None) -> SimulationResult:
+    """Калибровка по истории, данные горизонта и сценарии"""
+    nights = AppConfig.SIMULATION_NIGHTS if nights is None else nights
+    scenarios = AppConfig.SIMULATION_SCENARIOS if scenarios is None else scenarios
+    if not 0 < nights <= AppConfig.SIMULATION_MAX_NIGHTS:
+        raise SimulationError(f"Горизонт - от 1 до {AppConfig.SIMULATION_MAX_NIGHTS} ночей")
+    # Параметры проверяются до чтения истории
+    _check_parameters(levels, scenarios)
+    today = today or date.today()
+    # История и текущие брони - из одного снимка, если соединение только для чтения
+    with db.read_snapshot() if db.read_only else nullcontext():
+        model = calibrate(db, today, room_type=room_type)
+        data = prepare(db, model, today, nights, room_type)
+    logger.info(
+        f"Модель: броней в истории {model.bookings}, ADR {format_currency(model.adr)}, "
+        f"текущих броней {len(data.survive)}, номеров {data.capacity}"
+    )
+    return simulate(data, levels, scenarios, workers, seed)
+
+
+def format_results(result: SimulationResult) -> str:
+    lines = [
+        f"{'Уровень':>7} {'Переселено':>10} {'p95':>5} {'P(>0)':>6} "
+        f"{'Выручка, среднее':>20} {'p5':>18} {'p50':>18} {'p95':>18}"
+    ]
+    for row in result.summary():
+        lines.append(
+            f"{row['level']:>7} {row['walked_mean']:>10.2f} {row['walked_p95']:>5.0f} "
+            f"{row['walk_probability'] * 100:>5.1f}% {format_currency(row['revenue_mean']):>20} "
+            f"{format_currency(row['revenue_p5']):>18} {format_currency(row['revenue_p50']):>18} "
+            f"{format_currency(row['revenue_p95']):>18}"
+        )
+    lines.append(
+        f"Лучший уровень по средней выручке: {result.best_level}; "
+        f"сценариев {result.walked.shape[1]} за {result.seconds:.2f} с"
+    )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Моделирование перебронирования")
+    parser.add_argument("--nights", type=int, default=AppConfig.SIMULATION_NIGHTS, help="горизонт, ночей")
+    parser.add_argument("--levels", type=int, nargs="+", default=list(range(11)),
+                        help="уровни перебронирования (номеров сверх вместимости)")
+    parser.add_argument("--scenarios", type=int, default=AppConfig.SIMULATION_SCENARIOS)
+    parser.add_argument("--workers", type=int, help="процессов (по умолчанию по числу ядер)")
+    parser.add_argument("--type", dest="room_type", choices=AppConfig.ROOM_TYPES, help="только этот тип номера")
+    parser.add_argument("--seed", type=int, help="зерно генератора для повторяемости")
+    parser.add_argument("--db", default=AppConfig.DB_FILE, help="файл БД")
+    parser.add_argument("--archive", default=AppConfig.ARCHIVE_FILE, help="файл архива броней")
+    args = parser.parse_args(argv)
+
+    try:
+        db = Database(args.db, archive_file=args.archive, storage_profile="reporting", read_only=True)
+    except DatabaseError as e:
+        logger.error(str(e))
+        return 1
+    try:
+        result = run_simulation(db, args.nights, args.levels, args.scenarios, args.workers,
+                                args.room_type, args.seed)
+    except (SimulationError, DatabaseError) as e:
+        logger.error(str(e))
+        return 1
+    finally:
+        db.close()
+    print(format_results(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
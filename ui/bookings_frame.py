@@ -1,13 +1,31 @@
 import customtkinter as ctk
-from tkinter import ttk, messagebox
-from tkcalendar import DateEntry
-from datetime import datetime, date
+import logging
+import queue
+import threading
+from tkinter import ttk, messagebox, filedialog
+from datetime import datetime, date, timedelta
+from config import AppConfig
+from database import ChangeEvent
+from quotes import QuoteEngine, QuoteError
+from utils import format_currency
+from .search_pipeline import SearchPipeline
+from .virtual_table import VirtualTable, QuerySource
+
+logger = logging.getLogger(__name__)
 
 class AddBookingDialog(ctk.CTkToplevel):
-    def __init__(self, master, db, on_close_callback):
+    ALL_TYPES = "Все типы"
+
+    def __init__(self, master, db, on_close_callback=None, quotes=None):
         super().__init__(master)
+        # tkcalendar загружается только при открытии диалога
+        from tkcalendar import DateEntry
+        
         self.db = db
         self.on_close_callback = on_close_callback
+        # Движок предложений окна бронирований (общий кэш цен) или свой
+        self.own_quotes = quotes is None
+        self.quotes = quotes or QuoteEngine(db)
 
         self.title("Новое бронирование")
         self.geometry("450x650")
@@ -21,36 +39,29 @@ class AddBookingDialog(ctk.CTkToplevel):
         # --- Выбор комнаты ---
         self.room_label = ctk.CTkLabel(
             self.scrollable, 
-            text="Выберите свободный номер:", 
+            text="Свободные номера (дешевле - выше):", 
             font=ctk.CTkFont(weight="bold")
         )
         self.room_label.pack(padx=20, pady=(10, 5))
         
-        free_rooms = [
-            f"№{r[1]} - {r[2]} ({r[3]} руб/ночь)" 
-            for r in self.db.get_all_rooms() 
-            if r[4] == self.db.ROOM_STATUS_FREE
-        ]
+        self.type_menu = ctk.CTkOptionMenu(
+            self.scrollable,
+            values=[self.ALL_TYPES] + AppConfig.ROOM_TYPES,
+            command=self.calculate_price
+        )
+        self.type_menu.pack(padx=20, pady=5, fill="x")
         
-        if not free_rooms:
-            ctk.CTkLabel(
-                self.scrollable, 
-                text="Нет свободных номеров!", 
-                text_color="red"
-            ).pack(padx=20, pady=5)
-            self.room_menu = None
-        else:
-            self.room_map = {
-                f"№{r[1]} - {r[2]} ({r[3]} руб/ночь)": (r[0], r[3]) 
-                for r in self.db.get_all_rooms() 
-                if r[4] == self.db.ROOM_STATUS_FREE
-            }
-            self.room_menu = ctk.CTkOptionMenu(
-                self.scrollable, 
-                values=free_rooms,
-                command=self.on_room_selected
-            )
-            self.room_menu.pack(padx=20, pady=5, fill="x")
+        # Предложения пересчитываются при смене дат или типа
+        self.quote_map = {}
+        self.room_menu = ctk.CTkOptionMenu(
+            self.scrollable, 
+            values=[""],
+            command=self.on_room_selected
+        )
+        self.room_menu.pack(padx=20, pady=5, fill="x")
+        
+        self.no_rooms_label = ctk.CTkLabel(self.scrollable, text="", text_color="red")
+        self.no_rooms_label.pack(padx=20, pady=(0, 5))
         
         # --- Информация о госте ---
         ctk.CTkLabel(
@@ -122,6 +133,7 @@ class AddBookingDialog(ctk.CTkToplevel):
             width=30,
             mindate=date.today()
         )
+        self.checkout_entry.set_date(date.today() + timedelta(days=1))
         self.checkout_entry.pack(padx=20, pady=5)
         self.checkout_entry.bind("<<DateEntrySelected>>", self.calculate_price)
 
@@ -135,6 +147,12 @@ class AddBookingDialog(ctk.CTkToplevel):
         )
         self.nights_label.pack(pady=(10, 5))
         
+        self.discount_label = ctk.CTkLabel(
+            self.price_frame, 
+            text="Без скидки: 0 руб, скидка: 0 руб"
+        )
+        self.discount_label.pack(pady=5)
+        
         self.total_label = ctk.CTkLabel(
             self.price_frame, 
             text="Итого: 0 руб", 
@@ -162,6 +180,12 @@ class AddBookingDialog(ctk.CTkToplevel):
         self.save_button.pack(side="right", expand=True, padx=(5, 0))
         
         self.selected_guest_id = None
+        self.calculate_price()
+    
+    def destroy(self):
+        if self.own_quotes:
+            self.quotes.close()
+        super().destroy()
     
     def search_guest(self):
         """Поиск гостя в базе"""
@@ -181,63 +205,69 @@ class AddBookingDialog(ctk.CTkToplevel):
     
     def fill_guest_data(self, guest_data):
         """Заполнение полей данными выбранного гостя"""
-        # Преобразуем sqlite3.Row в tuple если нужно
-        if hasattr(guest_data, 'keys'):
-            guest_data = tuple(guest_data)
-        
-        self.selected_guest_id = guest_data[0]
+        self.selected_guest_id = guest_data.id
         self.guest_name_entry.delete(0, 'end')
-        self.guest_name_entry.insert(0, guest_data[1])
+        self.guest_name_entry.insert(0, guest_data.full_name)
         self.guest_phone_entry.delete(0, 'end')
-        self.guest_phone_entry.insert(0, guest_data[2] or "")
+        self.guest_phone_entry.insert(0, guest_data.phone_number or "")
         self.guest_email_entry.delete(0, 'end')
-        self.guest_email_entry.insert(0, guest_data[3] or "")
+        self.guest_email_entry.insert(0, guest_data.email or "")
     
     def on_room_selected(self, choice):
         """Обработка выбора номера"""
-        self.calculate_price()
+        self.show_quote(self.quote_map.get(choice))
     
-    def calculate_price(self, event=None):
-        """Расчет итоговой стоимости"""
-        if not self.room_menu:
+    def show_quote(self, quote):
+        """Стоимость выбранного предложения"""
+        if quote is None:
+            self.nights_label.configure(text="Количество ночей: 0")
+            self.discount_label.configure(text="Без скидки: 0 руб, скидка: 0 руб")
+            self.total_label.configure(text="Итого: 0 руб")
             return
-        
+        self.nights_label.configure(text=f"Количество ночей: {quote.nights}")
+        self.discount_label.configure(
+            text=f"Без скидки: {format_currency(quote.gross)}, скидка: {format_currency(quote.discount)}"
+        )
+        self.total_label.configure(text=f"Итого: {format_currency(quote.total)}")
+    
+    def calculate_price(self, event=None):
+        """Предложения по свободным номерам на выбранные даты"""
+        selected = self.quote_map.get(self.room_menu.get())
+        room_type = self.type_menu.get()
         try:
-            room_display = self.room_menu.get()
-            if not room_display or room_display not in self.room_map:
-                return
-            
-            room_id, price_per_night = self.room_map[room_display]
-            
-            check_in = self.checkin_entry.get_date()
-            check_out = self.checkout_entry.get_date()
-            
-            if check_out <= check_in:
-                self.nights_label.configure(text="Количество ночей: 0")
-                self.total_label.configure(text="Итого: 0 руб")
-                return
-            
-            num_nights = (check_out - check_in).days
-            total = price_per_night * num_nights
-            
-            self.nights_label.configure(text=f"Количество ночей: {num_nights}")
-            self.total_label.configure(text=f"Итого: {total:,.2f} руб")
-        except Exception as e:
-            print(f"Ошибка расчета: {e}")
+            quotes = self.quotes.quote(
+                self.checkin_entry.get_date(),
+                self.checkout_entry.get_date(),
+                None if room_type == self.ALL_TYPES else room_type
+            )
+        except QuoteError as e:
+            quotes = []
+            self.no_rooms_label.configure(text=str(e))
+        else:
+            self.no_rooms_label.configure(text="" if quotes else "Нет свободных номеров!")
+        
+        self.quote_map = {
+            f"№{q.number} - {q.room_type}: {format_currency(q.total)} "
+            f"({format_currency(q.average_rate)}/ночь)": q
+            for q in quotes
+        }
+        values = list(self.quote_map)
+        self.room_menu.configure(values=values or [""])
+        # Выбранный номер остается выбранным, если он свободен на новые даты
+        choice = next(
+            (text for text, q in self.quote_map.items() if selected and q.room_id == selected.room_id),
+            values[0] if values else ""
+        )
+        self.room_menu.set(choice)
+        self.show_quote(self.quote_map.get(choice))
     
     def save_booking(self):
         """Сохранение бронирования"""
-        if not self.room_menu:
-            messagebox.showerror("Ошибка", "Нет доступных номеров", parent=self)
+        quote = self.quote_map.get(self.room_menu.get())
+        if quote is None:
+            messagebox.showerror("Ошибка", "Выберите свободный номер", parent=self)
             return
         
-        room_display = self.room_menu.get()
-        if not room_display:
-            messagebox.showerror("Ошибка", "Выберите номер", parent=self)
-            return
-        
-        room_id, price_per_night = self.room_map[room_display]
-        
         guest_name = self.guest_name_entry.get().strip()
         if not guest_name:
             messagebox.showerror("Ошибка", "Укажите ФИО гостя", parent=self)
@@ -254,9 +284,22 @@ class AddBookingDialog(ctk.CTkToplevel):
             )
             return
         
-        # Расчет стоимости
-        num_nights = (check_out_date - check_in_date).days
-        total_price = price_per_night * num_nights
+        # Даты могли быть введены с клавиатуры - цена пересчитывается по текущим
+        self.calculate_price()
+        selected = quote
+        quote = self.quote_map.get(self.room_menu.get())
+        if quote is None or quote.room_id != selected.room_id:
+            messagebox.showerror(
+                "Ошибка", 
+                f"Номер №{selected.number} недоступен на выбранные даты", 
+                parent=self
+            )
+            return
+        num_nights = quote.nights
+        # bookings.total_price - стоимость без скидки; скидку за длительность
+        # вычитает признание выручки (revenue.split_nights)
+        total_price = quote.gross
+        room_id = quote.room_id
 
         # Создаем или используем существующего гостя
         if self.selected_guest_id:
@@ -284,14 +327,24 @@ class AddBookingDialog(ctk.CTkToplevel):
         )
         
         if booking_id:
+            revenue = self.db.get_booking_revenue(booking_id)
+            if revenue is not None and (revenue["gross"] != total_price
+                                        or revenue["net"] != quote.total):
+                logger.error(
+                    f"Бронь #{booking_id}: предложение {quote.total:.2f}, "
+                    f"признано {revenue['net']:.2f} (стоимость {revenue['gross']:.2f})"
+                )
             messagebox.showinfo(
-                "Успех", 
+                "Успех",
                 f"Бронь #{booking_id} для '{guest_name}' создана.\n"
                 f"Период: {num_nights} ноч.\n"
-                f"Стоимость: {total_price:,.2f} руб.", 
+                f"Стоимость: {total_price:,.2f} руб.\n"
+                f"Скидка: {quote.discount:,.2f} руб.\n"
+                f"К оплате: {quote.total:,.2f} руб.",
                 parent=self
             )
-            self.on_close_callback()
+            if self.on_close_callback:
+                self.on_close_callback()
             self.destroy()
         else:
             messagebox.showerror(
@@ -323,7 +376,10 @@ class SelectGuestDialog(ctk.CTkToplevel):
         self.listbox_frame.pack(fill="both", expand=True, padx=20, pady=10)
         
         for guest in guests:
-            guest_text = f"{guest[1]}\n{guest[2] or 'Нет телефона'} | {guest[3] or 'Нет email'}"
+            guest_text = (
+                f"{guest.full_name}\n"
+                f"{guest.phone_number or 'Нет телефона'} | {guest.email or 'Нет email'}"
+            )
             btn = ctk.CTkButton(
                 self.listbox_frame,
                 text=guest_text,
@@ -346,10 +402,154 @@ class SelectGuestDialog(ctk.CTkToplevel):
         self.destroy()
 
 
+class ExportBookingsDialog(ctk.CTkToplevel):
+    """Экспорт бронирований в CSV/XLSX в фоновом потоке"""
+    POLL_MS = 100
+
+    def __init__(self, master, db, status=None):
+        super().__init__(master)
+        self.db = db
+        self.status = status
+        self.worker = None
+        self.cancel_event = threading.Event()
+        self.messages = queue.Queue()
+
+        self.title("Экспорт бронирований")
+        self.geometry("400x300")
+        self.transient(master)
+        self.grab_set()
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+        ctk.CTkLabel(
+            self,
+            text="Экспорт бронирований",
+            font=ctk.CTkFont(size=16, weight="bold")
+        ).pack(padx=20, pady=(20, 10))
+
+        ctk.CTkLabel(self, text="Месяц заезда (ГГГГ-ММ, пусто - все):").pack(padx=20, pady=(5, 0))
+        self.month_entry = ctk.CTkEntry(self)
+        self.month_entry.insert(0, date.today().strftime("%Y-%m"))
+        self.month_entry.pack(padx=20, pady=5, fill="x")
+
+        ctk.CTkLabel(self, text="Формат:").pack(padx=20, pady=(5, 0))
+        self.format_menu = ctk.CTkOptionMenu(self, values=["CSV", "XLSX"])
+        self.format_menu.pack(padx=20, pady=5, fill="x")
+
+        self.progress_label = ctk.CTkLabel(
+            self,
+            text=f"Статус: {status}" if status else "Все статусы",
+            text_color="gray"
+        )
+        self.progress_label.pack(padx=20, pady=5)
+
+        button_frame = ctk.CTkFrame(self, fg_color="transparent")
+        button_frame.pack(padx=20, pady=10, fill="x")
+        ctk.CTkButton(
+            button_frame,
+            text="Закрыть",
+            command=self.close,
+            fg_color="gray"
+        ).pack(side="left", expand=True, padx=(0, 5))
+        self.export_button = ctk.CTkButton(
+            button_frame,
+            text="Экспорт...",
+            command=self.start_export
+        )
+        self.export_button.pack(side="right", expand=True, padx=(5, 0))
+
+    def start_export(self):
+        """Выбор файла и запуск экспорта в фоне"""
+        import export
+
+        month = self.month_entry.get().strip() or None
+        if month:
+            try:
+                export.month_range(month)
+            except export.ExportError as e:
+                messagebox.showerror("Ошибка", str(e), parent=self)
+                return
+
+        extension = self.format_menu.get().lower()
+        path = filedialog.asksaveasfilename(
+            parent=self,
+            defaultextension=f".{extension}",
+            initialfile=f"bookings_{month or 'all'}.{extension}",
+            filetypes=[(self.format_menu.get(), f"*.{extension}")]
+        )
+        if not path:
+            return
+
+        self.export_button.configure(state="disabled")
+        self.progress_label.configure(text="Экспорт...")
+        self.worker = threading.Thread(
+            target=self.run_export,
+            args=(export, path, extension, month),
+            daemon=True
+        )
+        self.worker.start()
+        self.after(self.POLL_MS, self.poll_export)
+
+    def run_export(self, export, path, extension, month):
+        """Фоновый поток: собственное соединение с БД, прогресс через очередь"""
+        try:
+            count = export.export_bookings(
+                self.db.db_file, path, extension, month, self.status,
+                progress=lambda rows: self.messages.put(("progress", rows)),
+                cancelled=self.cancel_event.is_set,
+                archive_file=self.db.archive_file
+            )
+            self.messages.put(("done", (count, path)))
+        except export.ExportCancelled:
+            self.messages.put(("cancelled", None))
+        except Exception as e:
+            self.messages.put(("error", str(e)))
+
+    def poll_export(self):
+        """Забор сообщений фонового потока в потоке Tk"""
+        while True:
+            try:
+                kind, value = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                self.progress_label.configure(text=f"Выгружено строк: {value:,}".replace(",", " "))
+                continue
+            self.worker = None
+            if kind == "cancelled":
+                self.destroy()
+                return
+            self.export_button.configure(state="normal")
+            if kind == "done":
+                count, path = value
+                self.progress_label.configure(text=f"Готово: {count} строк")
+                messagebox.showinfo("Успех", f"Выгружено броней: {count}\n{path}", parent=self)
+            else:
+                self.progress_label.configure(text="Ошибка экспорта")
+                messagebox.showerror("Ошибка", f"Не удалось выполнить экспорт: {value}", parent=self)
+            return
+        self.after(self.POLL_MS, self.poll_export)
+
+    def close(self):
+        """Закрытие окна прерывает незавершенный экспорт"""
+        if self.worker is not None:
+            self.cancel_event.set()
+            self.progress_label.configure(text="Остановка...")
+            return
+        self.destroy()
+
+
 class BookingsFrame(ctk.CTkFrame):
+    # Теги строк по статусу брони
+    STATUS_TAGS = {
+        "Активно": ('active',),
+        "Завершено": ('completed',),
+        "Отменено": ('cancelled',)
+    }
+
     def __init__(self, master, db):
         super().__init__(master, fg_color="transparent")
         self.db = db
+        self.quotes = None  # движок предложений создается при первом бронировании
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(1, weight=1)
         
@@ -373,7 +573,7 @@ class BookingsFrame(ctk.CTkFrame):
         self.status_filter = ctk.CTkOptionMenu(
             self.filter_frame,
             values=["Все", "Активно", "Завершено", "Отменено"],
-            command=self.refresh_bookings_table,
+            command=self.apply_status_filter,
             width=120
         )
         self.status_filter.pack(side="left")
@@ -405,49 +605,37 @@ class BookingsFrame(ctk.CTkFrame):
         style.map("Bookings.Treeview.Heading",
                   background=[('active', '#3484F0')])
         
-        # Создание таблицы с прокруткой
-        self.tree_frame = ctk.CTkFrame(self)
-        self.tree_frame.grid(row=1, column=0, sticky="nsew", padx=10, pady=10)
-        self.tree_frame.grid_rowconfigure(0, weight=1)
-        self.tree_frame.grid_columnconfigure(0, weight=1)
-        
-        self.tree = ttk.Treeview(
-            self.tree_frame,
-            columns=("ID", "Номер", "Гость", "Заезд", "Выезд", "Сумма", "Статус"),
-            show="headings",
-            style="Bookings.Treeview"
+        # Виртуальная таблица: в Treeview только видимое окно строк
+        self.table = VirtualTable(
+            self,
+            columns=[
+                ("ID", "ID", 50, "center", "id"),
+                ("Номер", "Номер", 80, "center", "room"),
+                ("Гость", "Гость", 200, "w", "guest"),
+                ("Заезд", "Дата заезда", 120, "center", "check_in"),
+                ("Выезд", "Дата выезда", 120, "center", "check_out"),
+                ("Сумма", "Сумма", 120, "e", "total"),
+                ("Статус", "Статус", 100, "center", "status"),
+            ],
+            style="Bookings.Treeview",
+            format_row=self.format_booking_row,
+            row_tags=lambda booking: self.STATUS_TAGS.get(booking.status, ()),
+            sort_by="check_in",
+            sort_descending=True
         )
-        
-        # Настройка колонок
-        self.tree.heading("ID", text="ID")
-        self.tree.heading("Номер", text="Номер")
-        self.tree.heading("Гость", text="Гость")
-        self.tree.heading("Заезд", text="Дата заезда")
-        self.tree.heading("Выезд", text="Дата выезда")
-        self.tree.heading("Сумма", text="Сумма")
-        self.tree.heading("Статус", text="Статус")
-        
-        self.tree.column("ID", width=50, anchor="center")
-        self.tree.column("Номер", width=80, anchor="center")
-        self.tree.column("Гость", width=200)
-        self.tree.column("Заезд", width=120, anchor="center")
-        self.tree.column("Выезд", width=120, anchor="center")
-        self.tree.column("Сумма", width=120, anchor="e")
-        self.tree.column("Статус", width=100, anchor="center")
-        
-        # Скроллбары
-        vsb = ttk.Scrollbar(self.tree_frame, orient="vertical", command=self.tree.yview)
-        hsb = ttk.Scrollbar(self.tree_frame, orient="horizontal", command=self.tree.xview)
-        self.tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
-        
-        self.tree.grid(row=0, column=0, sticky="nsew")
-        vsb.grid(row=0, column=1, sticky="ns")
-        hsb.grid(row=1, column=0, sticky="ew")
+        self.table.grid(row=1, column=0, sticky="nsew", padx=10, pady=10)
+        # Совместимость обработчиков: selection/item/identify_row как у Treeview
+        self.tree = self.table
         
         # Контекстное меню
         self.tree.bind("<Button-3>", self.show_context_menu)
         self.tree.bind("<Double-1>", self.show_booking_details)
         
+        # Цветовая маркировка по статусу (настраивается один раз)
+        self.tree.tag_configure('active', background='#27ae60', foreground='white')
+        self.tree.tag_configure('completed', background='#34495e', foreground='lightgray')
+        self.tree.tag_configure('cancelled', background='#c0392b', foreground='white')
+        
         # --- Панель действий ---
         self.action_bar = ctk.CTkFrame(self, fg_color="transparent")
         self.action_bar.grid(row=2, column=0, sticky="ew", padx=10, pady=(0, 10))
@@ -476,43 +664,94 @@ class BookingsFrame(ctk.CTkFrame):
         )
         self.refresh_button.pack(side="right", padx=5)
         
-        self.refresh_bookings_table()
-        
-    def refresh_bookings_table(self, *args):
-        """Обновление таблицы бронирований"""
-        # Очистка
-        for i in self.tree.get_children():
-            self.tree.delete(i)
+        self.export_button = ctk.CTkButton(
+            self.action_bar,
+            text="Экспорт",
+            command=self.open_export_dialog,
+            width=100
+        )
+        self.export_button.pack(side="right", padx=5)
+        
+        # Сверка загруженных строк с БД - в фоновом потоке
+        self.revalidator = SearchPipeline(
+            self,
+            get_query=self.table_state_query,
+            run_query=lambda query: self.db.get_bookings_state_cancellable(query[1], query[2]),
+            on_results=self.apply_table_state,
+            cache_size=0
+        )
         
-        # Получение данных
-        bookings = self.db.get_all_bookings()
+        self.apply_status_filter()
         
-        # Фильтрация по статусу
+    def current_status(self):
+        """Статус из фильтра (None - все)"""
         filter_status = self.status_filter.get()
-        if filter_status != "Все":
-            bookings = [b for b in bookings if b[6] == filter_status]
-        
-        # Вставка данных с форматированием
-        for booking in bookings:
-            values = list(booking)
-            # Форматирование суммы
-            values[5] = f"{values[5]:,.2f} руб"
-            
-            # Цветовая маркировка по статусу
-            tags = ()
-            if booking[6] == "Активно":
-                tags = ('active',)
-            elif booking[6] == "Завершено":
-                tags = ('completed',)
-            elif booking[6] == "Отменено":
-                tags = ('cancelled',)
-            
-            self.tree.insert("", "end", values=values, tags=tags)
+        return None if filter_status == "Все" else filter_status
+    
+    def apply_status_filter(self, *args):
+        """Смена фильтра по статусу - новый источник строк для таблицы"""
+        status = self.current_status()
+        
+        self.table.set_source(QuerySource(
+            lambda: self.db.count_bookings(status),
+            lambda offset, limit, order_by, descending, after, before: self.db.get_bookings_page(
+                offset, limit, status, order_by, descending, after, before
+            ),
+            keyset=True
+        ))
+
+    def refresh_bookings_table(self, *args):
+        """Обновление таблицы бронирований"""
+        self.table.refresh()
+    
+    def revalidate(self):
+        """Сверка таблицы с БД: запросы в фоновом потоке, изменившиеся строки подменяются"""
+        self.revalidator.run_now()
+    
+    def table_state_query(self):
+        """Что сверять (поток Tk): маркер БД, фильтр и ключи загруженных строк"""
+        return self.db.get_change_token(), self.current_status(), frozenset(self.table.loaded_keys())
+    
+    def apply_table_state(self, query, state):
+        """Результат сверки (поток Tk)"""
+        _, status, keys = query
+        if status != self.current_status():
+            return  # фильтр сменился - таблица уже перечитана
+        total, rows = state
+        if (total != self.table.total or len(rows) != len(keys)
+                or (status and any(row.status != status for row in rows))):
+            # Изменился состав строк - перечитываем видимое окно
+            self.table.refresh()
+            return
+        self.table.patch_rows(rows)
+
+    def apply_changes(self, batch):
+        """Применение изменений из шины событий БД"""
+        if (batch.structural(ChangeEvent.BOOKING)
+                or batch.has(ChangeEvent.GUEST, ChangeEvent.UPDATE, ChangeEvent.DELETE)
+                or batch.has(ChangeEvent.ROOM, ChangeEvent.DELETE)
+                or (batch.has(ChangeEvent.BOOKING) and self.status_filter.get() != "Все")):
+            # Меняется состав строк - перечитываем видимое окно
+            self.table.refresh()
+            return
         
-        # Настройка тегов
-        self.tree.tag_configure('active', background='#27ae60', foreground='white')
-        self.tree.tag_configure('completed', background='#34495e', foreground='lightgray')
-        self.tree.tag_configure('cancelled', background='#c0392b', foreground='white')
+        # Обновляем только загруженные измененные брони
+        changed = batch.ids(ChangeEvent.BOOKING) & self.table.loaded_keys()
+        if changed:
+            self.table.patch_rows(self.db.get_bookings_by_ids(changed))
+
+    @staticmethod
+    def format_booking_row(booking):
+        """Значения строки таблицы с форматированием"""
+        return [
+            booking.id,
+            booking.room_number,
+            booking.guest_name,
+            booking.check_in_date,
+            booking.check_out_date,
+            f"{booking.total_price:,.2f} руб",  # Форматирование суммы
+            booking.status
+        ]
 
     def show_context_menu(self, event):
         """Показать контекстное меню"""
@@ -598,7 +837,6 @@ class BookingsFrame(ctk.CTkFrame):
         ):
             if self.db.complete_booking(booking_id):
                 messagebox.showinfo("Успех", "Бронь завершена", parent=self)
-                self.refresh_bookings_table()
             else:
                 messagebox.showerror("Ошибка", "Не удалось завершить бронь", parent=self)
 
@@ -631,10 +869,17 @@ class BookingsFrame(ctk.CTkFrame):
         ):
             if self.db.cancel_booking(booking_id):
                 messagebox.showinfo("Успех", "Бронь отменена", parent=self)
-                self.refresh_bookings_table()
             else:
                 messagebox.showerror("Ошибка", "Не удалось отменить бронь", parent=self)
 
+    def open_export_dialog(self):
+        """Экспорт бронирований с текущим фильтром по статусу"""
+        filter_status = self.status_filter.get()
+        ExportBookingsDialog(self, self.db, None if filter_status == "Все" else filter_status)
+
     def open_add_booking_dialog(self):
         """Открыть диалог создания бронирования"""
-        AddBookingDialog(self, self.db, on_close_callback=self.refresh_bookings_table)
\ No newline at end of file
+        # Таблица обновится по событию изменения БД
+        if self.quotes is None:
+            self.quotes = QuoteEngine(self.db)
+        AddBookingDialog(self, self.db, quotes=self.quotes)
\ No newline at end of file
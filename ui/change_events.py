@@ -0,0 +1,54 @@
+from database import ChangeEvent
+
+
+class ChangeBatch:
+    """Изменения, накопленные за один цикл простоя Tk"""
+    def __init__(self):
+        self.changes = {}  # (сущность, действие) -> множество ID
+
+    def add(self, event):
+        self.changes.setdefault((event.entity, event.action), set()).update(event.ids)
+
+    def ids(self, entity, *actions):
+        """ID записей сущности, затронутых указанными действиями (по умолчанию любыми)"""
+        actions = actions or (ChangeEvent.INSERT, ChangeEvent.UPDATE, ChangeEvent.DELETE)
+        result = set()
+        for action in actions:
+            result |= self.changes.get((entity, action), set())
+        return result
+
+    def has(self, entity, *actions):
+        return bool(self.ids(entity, *actions))
+
+    def structural(self, entity):
+        """Были ли вставки или удаления (меняется состав и количество строк)"""
+        return self.has(entity, ChangeEvent.INSERT, ChangeEvent.DELETE)
+
+    def __bool__(self):
+        return bool(self.changes)
+
+
+class EventCoalescer:
+    """
+    Подписчик шины изменений Database: события, пришедшие за один цикл
+    простоя Tk, объединяются в один ChangeBatch и передаются обработчику
+    """
+    def __init__(self, widget, db, handler):
+        self.widget = widget
+        self.handler = handler
+        self.batch = ChangeBatch()
+        self.scheduled = False
+        db.subscribe(self.on_events)
+
+    def on_events(self, events):
+        for event in events:
+            self.batch.add(event)
+        if not self.scheduled:
+            self.scheduled = True
+            self.widget.after_idle(self.flush)
+
+    def flush(self):
+        self.scheduled = False
+        batch, self.batch = self.batch, ChangeBatch()
+        if batch:
+            self.handler(batch)
@@ -1,6 +1,8 @@
 import customtkinter as ctk
 from datetime import date
 
+from .search_pipeline import SearchPipeline
+
 
 class CompactStatCard(ctk.CTkFrame):
     """Компактная карточка статистики"""
@@ -42,7 +44,9 @@ class CompactStatCard(ctk.CTkFrame):
         self.bind("<Leave>", lambda e: self.configure(fg_color=("white", "#1e293b")))
     
     def set_value(self, new_value, animate=True):
-        """Установка нового значения с анимацией"""
+        """Установка нового значения с анимацией (то же значение не перерисовывается)"""
+        if int(new_value) == self.target_value:
+            return
         self.target_value = int(new_value)
         if animate:
             self.animate_value()
@@ -65,6 +69,8 @@ class CompactStatCard(ctk.CTkFrame):
 
 
 class DashboardFrame(ctk.CTkFrame):
+    RECENT_LIMIT = 8
+
     def __init__(self, master, db):
         super().__init__(master, fg_color="transparent")
         self.db = db
@@ -79,10 +85,19 @@ class DashboardFrame(ctk.CTkFrame):
         # Карточки статистики
         self.create_stat_cards()
         
-        # Последние активности
+        # Последние активности (загружаются при создании)
         self.create_recent_activity()
         
-        self.update_stats()
+        self.update_stats(reload_activities=False)
+        
+        # Повторная загрузка после изменений - в фоновом потоке
+        self.loader = SearchPipeline(
+            self,
+            get_query=self.db.get_change_token,
+            run_query=lambda token: self.db.get_dashboard_cancellable(self.RECENT_LIMIT),
+            on_results=self.show_stats,
+            cache_size=0
+        )
     
     def create_greeting(self):
         """Создание приветствия"""
@@ -104,7 +119,7 @@ class DashboardFrame(ctk.CTkFrame):
         ctk.CTkButton(
             greeting_frame,
             text="Обновить",
-            command=self.update_stats,
+            command=self.reload,
             width=80,
             height=32,
             font=ctk.CTkFont(size=12)
@@ -164,42 +179,54 @@ class DashboardFrame(ctk.CTkFrame):
         )
         self.activity_scroll.grid(row=1, column=0, sticky="nsew", padx=15, pady=(0, 15))
         
+        self.recent_bookings = None
+        self.activity_items = {}  # id брони -> (виджет, данные)
+        self.empty_label = None
         self.load_recent_activities()
     
     def load_recent_activities(self):
-        """Загрузка последних активностей"""
-        for widget in self.activity_scroll.winfo_children():
-            widget.destroy()
-        
-        try:
-            self.db.cursor.execute("""
-                SELECT b.id, r.number, g.full_name, b.check_in_date, b.status
-                FROM bookings b
-                JOIN rooms r ON b.room_id = r.id
-                JOIN guests g ON b.guest_id = g.id
-                ORDER BY b.id DESC
-                LIMIT 8
-            """)
-            
-            recent_bookings = self.db.cursor.fetchall()
-        except:
-            recent_bookings = []
+        """Загрузка последних активностей (перестраиваются только изменившиеся)"""
+        self.show_recent_activities(self.db.get_recent_bookings(self.RECENT_LIMIT))
+    
+    def show_recent_activities(self, recent_bookings):
+        """Отрисовка ленты последних броней"""
+        if recent_bookings == self.recent_bookings:
+            return
+        self.recent_bookings = recent_bookings
+        
+        # Удаляем элементы, которых больше нет или которые изменились
+        current = {booking.id: booking for booking in recent_bookings}
+        for booking_id in list(self.activity_items):
+            item, booking = self.activity_items[booking_id]
+            if current.get(booking_id) != booking:
+                item.destroy()
+                del self.activity_items[booking_id]
+        
+        if self.empty_label is not None:
+            self.empty_label.destroy()
+            self.empty_label = None
         
         if not recent_bookings:
-            ctk.CTkLabel(
+            self.empty_label = ctk.CTkLabel(
                 self.activity_scroll,
                 text="Нет последних бронирований",
                 text_color="gray",
                 font=ctk.CTkFont(size=12)
-            ).pack(pady=20)
+            )
+            self.empty_label.pack(pady=20)
             return
         
+        # Создаем новые элементы и восстанавливаем порядок
+        for item, _ in self.activity_items.values():
+            item.pack_forget()
         for booking in recent_bookings:
-            self.create_activity_item(booking)
+            if booking.id not in self.activity_items:
+                self.activity_items[booking.id] = (self.create_activity_item(booking), booking)
+            self.activity_items[booking.id][0].pack(fill="x", pady=3)
     
     def create_activity_item(self, booking):
         """Элемент активности"""
-        booking_id, room_number, guest_name, check_in, status = booking
+        status = booking.status
         
         item = ctk.CTkFrame(
             self.activity_scroll,
@@ -207,7 +234,6 @@ class DashboardFrame(ctk.CTkFrame):
             fg_color=("#f8fafc", "#334155"),
             height=60
         )
-        item.pack(fill="x", pady=3)
         item.pack_propagate(False)
         
         status_icons = {
@@ -232,14 +258,14 @@ class DashboardFrame(ctk.CTkFrame):
         
         ctk.CTkLabel(
             info,
-            text=f"Бронь #{booking_id} • Номер {room_number}",
+            text=f"Бронь #{booking.id} • Номер {booking.room_number}",
             font=ctk.CTkFont(size=12, weight="bold"),
             anchor="w"
         ).pack(anchor="w")
         
         ctk.CTkLabel(
             info,
-            text=f"{guest_name} • {check_in}",
+            text=f"{booking.guest_name} • {booking.check_in_date}",
             font=ctk.CTkFont(size=10),
             text_color="gray",
             anchor="w"
@@ -259,14 +285,35 @@ class DashboardFrame(ctk.CTkFrame):
             text_color=status_colors.get(status, "gray"),
             width=70
         ).pack(side="right", padx=12)
+        
+        return item
+    
+    def apply_changes(self, batch):
+        """Применение изменений из шины событий БД"""
+        # Статистика и лента зависят от номеров, броней и имен гостей
+        self.reload()
+    
+    def reload(self):
+        """Перечитать статистику и ленту в фоновом потоке"""
+        self.loader.run_now()
     
-    def update_stats(self):
+    def update_stats(self, reload_activities=True):
         """Обновление статистики"""
         stats = self.db.get_dashboard_stats()
+        self.show_counters(stats)
         
+        if reload_activities:
+            self.load_recent_activities()
+    
+    def show_stats(self, token, result):
+        """Результат фоновой загрузки (поток Tk)"""
+        stats, recent_bookings = result
+        self.show_counters(stats)
+        self.show_recent_activities(recent_bookings)
+    
+    def show_counters(self, stats):
+        """Значения карточек статистики"""
         self.free_card.set_value(stats["free"], animate=True)
         self.occupied_card.set_value(stats["occupied"], animate=True)
         self.checkin_card.set_value(stats["check_ins"], animate=True)
         self.checkout_card.set_value(stats["check_outs"], animate=True)
-        
-        self.load_recent_activities()
\ No newline at end of file
@@ -1,17 +1,20 @@
 import customtkinter as ctk
 from tkinter import ttk, messagebox
+from database import ChangeEvent
 from utils import validate_phone, validate_email, format_phone
+from .virtual_table import VirtualTable, QuerySource, ListSource
+from .search_pipeline import SearchPipeline, like_contains
 
 
 class EditGuestDialog(ctk.CTkToplevel):
     """Диалог редактирования гостя"""
-    def __init__(self, master, db, guest_data, on_close_callback):
+    def __init__(self, master, db, guest_data, on_close_callback=None):
         super().__init__(master)
         self.db = db
         self.guest_data = guest_data
         self.on_close_callback = on_close_callback
 
-        self.title(f"Редактировать гостя #{guest_data[0]}")
+        self.title(f"Редактировать гостя #{guest_data.id}")
         self.geometry("400x500")
         self.transient(master)
         self.grab_set()
@@ -19,7 +22,7 @@ class EditGuestDialog(ctk.CTkToplevel):
         # Заголовок
         ctk.CTkLabel(
             self, 
-            text=f"Гость #{guest_data[0]}", 
+            text=f"Гость #{guest_data.id}", 
             font=ctk.CTkFont(size=20, weight="bold")
         ).pack(padx=20, pady=(20, 10))
 
@@ -27,21 +30,21 @@ class EditGuestDialog(ctk.CTkToplevel):
         self.name_label = ctk.CTkLabel(self, text="ФИО: *")
         self.name_label.pack(padx=20, pady=(10, 5), anchor="w")
         self.name_entry = ctk.CTkEntry(self, width=300)
-        self.name_entry.insert(0, guest_data[1])
+        self.name_entry.insert(0, guest_data.full_name)
         self.name_entry.pack(padx=20, pady=5)
 
         # Телефон
         self.phone_label = ctk.CTkLabel(self, text="Номер телефона:")
         self.phone_label.pack(padx=20, pady=(10, 5), anchor="w")
         self.phone_entry = ctk.CTkEntry(self, width=300)
-        self.phone_entry.insert(0, guest_data[2] or "")
+        self.phone_entry.insert(0, guest_data.phone_number or "")
         self.phone_entry.pack(padx=20, pady=5)
 
         # Email
         self.email_label = ctk.CTkLabel(self, text="Email:")
         self.email_label.pack(padx=20, pady=(10, 5), anchor="w")
         self.email_entry = ctk.CTkEntry(self, width=300)
-        self.email_entry.insert(0, guest_data[3] or "")
+        self.email_entry.insert(0, guest_data.email or "")
         self.email_entry.pack(padx=20, pady=5)
         
         # Подсказка
@@ -118,28 +121,19 @@ class EditGuestDialog(ctk.CTkToplevel):
         if phone:
             phone = format_phone(phone)
         
-        try:
-            # Обновление данных
-            self.db.cursor.execute(
-                "UPDATE guests SET full_name = ?, phone_number = ?, email = ? WHERE id = ?",
-                (full_name, phone, email, self.guest_data[0])
-            )
-            self.db.conn.commit()
-            
+        # Обновление данных
+        if self.db.update_guest(self.guest_data.id, full_name, phone, email):
             messagebox.showinfo("Успех", "Данные гостя обновлены", parent=self)
-            self.on_close_callback()
+            if self.on_close_callback:
+                self.on_close_callback()
             self.destroy()
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось сохранить изменения: {e}", parent=self)
+        else:
+            messagebox.showerror("Ошибка", "Не удалось сохранить изменения", parent=self)
     
     def delete_guest(self):
         """Удаление гостя"""
         # Проверяем наличие активных броней
-        self.db.cursor.execute(
-            "SELECT COUNT(*) FROM bookings WHERE guest_id = ? AND status = ?",
-            (self.guest_data[0], self.db.BOOKING_STATUS_ACTIVE)
-        )
-        active_bookings = self.db.cursor.fetchone()[0]
+        _, active_bookings = self.db.get_guest_bookings_count(self.guest_data.id)
         
         if active_bookings > 0:
             messagebox.showerror(
@@ -152,23 +146,21 @@ class EditGuestDialog(ctk.CTkToplevel):
         
         if messagebox.askyesno(
             "Подтверждение",
-            f"Вы уверены, что хотите удалить гостя '{self.guest_data[1]}'?\n"
+            f"Вы уверены, что хотите удалить гостя '{self.guest_data.full_name}'?\n"
             "Это действие нельзя отменить!",
             parent=self
         ):
-            try:
-                self.db.cursor.execute("DELETE FROM guests WHERE id = ?", (self.guest_data[0],))
-                self.db.conn.commit()
-                
+            if self.db.delete_guest(self.guest_data.id):
                 messagebox.showinfo("Успех", "Гость удален", parent=self)
-                self.on_close_callback()
+                if self.on_close_callback:
+                    self.on_close_callback()
                 self.destroy()
-            except Exception as e:
-                messagebox.showerror("Ошибка", f"Не удалось удалить гостя: {e}", parent=self)
+            else:
+                messagebox.showerror("Ошибка", "Не удалось удалить гостя", parent=self)
 
 
 class AddGuestDialog(ctk.CTkToplevel):
-    def __init__(self, master, db, on_close_callback):
+    def __init__(self, master, db, on_close_callback=None):
         super().__init__(master)
         self.db = db
         self.on_close_callback = on_close_callback
@@ -288,7 +280,8 @@ class AddGuestDialog(ctk.CTkToplevel):
                 f"Гость '{full_name}' успешно добавлен.", 
                 parent=self
             )
-            self.on_close_callback()
+            if self.on_close_callback:
+                self.on_close_callback()
             self.destroy()
         else:
             messagebox.showwarning(
@@ -299,6 +292,11 @@ class AddGuestDialog(ctk.CTkToplevel):
 
 
 class GuestsFrame(ctk.CTkFrame):
+    # Результат поиска до этого размера загружается целиком
+    SEARCH_LIMIT = 500
+    # Ключ сортировки -> поле записи Guest
+    SORT_COLUMNS = {"id": "id", "full_name": "full_name", "phone": "phone_number", "email": "email"}
+
     def __init__(self, master, db):
         super().__init__(master, fg_color="transparent")
         self.db = db
@@ -338,7 +336,16 @@ class GuestsFrame(ctk.CTkFrame):
             width=300
         )
         self.search_entry.grid(row=0, column=1, padx=5, sticky="ew")
-        self.search_entry.bind("<KeyRelease>", lambda e: self.refresh_guests_table())
+        # Поиск: отложенный запуск, прерывание устаревших запросов, кэш
+        self.search_pipeline = SearchPipeline(
+            self,
+            get_query=lambda: self.search_entry.get().strip(),
+            run_query=lambda query: self.db.search_guests_cancellable(query, self.SEARCH_LIMIT),
+            on_results=self.show_search_results,
+            refine=self.refine_search_results,
+            interrupt=self.db.interrupt_search
+        )
+        self.search_entry.bind("<KeyRelease>", self.search_pipeline.schedule)
         
         self.clear_search_button = ctk.CTkButton(
             self.search_bar,
@@ -376,37 +383,22 @@ class GuestsFrame(ctk.CTkFrame):
         style.map("Guests.Treeview.Heading",
                   background=[('active', '#3484F0')])
 
-        # Создание таблицы с прокруткой
-        self.tree_frame = ctk.CTkFrame(self)
-        self.tree_frame.grid(row=2, column=0, sticky="nsew", padx=10, pady=10)
-        self.tree_frame.grid_rowconfigure(0, weight=1)
-        self.tree_frame.grid_columnconfigure(0, weight=1)
-        
-        self.tree = ttk.Treeview(
-            self.tree_frame,
-            columns=("ID", "ФИО", "Телефон", "Email"),
-            show="headings",
-            style="Guests.Treeview"
+        # Виртуальная таблица: в Treeview только видимое окно строк
+        self.table = VirtualTable(
+            self,
+            columns=[
+                ("ID", "ID", 50, "center", "id"),
+                ("ФИО", "ФИО", 300, "w", "full_name"),
+                ("Телефон", "Телефон", 200, "w", "phone"),
+                ("Email", "Email", 250, "w", "email"),
+            ],
+            style="Guests.Treeview",
+            format_row=self.format_guest_row,
+            sort_by="full_name"
         )
-        
-        self.tree.heading("ID", text="ID")
-        self.tree.heading("ФИО", text="ФИО")
-        self.tree.heading("Телефон", text="Телефон")
-        self.tree.heading("Email", text="Email")
-        
-        self.tree.column("ID", width=50, anchor="center")
-        self.tree.column("ФИО", width=300)
-        self.tree.column("Телефон", width=200)
-        self.tree.column("Email", width=250)
-        
-        # Скроллбары
-        vsb = ttk.Scrollbar(self.tree_frame, orient="vertical", command=self.tree.yview)
-        hsb = ttk.Scrollbar(self.tree_frame, orient="horizontal", command=self.tree.xview)
-        self.tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
-        
-        self.tree.grid(row=0, column=0, sticky="nsew")
-        vsb.grid(row=0, column=1, sticky="ns")
-        hsb.grid(row=1, column=0, sticky="ew")
+        self.table.grid(row=2, column=0, sticky="nsew", padx=10, pady=10)
+        # Совместимость обработчиков: selection/item/identify_row как у Treeview
+        self.tree = self.table
         
         # Контекстное меню (правая кнопка мыши)
         self.tree.bind("<Button-3>", self.show_context_menu)
@@ -443,12 +435,13 @@ class GuestsFrame(ctk.CTkFrame):
         )
         self.refresh_button.pack(side="right", padx=5)
         
+        self._shown_query = None
         self.refresh_guests_table()
     
     def clear_search(self):
         """Очистка поиска"""
         self.search_entry.delete(0, 'end')
-        self.refresh_guests_table()
+        self.search_pipeline.run_now()
     
     def show_context_menu(self, event):
         """Показать контекстное меню (правая кнопка мыши)"""
@@ -508,14 +501,11 @@ class GuestsFrame(ctk.CTkFrame):
         values = self.tree.item(selection[0])['values']
         
         # Получаем полные данные из БД
-        self.db.cursor.execute(
-            "SELECT id, full_name, phone_number, email FROM guests WHERE id = ?",
-            (values[0],)
-        )
-        guest_data = self.db.cursor.fetchone()
+        guest_data = self.db.get_guest_by_id(values[0])
         
         if guest_data:
-            EditGuestDialog(self, self.db, guest_data, on_close_callback=self.refresh_guests_table)
+            # Таблица обновится по событию изменения БД
+            EditGuestDialog(self, self.db, guest_data)
     
     def delete_guest(self):
         """Удалить гостя"""
@@ -533,11 +523,7 @@ class GuestsFrame(ctk.CTkFrame):
         guest_name = values[1]
         
         # Проверяем наличие активных броней
-        self.db.cursor.execute(
-            "SELECT COUNT(*) FROM bookings WHERE guest_id = ? AND status = ?",
-            (guest_id, self.db.BOOKING_STATUS_ACTIVE)
-        )
-        active_bookings = self.db.cursor.fetchone()[0]
+        _, active_bookings = self.db.get_guest_bookings_count(guest_id)
         
         if active_bookings > 0:
             messagebox.showerror(
@@ -554,14 +540,10 @@ class GuestsFrame(ctk.CTkFrame):
             "Это действие нельзя отменить!",
             parent=self
         ):
-            try:
-                self.db.cursor.execute("DELETE FROM guests WHERE id = ?", (guest_id,))
-                self.db.conn.commit()
-                
+            if self.db.delete_guest(guest_id):
                 messagebox.showinfo("Успех", "Гость удален", parent=self)
-                self.refresh_guests_table()
-            except Exception as e:
-                messagebox.showerror("Ошибка", f"Не удалось удалить гостя: {e}", parent=self)
+            else:
+                messagebox.showerror("Ошибка", "Не удалось удалить гостя", parent=self)
     
     def show_guest_details(self, event):
         """Показать детали гостя"""
@@ -572,19 +554,7 @@ class GuestsFrame(ctk.CTkFrame):
         values = self.tree.item(selection[0])['values']
         
         # Получаем историю броней
-        self.db.cursor.execute(
-            """SELECT COUNT(*) FROM bookings 
-               WHERE guest_id = ? AND status = ?""",
-            (values[0], self.db.BOOKING_STATUS_ACTIVE)
-        )
-        active_bookings = self.db.cursor.fetchone()[0]
-        
-        self.db.cursor.execute(
-            """SELECT COUNT(*) FROM bookings 
-               WHERE guest_id = ?""",
-            (values[0],)
-        )
-        total_bookings = self.db.cursor.fetchone()[0]
+        total_bookings, active_bookings = self.db.get_guest_bookings_count(values[0])
         
         details = f"""
 Гость #{values[0]}
@@ -601,47 +571,78 @@ Email: {values[3] or 'Не указан'}
         messagebox.showinfo("Информация о госте", details.strip(), parent=self)
         
     def refresh_guests_table(self):
-        """Обновление таблицы гостей"""
-        # Очистка таблицы
-        for i in self.tree.get_children():
-            self.tree.delete(i)
+        """Обновление таблицы гостей (данные могли измениться - кэш поиска сбрасывается)"""
+        self.search_pipeline.invalidate()
+        self.search_pipeline.run_now()
+
+    def apply_changes(self, batch):
+        """Применение изменений из шины событий БД"""
+        if not batch.has(ChangeEvent.GUEST):
+            return
         
-        # Получение данных
         search_query = self.search_entry.get().strip()
+        if batch.structural(ChangeEvent.GUEST) or search_query:
+            # Меняется состав строк (или попадание в результат поиска)
+            self.refresh_guests_table()
+            return
         
-        if search_query:
-            guests = self.db.search_guests(search_query)
+        # Обновляем только загруженные измененные строки
+        self.search_pipeline.invalidate()
+        changed = batch.ids(ChangeEvent.GUEST) & self.table.loaded_keys()
+        if changed:
+            self.table.patch_rows(self.db.get_guests_by_ids(changed))
+
+    def show_search_results(self, search_query, result):
+        """Отображение результата поиска в таблице"""
+        found_count, guests = result
+        
+        if found_count == len(guests):
+            # Результат загружен целиком - таблица работает по списку
+            source = ListSource(guests, self.SORT_COLUMNS)
         else:
-            guests = self.db.get_all_guests()
-        
-        # ВАЖНО: Преобразование sqlite3.Row в tuple/list
-        processed_guests = []
-        for guest in guests:
-            if hasattr(guest, 'keys'):  # Это sqlite3.Row объект
-                processed_guests.append(tuple(guest))
-            else:  # Это уже tuple
-                processed_guests.append(guest)
-        
-        # Вставка данных
-        for guest in processed_guests:
-            # Заменяем None на пустую строку для красоты
-            display_values = [
-                guest[0],  # ID
-                guest[1],  # ФИО
-                guest[2] if guest[2] else "",  # Телефон
-                guest[3] if guest[3] else ""   # Email
-            ]
-            self.tree.insert("", "end", values=display_values)
+            source = QuerySource(
+                lambda: found_count,
+                lambda offset, limit, order_by, descending: self.db.get_guests_page(
+                    offset, limit, search_query, order_by, descending
+                )
+            )
         
-        # Обновление статистики
-        total_count = len(self.db.get_all_guests())
-        shown_count = len(processed_guests)
+        # Тот же запрос (обновление данных) - сохраняем позицию прокрутки
+        self.table.set_source(source, reset_offset=search_query != self._shown_query)
+        self._shown_query = search_query
         
+        # Обновление статистики
         if search_query:
-            self.stats_label.configure(text=f"Найдено: {shown_count} из {total_count}")
+            total_count = self.db.count_guests()
+            self.stats_label.configure(text=f"Найдено: {found_count} из {total_count}")
         else:
-            self.stats_label.configure(text=f"Всего гостей: {total_count}")
+            self.stats_label.configure(text=f"Всего гостей: {found_count}")
+
+    @staticmethod
+    def refine_search_results(result, search_query):
+        """Уточнение полного результата для более короткого префикса без запроса к БД"""
+        found_count, guests = result
+        if found_count != len(guests):
+            return None
+        guests = [
+            guest for guest in guests
+            if like_contains(guest.full_name, search_query)
+            or like_contains(guest.phone_number, search_query)
+            or like_contains(guest.email, search_query)
+        ]
+        return len(guests), guests
+
+    @staticmethod
+    def format_guest_row(guest):
+        """Значения строки таблицы: заменяем None на пустую строку для красоты"""
+        return (
+            guest.id,
+            guest.full_name,
+            guest.phone_number or "",
+            guest.email or ""
+        )
 
     def open_add_guest_dialog(self):
         """Открыть диалог добавления гостя"""
-        AddGuestDialog(self, self.db, on_close_callback=self.refresh_guests_table)
\ No newline at end of file
+        # Таблица обновится по событию изменения БД
+        AddGuestDialog(self, self.db)
\ No newline at end of file
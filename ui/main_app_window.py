@@ -1,12 +1,10 @@
 import customtkinter as ctk
-from PIL import Image
 import os
 from datetime import datetime
 
-from .dashboard_frame import DashboardFrame
-from .rooms_frame import RoomsFrame
-from .bookings_frame import BookingsFrame
-from .guests_frame import GuestsFrame
+from config import AppConfig
+from .change_events import EventCoalescer
+from .scheduler import BackupScheduler, MaintenanceScheduler, PricingScheduler
 
 
 class TabButton(ctk.CTkButton):
@@ -46,9 +44,10 @@ class TabButton(ctk.CTkButton):
 
 
 class MainAppWindow(ctk.CTk):
-    def __init__(self, db):
+    def __init__(self, db, profiler=None):
         super().__init__()
         self.db = db
+        self.profiler = profiler
 
         self.title("Hotel Harmony - Система управления отелем")
         self.geometry("1400x850")
@@ -59,23 +58,43 @@ class MainAppWindow(ctk.CTk):
         
         # Переменные состояния
         self.current_frame_name = None
+        self.frames = {}  # фреймы разделов создаются при первом открытии
+        self.rendered_tokens = {}  # раздел -> версия данных БД при последней отрисовке
+        
+        # Изменения, сделанные через Database, применяются к открытым разделам
+        self.change_events = EventCoalescer(self, db, self.on_db_changes)
+        self.after(AppConfig.CHANGE_POLL_MS, self.poll_db_changes)
+        
+        # Резервное копирование по расписанию (в фоновом потоке)
+        self.backup_scheduler = BackupScheduler(self, db)
+        # Обслуживание БД, пока с программой не работают
+        self.maintenance_scheduler = MaintenanceScheduler(self, db, self.backup_scheduler)
+        # Динамические цены на год вперед (в отдельном процессе)
+        self.pricing_scheduler = PricingScheduler(self, db) if AppConfig.PRICING_ENABLED else None
         
         # Настройка сетки - только 2 строки!
         self.grid_rowconfigure(1, weight=1)
         self.grid_columnconfigure(0, weight=1)
         
-        # Загрузка иконок
-        self.load_icons()
+        # Иконки загружаются после первой отрисовки (PIL импортируется там же)
+        self.dashboard_icon = None
+        self.rooms_icon = None
+        self.bookings_icon = None
+        self.guests_icon = None
         
         # Создание элементов интерфейса
         self.create_header()
         self.create_main_content()
+        self.mark_startup("Шапка и контейнер")
         
         # Инициализация даты и времени после создания всех элементов
         self.update_datetime()
         
         # Показываем дашборд по умолчанию
         self.select_frame("dashboard")
+        self.mark_startup("Панель управления")
+        
+        self.bind("<Map>", self.on_first_map, add="+")
     
     def center_window(self):
         """Центрирование окна на экране"""
@@ -86,8 +105,30 @@ class MainAppWindow(ctk.CTk):
         y = (self.winfo_screenheight() // 2) - (height // 2)
         self.geometry(f'{width}x{height}+{x}+{y}')
     
+    def mark_startup(self, label):
+        """Отметка этапа запуска для --profile-startup"""
+        if self.profiler:
+            self.profiler.mark(label)
+    
+    def on_first_map(self, event):
+        """Окно показано - дожидаемся отрисовки и догружаем второстепенное"""
+        if event.widget is not self:
+            return
+        self.unbind("<Map>")
+        self.after_idle(self.on_first_paint)
+    
+    def on_first_paint(self):
+        """Первая отрисовка завершена"""
+        self.update_idletasks()
+        self.mark_startup("Первая отрисовка")
+        if self.profiler:
+            print(self.profiler.report())
+        self.after(0, self.load_icons)
+    
     def load_icons(self):
         """Загрузка иконок с обработкой ошибок"""
+        from PIL import Image
+        
         icon_size = (20, 20)
         try:
             self.dashboard_icon = ctk.CTkImage(
@@ -107,11 +148,13 @@ class MainAppWindow(ctk.CTk):
                 size=icon_size
             )
         except FileNotFoundError:
-            # Если иконки не найдены, используем None
-            self.dashboard_icon = None
-            self.rooms_icon = None
-            self.bookings_icon = None
-            self.guests_icon = None
+            # Если иконки не найдены, оставляем вкладки без иконок
+            return
+        
+        self.tab_buttons["dashboard"].configure(image=self.dashboard_icon)
+        self.tab_buttons["rooms"].configure(image=self.rooms_icon)
+        self.tab_buttons["bookings"].configure(image=self.bookings_icon)
+        self.tab_buttons["guests"].configure(image=self.guests_icon)
     
     def update_datetime(self):
         """Обновление даты и времени"""
@@ -248,12 +291,60 @@ class MainAppWindow(ctk.CTk):
         self.content_frame.grid(row=1, column=0, sticky="nsew")
         self.content_frame.grid_rowconfigure(0, weight=1)
         self.content_frame.grid_columnconfigure(0, weight=1)
-        
-        # Создание фреймов для каждого раздела
-        self.dashboard_frame = DashboardFrame(self.content_frame, self.db)
-        self.rooms_frame = RoomsFrame(self.content_frame, self.db)
-        self.bookings_frame = BookingsFrame(self.content_frame, self.db)
-        self.guests_frame = GuestsFrame(self.content_frame, self.db)
+    
+    def create_frame(self, name):
+        """Создание фрейма раздела при первом открытии (модуль импортируется тогда же)"""
+        if name == "dashboard":
+            from .dashboard_frame import DashboardFrame
+            return DashboardFrame(self.content_frame, self.db)
+        elif name == "rooms":
+            from .rooms_frame import RoomsFrame
+            return RoomsFrame(self.content_frame, self.db)
+        elif name == "bookings":
+            from .bookings_frame import BookingsFrame
+            return BookingsFrame(self.content_frame, self.db)
+        elif name == "guests":
+            from .guests_frame import GuestsFrame
+            return GuestsFrame(self.content_frame, self.db)
+        raise ValueError(f"Неизвестный раздел: {name}")
+    
+    def refresh_frame(self, name):
+        """Обновление данных раздела (запросы выполняются в фоновом потоке)"""
+        frame = self.frames[name]
+        self.rendered_tokens[name] = self.db.get_change_token()
+        if name == "dashboard":
+            frame.reload()
+        elif name == "rooms":
+            frame.refresh_rooms_display()
+        elif name == "bookings":
+            frame.revalidate()
+        elif name == "guests":
+            frame.refresh_guests_table()
+    
+    def on_db_changes(self, batch):
+        """Пакет изменений БД: точечно обновляем уже созданные разделы"""
+        token = self.db.get_change_token()
+        for name, frame in self.frames.items():
+            frame.apply_changes(batch)
+            self.rendered_tokens[name] = token
+    
+    def poll_db_changes(self):
+        """Изменения других терминалов приходят через ту же шину событий"""
+        self.db.poll_external_changes()
+        self.after(AppConfig.CHANGE_POLL_MS, self.poll_db_changes)
+    
+    def revalidate_frame(self, name):
+        """
+        Проверка актуальности открытой вкладки после ее отрисовки.
+        Если БД не менялась, это одно сравнение маркеров. Иначе раздел
+        перечитывается в фоновом потоке, а в потоке Tk применяется только
+        разница: значения карточек панели управления, измененные строки
+        таблицы бронирований, результат поиска номеров и гостей.
+        """
+        if name != self.current_frame_name:
+            return  # ушли на другую вкладку - проверим при следующем открытии
+        if self.rendered_tokens.get(name) != self.db.get_change_token():
+            self.refresh_frame(name)
     
     def select_frame(self, name):
         """Переключение между разделами"""
@@ -261,24 +352,21 @@ class MainAppWindow(ctk.CTk):
         for tab_name, tab_btn in self.tab_buttons.items():
             tab_btn.set_active(tab_name == name)
         
-        # Скрываем все фреймы
-        self.dashboard_frame.grid_forget()
-        self.rooms_frame.grid_forget()
-        self.bookings_frame.grid_forget()
-        self.guests_frame.grid_forget()
+        # Скрываем текущий фрейм
+        if self.current_frame_name in self.frames:
+            self.frames[self.current_frame_name].grid_forget()
+        
+        frame = self.frames.get(name)
+        if frame is None:
+            # Новый фрейм уже загрузил данные в конструкторе - повторно не обновляем
+            self.rendered_tokens[name] = self.db.get_change_token()
+            frame = self.frames[name] = self.create_frame(name)
 
         # Показываем выбранный фрейм с минимальными отступами
-        if name == "dashboard":
-            self.dashboard_frame.grid(row=0, column=0, sticky="nsew", padx=20, pady=20)
-            self.dashboard_frame.update_stats()
-        elif name == "rooms":
-            self.rooms_frame.grid(row=0, column=0, sticky="nsew", padx=20, pady=20)
-            self.rooms_frame.refresh_rooms_display()
-        elif name == "bookings":
-            self.bookings_frame.grid(row=0, column=0, sticky="nsew", padx=20, pady=20)
-            self.bookings_frame.refresh_bookings_table()
-        elif name == "guests":
-            self.guests_frame.grid(row=0, column=0, sticky="nsew", padx=20, pady=20)
-            self.guests_frame.refresh_guests_table()
+        frame.grid(row=0, column=0, sticky="nsew", padx=20, pady=20)
+        
+        self.current_frame_name = name
         
-        self.current_frame_name = name
\ No newline at end of file
+        # Сразу показываем последние отрисованные данные, а актуальность
+        # проверяем после того, как Tk отрисует вкладку
+        self.after_idle(lambda: self.after(1, lambda: self.revalidate_frame(name)))
@@ -1,11 +1,13 @@
 import customtkinter as ctk
 from tkinter import messagebox
 from config import AppConfig
+from database import ChangeEvent
 from utils import validate_room_number, validate_price, format_currency
+from .search_pipeline import SearchPipeline, like_contains
 
 
 class AddRoomDialog(ctk.CTkToplevel):
-    def __init__(self, master, db, on_close_callback):
+    def __init__(self, master, db, on_close_callback=None):
         super().__init__(master)
         self.db = db
         self.on_close_callback = on_close_callback
@@ -110,7 +112,8 @@ class AddRoomDialog(ctk.CTkToplevel):
                 f"Цена: {format_currency(price)}", 
                 parent=self
             )
-            self.on_close_callback()
+            if self.on_close_callback:
+                self.on_close_callback()
             self.destroy()
         else:
             messagebox.showerror(
@@ -122,13 +125,13 @@ class AddRoomDialog(ctk.CTkToplevel):
 
 class EditRoomDialog(ctk.CTkToplevel):
     """Диалог редактирования номера"""
-    def __init__(self, master, db, room_data, on_close_callback):
+    def __init__(self, master, db, room_data, on_close_callback=None):
         super().__init__(master)
         self.db = db
         self.room_data = room_data
         self.on_close_callback = on_close_callback
         
-        self.title(f"Редактировать номер {room_data[1]}")
+        self.title(f"Редактировать номер {room_data.number}")
         self.geometry("400x450")
         self.transient(master)
         self.grab_set()
@@ -136,7 +139,7 @@ class EditRoomDialog(ctk.CTkToplevel):
         # Заголовок
         ctk.CTkLabel(
             self, 
-            text=f"Номер {room_data[1]}", 
+            text=f"Номер {room_data.number}", 
             font=ctk.CTkFont(size=20, weight="bold")
         ).pack(padx=20, pady=(20, 10))
         
@@ -148,14 +151,15 @@ class EditRoomDialog(ctk.CTkToplevel):
             values=AppConfig.ROOM_TYPES,
             width=300
         )
-        self.type_menu.set(room_data[2])
+        self.type_menu.set(room_data.type)
         self.type_menu.pack(padx=20, pady=5)
         
         # Цена
-        self.price_label = ctk.CTkLabel(self, text="Цена за ночь (руб):")
+        # Базовая цена действует на ночи без тарифа (rates.py, Database.set_rates)
+        self.price_label = ctk.CTkLabel(self, text="Базовая цена за ночь (руб, если нет тарифа):")
         self.price_label.pack(padx=20, pady=(10, 5), anchor="w")
         self.price_entry = ctk.CTkEntry(self, width=300)
-        self.price_entry.insert(0, str(room_data[3]))
+        self.price_entry.insert(0, str(room_data.price_per_night))
         self.price_entry.pack(padx=20, pady=5)
         
         # Статус
@@ -166,7 +170,7 @@ class EditRoomDialog(ctk.CTkToplevel):
             values=list(AppConfig.STATUS_COLORS.keys()),
             width=300
         )
-        self.status_menu.set(room_data[4])
+        self.status_menu.set(room_data.status)
         self.status_menu.pack(padx=20, pady=5)
         
         # Кнопки
@@ -209,31 +213,29 @@ class EditRoomDialog(ctk.CTkToplevel):
             messagebox.showerror("Ошибка", error_msg, parent=self)
             return
         
-        try:
-            # Обновление типа и цены
-            self.db.cursor.execute(
-                "UPDATE rooms SET type = ?, price_per_night = ?, status = ? WHERE id = ?",
-                (self.type_menu.get(), price, self.status_menu.get(), self.room_data[0])
-            )
-            self.db.conn.commit()
-            
+        # Обновление типа, цены и статуса
+        if self.db.update_room(
+            self.room_data.id, self.type_menu.get(), price, self.status_menu.get()
+        ):
             messagebox.showinfo("Успех", "Изменения сохранены", parent=self)
-            self.on_close_callback()
+            if self.on_close_callback:
+                self.on_close_callback()
             self.destroy()
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось сохранить изменения: {e}", parent=self)
+        else:
+            messagebox.showerror("Ошибка", "Не удалось сохранить изменения", parent=self)
     
     def delete_room(self):
         """Удаление номера"""
         if messagebox.askyesno(
             "Подтверждение",
-            f"Вы уверены, что хотите удалить номер {self.room_data[1]}?\n"
+            f"Вы уверены, что хотите удалить номер {self.room_data.number}?\n"
             "Это действие нельзя отменить!",
             parent=self
         ):
-            if self.db.delete_room(self.room_data[0]):
+            if self.db.delete_room(self.room_data.id):
                 messagebox.showinfo("Успех", "Номер удален", parent=self)
-                self.on_close_callback()
+                if self.on_close_callback:
+                    self.on_close_callback()
                 self.destroy()
             else:
                 messagebox.showerror(
@@ -244,22 +246,17 @@ class EditRoomDialog(ctk.CTkToplevel):
 
 
 class RoomCard(ctk.CTkFrame):
-    """Карточка номера"""
+    """Карточка номера (переиспользуется: данные меняются через bind_room)"""
     def __init__(self, master, room_data, on_click_callback):
         super().__init__(master, corner_radius=10)
-        self.room_data = room_data
+        self.room_data = None
         self.on_click_callback = on_click_callback
-        
-        room_id, number, r_type, price, status = room_data
-        
-        # Цвет границы в зависимости от статуса
-        border_color = AppConfig.STATUS_COLORS.get(status, "gray")
-        self.configure(border_width=3, border_color=border_color)
+        self.configure(border_width=3)
         
         # Номер
         self.num_label = ctk.CTkLabel(
             self, 
-            text=f"№ {number}", 
+            text="", 
             font=ctk.CTkFont(size=20, weight="bold")
         )
         self.num_label.pack(pady=(15, 5))
@@ -267,7 +264,7 @@ class RoomCard(ctk.CTkFrame):
         # Тип
         self.type_label = ctk.CTkLabel(
             self, 
-            text=r_type,
+            text="",
             font=ctk.CTkFont(size=13)
         )
         self.type_label.pack(pady=3)
@@ -275,7 +272,7 @@ class RoomCard(ctk.CTkFrame):
         # Цена
         self.price_label = ctk.CTkLabel(
             self, 
-            text=format_currency(price) + "/ночь",
+            text="",
             font=ctk.CTkFont(size=12)
         )
         self.price_label.pack(pady=3)
@@ -283,9 +280,8 @@ class RoomCard(ctk.CTkFrame):
         # Статус
         self.status_label = ctk.CTkLabel(
             self, 
-            text=status, 
-            font=ctk.CTkFont(size=14, weight="bold"),
-            text_color=border_color
+            text="", 
+            font=ctk.CTkFont(size=14, weight="bold")
         )
         self.status_label.pack(pady=(8, 15))
         
@@ -293,7 +289,7 @@ class RoomCard(ctk.CTkFrame):
         self.edit_button = ctk.CTkButton(
             self,
             text="Редактировать",
-            command=lambda: on_click_callback(room_data),
+            command=lambda: self.on_click_callback(self.room_data),
             width=120,
             height=30,
             font=ctk.CTkFont(size=11)
@@ -303,6 +299,27 @@ class RoomCard(ctk.CTkFrame):
         # Hover эффект
         self.bind("<Enter>", self.on_hover)
         self.bind("<Leave>", self.on_leave)
+        
+        self.bind_room(room_data)
+    
+    def bind_room(self, room_data):
+        """Привязка данных номера: обновляются только изменившиеся поля"""
+        if room_data == self.room_data:
+            return
+        old = self.room_data
+        self.room_data = room_data
+        
+        if old is None or room_data.number != old.number:
+            self.num_label.configure(text=f"№ {room_data.number}")
+        if old is None or room_data.type != old.type:
+            self.type_label.configure(text=room_data.type)
+        if old is None or room_data.price_per_night != old.price_per_night:
+            self.price_label.configure(text=format_currency(room_data.price_per_night) + "/ночь")
+        if old is None or room_data.status != old.status:
+            # Цвет границы в зависимости от статуса
+            border_color = AppConfig.STATUS_COLORS.get(room_data.status, "gray")
+            self.configure(border_color=border_color)
+            self.status_label.configure(text=room_data.status, text_color=border_color)
     
     def on_hover(self, event):
         """Эффект при наведении"""
@@ -314,6 +331,11 @@ class RoomCard(ctk.CTkFrame):
 
 
 class RoomsFrame(ctk.CTkFrame):
+    COLUMNS = 5
+    ROW_HEIGHT = 210  # высота карточки с отступами, px
+    # Тег привязок колеса мыши у сетки и всех ее виджетов
+    WHEEL_TAG = "RoomsGridWheel"
+
     def __init__(self, master, db):
         super().__init__(master, fg_color="transparent")
         self.db = db
@@ -350,7 +372,7 @@ class RoomsFrame(ctk.CTkFrame):
         self.status_filter = ctk.CTkOptionMenu(
             self.filter_bar,
             values=["Все"] + list(AppConfig.STATUS_COLORS.keys()),
-            command=lambda x: self.refresh_rooms_display(),
+            command=lambda x: self.apply_filters(),
             width=140
         )
         self.status_filter.grid(row=0, column=1, padx=5)
@@ -360,7 +382,7 @@ class RoomsFrame(ctk.CTkFrame):
         self.type_filter = ctk.CTkOptionMenu(
             self.filter_bar,
             values=["Все"] + AppConfig.ROOM_TYPES,
-            command=lambda x: self.refresh_rooms_display(),
+            command=lambda x: self.apply_filters(),
             width=180
         )
         self.type_filter.grid(row=0, column=4, padx=5)
@@ -372,7 +394,16 @@ class RoomsFrame(ctk.CTkFrame):
             width=200
         )
         self.search_entry.grid(row=0, column=5, padx=(20, 5))
-        self.search_entry.bind("<KeyRelease>", lambda e: self.refresh_rooms_display())
+        # Поиск: отложенный запуск, прерывание устаревших запросов, кэш
+        self.search_pipeline = SearchPipeline(
+            self,
+            get_query=lambda: self.search_entry.get().strip().lower(),
+            run_query=self.db.search_rooms_cancellable,
+            on_results=self.show_search_results,
+            refine=lambda rooms, query: [r for r in rooms if like_contains(r.number, query)],
+            interrupt=self.db.interrupt_search
+        )
+        self.search_entry.bind("<KeyRelease>", self.search_pipeline.schedule)
         
         # Кнопка сброса фильтров
         self.reset_button = ctk.CTkButton(
@@ -392,13 +423,48 @@ class RoomsFrame(ctk.CTkFrame):
         )
         self.stats_label.grid(row=0, column=7, padx=(20, 0), sticky="e")
         
-        # --- Контейнер для карточек ---
-        self.scrollable_frame = ctk.CTkScrollableFrame(self)
-        self.scrollable_frame.grid(row=2, column=0, sticky="nsew", padx=10, pady=10)
+        # --- Виртуальная сетка карточек ---
+        # Создаются только карточки видимых рядов, при прокрутке и
+        # фильтрации они переиспользуются с новыми данными
+        self.grid_container = ctk.CTkFrame(self)
+        self.grid_container.grid(row=2, column=0, sticky="nsew", padx=10, pady=10)
+        self.grid_container.grid_rowconfigure(0, weight=1)
+        self.grid_container.grid_columnconfigure(0, weight=1)
+        
+        self.cards_frame = ctk.CTkFrame(self.grid_container, fg_color="transparent")
+        self.cards_frame.grid(row=0, column=0, sticky="nsew")
+        # Размер сетки задает окно, а не количество карточек
+        self.cards_frame.grid_propagate(False)
+        
+        self.scrollbar = ctk.CTkScrollbar(self.grid_container, command=self.on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
         
         # Адаптивная сетка (5 колонок)
-        for i in range(5):
-            self.scrollable_frame.grid_columnconfigure(i, weight=1, uniform="cols")
+        for i in range(self.COLUMNS):
+            self.cards_frame.grid_columnconfigure(i, weight=1, uniform="cols")
+        
+        self.card_pool = []
+        self.filtered_rooms = []
+        self.first_row = 0
+        self.visible_rows = 1
+        self.full_rows = 1
+        self.search_rooms = []
+        self.total_rooms = 0
+        
+        self.empty_label = ctk.CTkLabel(
+            self.cards_frame,
+            text="",
+            font=ctk.CTkFont(size=16),
+            text_color="gray"
+        )
+        
+        self.cards_frame.bind("<Configure>", self.on_resize)
+        # Колесо мыши прокручивает сетку, только когда курсор над ней. Привязка
+        # через свой тег, а не bind_all: глобальные привязки колеса других
+        # компонентов (учет активности в MaintenanceScheduler) не затрагиваются
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.bind_class(self.WHEEL_TAG, sequence, self.on_mousewheel)
+        self.add_wheel_tag(self.grid_container)
 
         self.refresh_rooms_display()
 
@@ -407,69 +473,153 @@ class RoomsFrame(ctk.CTkFrame):
         self.status_filter.set("Все")
         self.type_filter.set("Все")
         self.search_entry.delete(0, 'end')
-        self.refresh_rooms_display()
+        self.search_pipeline.run_now()
 
     def refresh_rooms_display(self):
-        """Обновление отображения номеров"""
-        # Очистка
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
+        """Обновление отображения номеров (данные могли измениться - кэш поиска сбрасывается)"""
+        self.total_rooms = self.db.count_rooms()
+        self.search_pipeline.invalidate()
+        self.search_pipeline.run_now()
 
-        # Получение всех номеров
-        all_rooms = self.db.get_all_rooms()
+    def apply_changes(self, batch):
+        """Применение изменений из шины событий БД"""
+        if not batch.has(ChangeEvent.ROOM):
+            return
         
-        # Применение фильтров
-        filtered_rooms = all_rooms
+        if batch.structural(ChangeEvent.ROOM):
+            self.refresh_rooms_display()
+            return
+        
+        # Изменились поля номеров - подменяем их в текущем результате
+        self.search_pipeline.invalidate()
+        changed = batch.ids(ChangeEvent.ROOM)
+        updates = {room.id: room for room in self.db.get_rooms_by_ids(changed)}
+        self.search_rooms = [updates.get(room.id, room) for room in self.search_rooms]
+        self.apply_filters()
+
+    def show_search_results(self, search_query, rooms):
+        """Результат поиска по номеру получен - применяем остальные фильтры"""
+        self.search_rooms = rooms
+        self.apply_filters()
+
+    def apply_filters(self):
+        """Фильтрация найденных номеров по статусу и типу без запроса к БД"""
+        filtered_rooms = self.search_rooms
+        search_query = self.search_entry.get().strip()
         
         # Фильтр по статусу
         status = self.status_filter.get()
         if status != "Все":
-            filtered_rooms = [r for r in filtered_rooms if r[4] == status]
+            filtered_rooms = [r for r in filtered_rooms if r.status == status]
         
         # Фильтр по типу
         room_type = self.type_filter.get()
         if room_type != "Все":
-            filtered_rooms = [r for r in filtered_rooms if r[2] == room_type]
-        
-        # Поиск по номеру
-        search_query = self.search_entry.get().strip().lower()
-        if search_query:
-            filtered_rooms = [r for r in filtered_rooms if search_query in str(r[1]).lower()]
+            filtered_rooms = [r for r in filtered_rooms if r.type == room_type]
         
         # Обновление статистики
-        total = len(all_rooms)
+        total = self.total_rooms
         shown = len(filtered_rooms)
         self.stats_label.configure(text=f"Показано: {shown} из {total}")
         
+        self.filtered_rooms = filtered_rooms
+        
         # Отображение карточек
         if not filtered_rooms:
-            no_rooms_label = ctk.CTkLabel(
-                self.scrollable_frame,
+            self.empty_label.configure(
                 text="Номера не найдены" if search_query or status != "Все" or room_type != "Все" 
-                     else "Добавьте первый номер",
-                font=ctk.CTkFont(size=16),
-                text_color="gray"
+                     else "Добавьте первый номер"
             )
-            no_rooms_label.grid(row=0, column=0, columnspan=5, pady=50)
+            self.empty_label.grid(row=0, column=0, columnspan=self.COLUMNS, pady=50)
         else:
-            row, col = 0, 0
-            for room in filtered_rooms:
-                card = RoomCard(
-                    self.scrollable_frame, 
-                    room, 
-                    self.open_edit_room_dialog
-                )
-                card.grid(row=row, column=col, padx=8, pady=8, sticky="nsew")
-                
-                col += 1
-                if col >= 5:
-                    col = 0
-                    row += 1
+            self.empty_label.grid_remove()
+        
+        self.first_row = max(0, min(self.first_row, self.total_rows() - self.full_rows))
+        self.layout_cards()
+
+    def total_rows(self):
+        """Количество рядов сетки для отфильтрованных номеров"""
+        return (len(self.filtered_rooms) + self.COLUMNS - 1) // self.COLUMNS
+
+    def layout_cards(self):
+        """Привязка видимых рядов к карточкам из пула"""
+        slots = self.visible_rows * self.COLUMNS
+        start = self.first_row * self.COLUMNS
+        rooms = self.filtered_rooms[start:start + slots]
+        
+        for index, room in enumerate(rooms):
+            if index < len(self.card_pool):
+                card = self.card_pool[index]
+                card.bind_room(room)
+            else:
+                card = RoomCard(self.cards_frame, room, self.open_edit_room_dialog)
+                self.add_wheel_tag(card)
+                self.card_pool.append(card)
+            card.grid(
+                row=index // self.COLUMNS,
+                column=index % self.COLUMNS,
+                padx=8, pady=8, sticky="nsew"
+            )
+        
+        # Лишние карточки скрываем, но не уничтожаем
+        for card in self.card_pool[len(rooms):]:
+            card.grid_remove()
+        
+        self.update_scrollbar()
+
+    def update_scrollbar(self):
+        total_rows = self.total_rows()
+        if total_rows <= self.full_rows:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(
+                self.first_row / total_rows,
+                (self.first_row + self.full_rows) / total_rows
+            )
+
+    def scroll_to_row(self, row):
+        row = max(0, min(int(row), self.total_rows() - self.full_rows))
+        if row != self.first_row:
+            self.first_row = row
+            self.layout_cards()
+
+    def on_scrollbar(self, action, value, units=None):
+        if action == "moveto":
+            self.scroll_to_row(round(float(value) * self.total_rows()))
+        elif action == "scroll":
+            step = self.full_rows if units == "pages" else 1
+            self.scroll_to_row(self.first_row + int(value) * step)
+
+    def on_mousewheel(self, event):
+        if getattr(event, "num", None) == 4 or getattr(event, "delta", 0) > 0:
+            self.scroll_to_row(self.first_row - 1)
+        else:
+            self.scroll_to_row(self.first_row + 1)
+
+    def add_wheel_tag(self, widget):
+        """Тег колеса мыши для виджета и всех его вложенных виджетов"""
+        tags = widget.bindtags()
+        if self.WHEEL_TAG not in tags:
+            widget.bindtags((self.WHEEL_TAG,) + tags)
+        for child in widget.winfo_children():
+            self.add_wheel_tag(child)
+
+    def on_resize(self, event):
+        """Пересчет числа видимых рядов (частично видимый ряд тоже создается)"""
+        visible_rows = max(1, -(-event.height // self.ROW_HEIGHT))
+        self.full_rows = max(1, event.height // self.ROW_HEIGHT)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self.first_row = max(0, min(self.first_row, self.total_rows() - self.full_rows))
+            self.layout_cards()
+        else:
+            self.update_scrollbar()
 
     def open_add_room_dialog(self):
         """Открыть диалог добавления номера"""
-        AddRoomDialog(self, self.db, on_close_callback=self.refresh_rooms_display)
+        # Сетка обновится по событию изменения БД
+        AddRoomDialog(self, self.db)
     
     def open_edit_room_dialog(self, room_data):
         """Открыть диалог редактирования номера"""
-        EditRoomDialog(self, self.db, room_data, on_close_callback=self.refresh_rooms_display)
\ No newline at end of file
+        EditRoomDialog(self, self.db, room_data)
\ No newline at end of file
@@ -0,0 +1,229 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+from config import AppConfig
+
+logger = logging.getLogger(__name__)
+
+
+class BackupScheduler:
+    """
+    Периодическое онлайн-резервное копирование в фоновом потоке.
+    Срок следующей копии считается от времени последнего снимка на диске,
+    поэтому перезапуск приложения не приводит к лишним копиям. Копия,
+    отложенная из-за записи других терминалов, повторяется через
+    AppConfig.BACKUP_RETRY_MINUTES.
+    """
+    CHECK_MS = 60000
+    POLL_MS = 500
+
+    def __init__(self, widget, db):
+        self.widget = widget
+        self.db = db
+        self.interval = AppConfig.BACKUP_INTERVAL_HOURS * 3600
+        self.worker = None
+        self.results = queue.Queue()
+        self.last_result = None
+        self.last_error = None
+        self.retry_at = 0  # time.time(), раньше которого отложенную копию не повторяем
+        self.widget.after(self.CHECK_MS, self.check)
+
+    def last_backup_time(self):
+        """Время последнего снимка (0, если снимков нет)"""
+        from backup import list_backups
+
+        backups = list_backups(self.db.db_file, AppConfig.BACKUP_DIR)
+        return os.path.getmtime(backups[0]) if backups else 0
+
+    def check(self):
+        """Проверка срока; сама копия идет в фоновом потоке"""
+        now = time.time()
+        if (self.worker is None and now >= self.retry_at
+                and now - self.last_backup_time() >= self.interval):
+            self.start()
+        self.widget.after(self.CHECK_MS, self.check)
+
+    def start(self):
+        if self.worker is not None:
+            return
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+        self.widget.after(self.POLL_MS, self.poll)
+
+    def run(self):
+        """Фоновый поток"""
+        from backup import run_backup, BackupDeferred, BackupError
+
+        try:
+            self.results.put(("done", run_backup(self.db.conn, self.db.db_file)))
+        except BackupDeferred as e:
+            self.results.put(("deferred", str(e)))
+        except (BackupError, OSError) as e:
+            self.results.put(("error", str(e)))
+
+    def poll(self):
+        try:
+            kind, value = self.results.get_nowait()
+        except queue.Empty:
+            self.widget.after(self.POLL_MS, self.poll)
+            return
+        self.worker = None
+        if kind == "done":
+            self.last_result = value
+            self.last_error = None
+        elif kind == "deferred":
+            self.retry_at = time.time() + AppConfig.BACKUP_RETRY_MINUTES * 60
+            logger.warning(f"{value}, повтор через {AppConfig.BACKUP_RETRY_MINUTES} мин")
+        else:
+            self.last_error = value
+            logger.error(f"Резервное копирование не выполнено: {value}")
+
+
+class MaintenanceScheduler:
+    """
+    Обслуживание БД в простое: ANALYZE, incremental_vacuum, контрольная точка WAL,
+    quick_check (см. maintenance.py). Идет в фоновом потоке через отдельное
+    соединение; нажатие клавиши или клик прерывает текущую задачу.
+    """
+    CHECK_MS = 30000
+    POLL_MS = 500
+    ACTIVITY_EVENTS = ("<KeyPress>", "<ButtonPress>", "<MouseWheel>")
+
+    def __init__(self, widget, db, backup_scheduler=None):
+        self.widget = widget
+        self.db = db
+        self.backup_scheduler = backup_scheduler
+        self.interval = AppConfig.MAINTENANCE_INTERVAL_HOURS * 3600
+        self.last_activity = time.monotonic()
+        self.last_run = None  # время последнего полного прохода (monotonic)
+        self.worker = None
+        self.abort = threading.Event()
+        self.results = queue.Queue()
+        self.last_report = None
+        for sequence in self.ACTIVITY_EVENTS:
+            self.widget.bind_all(sequence, self.on_activity, add="+")
+        self.widget.after(self.CHECK_MS, self.check)
+
+    def on_activity(self, event=None):
+        self.last_activity = time.monotonic()
+        if self.worker is not None:
+            self.abort.set()
+
+    def is_due(self) -> bool:
+        now = time.monotonic()
+        if now - self.last_activity < AppConfig.MAINTENANCE_IDLE_SECONDS:
+            return False
+        if self.backup_scheduler is not None and self.backup_scheduler.worker is not None:
+            return False
+        return self.last_run is None or now - self.last_run >= self.interval
+
+    def check(self):
+        if self.worker is None and self.is_due():
+            self.start()
+        self.widget.after(self.CHECK_MS, self.check)
+
+    def start(self):
+        if self.worker is not None:
+            return
+        self.abort.clear()
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+        self.widget.after(self.POLL_MS, self.poll)
+
+    def run(self):
+        """Фоновый поток"""
+        from maintenance import run_maintenance
+
+        self.results.put(run_maintenance(self.db.db_file, should_abort=self.abort.is_set))
+
+    def poll(self):
+        from maintenance import format_report, ABORTED, DONE
+
+        try:
+            report = self.results.get_nowait()
+        except queue.Empty:
+            self.widget.after(self.POLL_MS, self.poll)
+            return
+        self.worker = None
+        self.last_report = report
+        logger.info(f"Обслуживание БД:\n{format_report(report)}")
+        # Прерванный проход повторяется в следующем простое
+        if not any(item["status"] == ABORTED for item in report):
+            self.last_run = time.monotonic()
+        if any(item["task"] == "analyze" and item["status"] == DONE for item in report):
+            self.db.reload_statistics()
+
+
+class PricingScheduler:
+    """
+    Периодический пересчет динамических цен (pricing.py) в отдельном процессе:
+    расчет на год вперед не отнимает у интерфейса ни GIL, ни соединение.
+    Множители публикуются одной транзакцией; кэши предложений этого процесса
+    сбрасываются по журналу изменений (poll_external_changes).
+    """
+    CHECK_MS = 60000
+    POLL_MS = 1000
+
+    def __init__(self, widget, db):
+        self.widget = widget
+        self.db = db
+        self.interval = AppConfig.PRICING_INTERVAL_HOURS * 3600
+        self.last_run = None  # время последнего пересчета (monotonic)
+        self.executor = None
+        self.future = None
+        self.last_result = None
+        self.last_error = None
+        self.retry_at = 0  # time.time(), раньше которого отложенную копию не повторяем
+        self.widget.after(self.CHECK_MS, self.check)
+
+    def check(self):
+        now = time.monotonic()
+        if self.future is None and (self.last_run is None or now - self.last_run >= self.interval):
+            self.start()
+        self.widget.after(self.CHECK_MS, self.check)
+
+    def start(self):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        from pricing import run_pricing
+
+        if self.future is not None:
+            return
+        if self.executor is None:
+            # spawn: дочерний процесс не наследует состояние Tk и потоки этого процесса
+            self.executor = ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            )
+        self.future = self.executor.submit(run_pricing, self.db.db_file)
+        self.widget.after(self.POLL_MS, self.poll)
+
+    def poll(self):
+        from concurrent.futures.process import BrokenProcessPool
+        from pricing import format_summary, PricingError
+
+        if not self.future.done():
+            self.widget.after(self.POLL_MS, self.poll)
+            return
+        future, self.future = self.future, None
+        self.last_run = time.monotonic()
+        try:
+            self.last_result = future.result()
+            self.last_error = None
+            logger.info(f"Динамические цены пересчитаны:\n{format_summary(self.last_result)}")
+        except BrokenProcessPool as e:
+            # Процесс пересчета завершился аварийно - при следующем запуске создается новый
+            self.executor = None
+            self.last_error = str(e)
+            logger.error(f"Процесс пересчета цен завершился аварийно: {e}")
+        except PricingError as e:
+            self.last_error = str(e)
+            logger.error(f"Динамические цены не пересчитаны: {e}")
+
+    def shutdown(self):
+        """Остановка процесса пересчета при выходе (начатый пересчет доводится до конца)"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
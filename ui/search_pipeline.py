@@ -0,0 +1,151 @@
+import queue
+import string
+import threading
+from collections import OrderedDict
+
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def like_contains(value, query: str) -> bool:
+    """
+    Проверка вхождения с семантикой SQLite LIKE '%query%':
+    регистр не учитывается только для латиницы
+    """
+    if not value:
+        return not query
+    return query.translate(_ASCII_LOWER) in str(value).translate(_ASCII_LOWER)
+
+
+class SearchPipeline:
+    """
+    Конвейер поиска для полей ввода.
+    Нажатия клавиш откладываются (debounce), запрос выполняется в фоновом
+    потоке, выполняющийся устаревший запрос прерывается при появлении нового.
+    Последние результаты кэшируются; результат для более короткого префикса
+    уточняется локально через refine, без обращения к БД.
+    """
+    POLL_MS = 20
+
+    def __init__(self, widget, get_query, run_query, on_results,
+                 refine=None, interrupt=None, delay_ms=250, cache_size=32):
+        # get_query() -> строка поиска
+        # run_query(query) -> результат или None (прерван/ошибка); фоновый поток
+        # on_results(query, result) - вызывается в потоке Tk
+        # refine(result, query) -> уточненный результат или None, если нельзя
+        # interrupt() - прерывание выполняющегося run_query
+        self.widget = widget
+        self.get_query = get_query
+        self.run_query = run_query
+        self.on_results = on_results
+        self.refine = refine
+        self.interrupt = interrupt
+        self.delay_ms = delay_ms
+        self.cache_size = cache_size
+
+        self.cache = OrderedDict()  # запрос -> результат
+        self.hits = 0
+        self.misses = 0
+
+        self._generation = 0
+        self._epoch = 0
+        self._outstanding = 0
+        self._after_id = None
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._worker = None
+
+    # --- Публичный интерфейс ---
+    def schedule(self, event=None):
+        """Отложенный запуск поиска (привязывается к <KeyRelease>)"""
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+        self._after_id = self.widget.after(self.delay_ms, self._start)
+
+    def run_now(self):
+        """Немедленный запуск поиска"""
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+        self._start()
+
+    def invalidate(self):
+        """Сброс кэша (данные в БД изменились)"""
+        self.cache.clear()
+        self._epoch += 1
+
+    # --- Внутренняя логика ---
+    def _start(self):
+        self._after_id = None
+        query = self.get_query()
+        self._generation += 1
+
+        result = self._lookup(query)
+        if result is not None:
+            self.hits += 1
+            if self._outstanding and self.interrupt:
+                self.interrupt()
+            self.on_results(query, result)
+            return
+
+        self.misses += 1
+        if self._outstanding and self.interrupt:
+            self.interrupt()
+        self._ensure_worker()
+        self._outstanding += 1
+        self._requests.put((self._generation, self._epoch, query))
+        if self._outstanding == 1:
+            self.widget.after(self.POLL_MS, self._poll)
+
+    def _lookup(self, query):
+        """Поиск в кэше: точное совпадение или уточнение по префиксу"""
+        if query in self.cache:
+            self.cache.move_to_end(query)
+            return self.cache[query]
+        if self.refine is None:
+            return None
+        for key in reversed(self.cache):
+            if key != query and query.startswith(key):
+                result = self.refine(self.cache[key], query)
+                if result is not None:
+                    self._store(query, result)
+                    return result
+        return None
+
+    def _store(self, query, result):
+        self.cache[query] = result
+        self.cache.move_to_end(query)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._work, daemon=True)
+            self._worker.start()
+
+    def _work(self):
+        """Фоновый поток: выполняет только самый свежий запрос из очереди"""
+        while True:
+            request = self._requests.get()
+            while not self._requests.empty():
+                # Устаревшие запросы пропускаем, но отчитываемся о них
+                self._results.put(request + (None,))
+                request = self._requests.get()
+            generation, epoch, query = request
+            self._results.put((generation, epoch, query, self.run_query(query)))
+
+    def _poll(self):
+        """Забор результатов из фонового потока в потоке Tk"""
+        while True:
+            try:
+                generation, epoch, query, result = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._outstanding -= 1
+            if result is None:
+                continue
+            if epoch == self._epoch:
+                self._store(query, result)
+            if generation == self._generation:
+                self.on_results(query, result)
+        if self._outstanding:
+            self.widget.after(self.POLL_MS, self._poll)
@@ -0,0 +1,81 @@
+class TreeviewSync:
+    """
+    Синхронизация строк ttk.Treeview по ключу.
+    Вместо полной очистки и перевставки вычисляет разницу с текущим
+    содержимым и применяет только вставки, обновления и удаления.
+    """
+    def __init__(self, tree):
+        self.tree = tree
+        self.rows = {}   # ключ -> (values, tags)
+        self.order = []  # ключи в порядке отображения
+
+    @staticmethod
+    def iid(key):
+        """Идентификатор элемента Treeview для ключа строки"""
+        return str(key)
+
+    def apply(self, rows):
+        """
+        Применение нового набора строк
+        rows - итерируемое из (key, values, tags)
+        Возвращает (вставлено, обновлено, удалено)
+        """
+        tree = self.tree
+        new_rows = {}
+        new_order = []
+        for key, values, tags in rows:
+            new_rows[key] = (tuple(values), tuple(tags))
+            new_order.append(key)
+
+        # Позиция прокрутки до изменений
+        first_visible = tree.yview()[0]
+
+        # Удаления
+        removed = [key for key in self.order if key not in new_rows]
+        if removed:
+            tree.delete(*[self.iid(key) for key in removed])
+
+        # Обновления изменившихся строк
+        updated = 0
+        for key, row in new_rows.items():
+            old_row = self.rows.get(key)
+            if old_row is not None and old_row != row:
+                tree.item(self.iid(key), values=row[0], tags=row[1])
+                updated += 1
+
+        # Вставки и порядок
+        survivors_old = [key for key in self.order if key in new_rows]
+        survivors_new = [key for key in new_order if key in self.rows]
+        inserted = 0
+        if survivors_old == survivors_new:
+            # Порядок сохранился - вставляем только новые строки на их места
+            for index, key in enumerate(new_order):
+                if key not in self.rows:
+                    values, tags = new_rows[key]
+                    tree.insert("", index, iid=self.iid(key), values=values, tags=tags)
+                    inserted += 1
+        else:
+            # Порядок изменился (например, другая сортировка) - переставляем
+            for index, key in enumerate(new_order):
+                if key in self.rows:
+                    tree.move(self.iid(key), "", index)
+                else:
+                    values, tags = new_rows[key]
+                    tree.insert("", index, iid=self.iid(key), values=values, tags=tags)
+                    inserted += 1
+
+        self.rows = new_rows
+        self.order = new_order
+
+        # Восстановление прокрутки, если менялась структура
+        if removed or inserted:
+            tree.yview_moveto(first_visible)
+
+        return inserted, updated, len(removed)
+
+    def clear(self):
+        """Полная очистка таблицы"""
+        if self.order:
+            self.tree.delete(*[self.iid(key) for key in self.order])
+        self.rows = {}
+        self.order = []
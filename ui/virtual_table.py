@@ -0,0 +1,307 @@
+import customtkinter as ctk
+from collections import OrderedDict
+from tkinter import ttk
+
+from .tree_sync import TreeviewSync
+
+
+class QuerySource:
+    """Источник строк для VirtualTable: постраничные запросы к БД"""
+    def __init__(self, count_fn, page_fn, keyset=False):
+        # count_fn() -> int
+        # page_fn(offset, limit, order_by, descending) -> список строк
+        # keyset=True: page_fn(offset, limit, order_by, descending, after, before),
+        # after/before - строки соседних страниц для поиска по индексу вместо offset
+        self.count_fn = count_fn
+        self.page_fn = page_fn
+        self.keyset = keyset
+
+    def count(self):
+        return self.count_fn()
+
+    def fetch(self, offset, limit, order_by=None, descending=False, after=None, before=None):
+        if self.keyset:
+            return self.page_fn(offset, limit, order_by, descending, after, before)
+        return self.page_fn(offset, limit, order_by, descending)
+
+
+class ListSource:
+    """Источник строк из уже загруженного списка"""
+    def __init__(self, rows, sort_columns=None):
+        # sort_columns - ключ сортировки -> имя поля записи
+        self.rows = list(rows)
+        self.sort_columns = sort_columns or {}
+        self.sorted_by = None
+
+    def count(self):
+        return len(self.rows)
+
+    def fetch(self, offset, limit, order_by=None, descending=False, after=None, before=None):
+        field = self.sort_columns.get(order_by)
+        if field is not None and self.sorted_by != (order_by, descending):
+            self.rows.sort(
+                key=lambda row: (getattr(row, field) is None, getattr(row, field), row.id),
+                reverse=descending
+            )
+            self.sorted_by = (order_by, descending)
+        return self.rows[offset:offset + limit]
+
+
+class VirtualTable(ctk.CTkFrame):
+    """
+    Таблица с виртуальной прокруткой.
+    В ttk.Treeview хранятся только видимые строки и запас (overscan)
+    сверху и снизу, остальные подгружаются страницами из источника.
+    Методы selection/selection_set/item/identify_row/bind совместимы
+    с ttk.Treeview, поэтому обработчики фреймов работают без изменений.
+    """
+    HEADING_HEIGHT = 25
+    WHEEL_ROWS = 3
+
+    def __init__(self, master, columns, style, format_row, row_tags=None,
+                 row_key=None, page_size=200, overscan=10, max_pages=20,
+                 sort_by=None, sort_descending=False):
+        # columns - список (id, заголовок, ширина, выравнивание, ключ сортировки)
+        super().__init__(master)
+        self.format_row = format_row
+        self.row_tags = row_tags or (lambda row: ())
+        self.row_key = row_key or (lambda row: row.id)
+        self.page_size = page_size
+        self.overscan = overscan
+        self.max_pages = max_pages
+        self.sort_keys = {col[0]: col[4] for col in columns}
+        self.sort_by = sort_by
+        self.sort_descending = sort_descending
+
+        self.source = ListSource([])
+        self.total = 0
+        self.offset = 0
+        self.visible_rows = 1
+        self.pages = OrderedDict()  # номер страницы -> строки
+        self.window_rows = {}       # iid -> строка в текущем окне
+        self.selected = {}          # iid -> строка для всех выделенных
+
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.tree = ttk.Treeview(
+            self,
+            columns=[col[0] for col in columns],
+            show="headings",
+            style=style
+        )
+        for col_id, heading, width, anchor, sort_key in columns:
+            self.tree.heading(
+                col_id,
+                text=heading,
+                command=(lambda c=col_id: self.toggle_sort(c)) if sort_key else ""
+            )
+            self.tree.column(col_id, width=width, anchor=anchor)
+
+        self.rowheight = int(ttk.Style().lookup(style, "rowheight") or 20)
+        self.tree_sync = TreeviewSync(self.tree)
+
+        # Скроллбары: вертикальный управляет окном строк, а не Treeview
+        self.vsb = ttk.Scrollbar(self, orient="vertical", command=self.on_scrollbar)
+        hsb = ttk.Scrollbar(self, orient="horizontal", command=self.tree.xview)
+        self.tree.configure(xscrollcommand=hsb.set)
+
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.vsb.grid(row=0, column=1, sticky="ns")
+        hsb.grid(row=1, column=0, sticky="ew")
+
+        self.tree.bind("<Configure>", self.on_resize)
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll_rows(-self.WHEEL_ROWS))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_rows(self.WHEEL_ROWS))
+        self.tree.bind("<Prior>", lambda e: self.scroll_rows(-self.visible_rows))
+        self.tree.bind("<Next>", lambda e: self.scroll_rows(self.visible_rows))
+        self.tree.bind("<<TreeviewSelect>>", self.on_select, add="+")
+
+    # --- Совместимость с ttk.Treeview ---
+    def bind(self, sequence=None, func=None, add=None):
+        return self.tree.bind(sequence, func, add)
+
+    def tag_configure(self, tagname, **kwargs):
+        return self.tree.tag_configure(tagname, **kwargs)
+
+    def identify_row(self, y):
+        return self.tree.identify_row(y)
+
+    def selection(self):
+        """Выделенные строки, включая прокрученные за пределы окна"""
+        return tuple(self.selected)
+
+    def selection_set(self, *items):
+        if len(items) == 1 and isinstance(items[0], (list, tuple)):
+            items = tuple(items[0])
+        self.selected = {
+            iid: self.window_rows[iid] for iid in items if iid in self.window_rows
+        }
+        self.tree.selection_set(items)
+
+    def item(self, iid):
+        """Данные строки в формате ttk.Treeview.item"""
+        row = self.selected.get(iid) or self.window_rows.get(iid)
+        if row is None:
+            return self.tree.item(iid)
+        return {"values": list(self.format_row(row)), "tags": list(self.row_tags(row))}
+
+    # --- Источник данных ---
+    def set_source(self, source, reset_offset=True):
+        """Новый источник (например, смена фильтра) - по умолчанию прокрутка в начало"""
+        self.source = source
+        if reset_offset:
+            self.offset = 0
+        self.refresh()
+
+    def refresh(self):
+        """Перечитать количество и видимое окно из источника"""
+        self.pages.clear()
+        self.total = self.source.count()
+        self.offset = max(0, min(self.offset, self.total - self.visible_rows))
+        self.render()
+
+    def loaded_keys(self):
+        """Ключи строк, загруженных в кэш страниц"""
+        return {self.row_key(row) for page in self.pages.values() for row in page}
+
+    def patch_rows(self, rows):
+        """
+        Замена строк по ключу в загруженных данных без перечитывания окна.
+        Если ни одна строка не изменилась, окно не перерисовывается
+        """
+        updates = {self.row_key(row): row for row in rows}
+        if not updates:
+            return
+        pages = list(self.pages.values())
+        if isinstance(self.source, ListSource):
+            pages.append(self.source.rows)
+        changed = False
+        for page in pages:
+            for index, row in enumerate(page):
+                key = self.row_key(row)
+                if key in updates and row != updates[key]:
+                    page[index] = updates[key]
+                    changed = True
+        if not changed:
+            return
+        for key, row in updates.items():
+            iid = TreeviewSync.iid(key)
+            if iid in self.selected:
+                self.selected[iid] = row
+        self.render()
+
+    def toggle_sort(self, col_id):
+        """Сортировка по колонке (повторный клик меняет направление)"""
+        sort_key = self.sort_keys.get(col_id)
+        if self.sort_by == sort_key:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_by = sort_key
+            self.sort_descending = False
+        self.offset = 0
+        self.refresh()
+
+    def get_rows(self, start, end):
+        """Строки [start, end) с подгрузкой недостающих страниц"""
+        rows = []
+        first_page = start // self.page_size
+        last_page = (end - 1) // self.page_size
+        for page_no in range(first_page, last_page + 1):
+            page = self.pages.get(page_no)
+            if page is None:
+                # Соседняя загруженная страница - опорная строка для источника
+                previous = self.pages.get(page_no - 1)
+                following = self.pages.get(page_no + 1)
+                page = self.source.fetch(
+                    page_no * self.page_size,
+                    self.page_size,
+                    self.sort_by,
+                    self.sort_descending,
+                    after=previous[-1] if previous and len(previous) == self.page_size else None,
+                    before=following[0] if following else None
+                )
+                self.pages[page_no] = page
+                while len(self.pages) > self.max_pages:
+                    self.pages.popitem(last=False)
+            else:
+                self.pages.move_to_end(page_no)
+            page_start = page_no * self.page_size
+            rows.extend(page[max(0, start - page_start):end - page_start])
+        return rows
+
+    # --- Отрисовка окна ---
+    def render(self):
+        """Синхронизация Treeview с текущим окном строк"""
+        start = max(0, self.offset - self.overscan)
+        end = min(self.total, self.offset + self.visible_rows + self.overscan)
+        rows = self.get_rows(start, end) if end > start else []
+
+        self.window_rows = {}
+        entries = []
+        for row in rows:
+            iid = TreeviewSync.iid(self.row_key(row))
+            self.window_rows[iid] = row
+            entries.append((iid, self.format_row(row), self.row_tags(row)))
+        self.tree_sync.apply(entries)
+
+        # Обновляем выделенные строки свежими данными
+        for iid in self.selected:
+            if iid in self.window_rows:
+                self.selected[iid] = self.window_rows[iid]
+        in_window = [iid for iid in self.selected if iid in self.window_rows]
+        if tuple(self.tree.selection()) != tuple(in_window):
+            self.tree.selection_set(in_window)
+
+        if rows:
+            self.tree.yview_moveto((self.offset - start) / len(rows))
+        self.update_scrollbar()
+
+    def update_scrollbar(self):
+        if self.total <= 0:
+            self.vsb.set(0.0, 1.0)
+            return
+        first = self.offset / self.total
+        last = min(1.0, (self.offset + self.visible_rows) / self.total)
+        self.vsb.set(first, last)
+
+    def scroll_to(self, offset):
+        offset = max(0, min(int(offset), self.total - self.visible_rows))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def scroll_rows(self, delta):
+        self.scroll_to(self.offset + delta)
+        return "break"
+
+    # --- Обработчики событий ---
+    def on_scrollbar(self, action, value, units=None):
+        if action == "moveto":
+            self.scroll_to(float(value) * self.total)
+        elif action == "scroll":
+            step = self.visible_rows if units == "pages" else 1
+            self.scroll_rows(int(value) * step)
+
+    def on_mousewheel(self, event):
+        direction = -1 if event.delta > 0 else 1
+        return self.scroll_rows(direction * self.WHEEL_ROWS)
+
+    def on_resize(self, event):
+        visible = max(1, (event.height - self.HEADING_HEIGHT) // self.rowheight)
+        if visible != self.visible_rows:
+            self.visible_rows = visible
+            self.offset = max(0, min(self.offset, self.total - self.visible_rows))
+            self.render()
+
+    def on_select(self, event):
+        """Выделение вне окна сохраняется, внутри окна берется из Treeview"""
+        selected = {
+            iid: row for iid, row in self.selected.items()
+            if iid not in self.window_rows
+        }
+        for iid in self.tree.selection():
+            if iid in self.window_rows:
+                selected[iid] = self.window_rows[iid]
+        self.selected = selected
@@ -2,8 +2,10 @@
 Вспомогательные функции для Hotel Management System
 """
 from datetime import datetime, date, timedelta
+import os
 import re
-from typing import Optional, Tuple
+import time
+from typing import Dict, List, Optional, Tuple
 
 
 def validate_phone(phone: str) -> bool:
@@ -86,6 +88,24 @@ def format_date(d: date, format_str: str = "%d.%m.%Y") -> str:
     return d.strftime(format_str)
 
 
+_EPOCH = date(1970, 1, 1)
+
+
+def date_to_day(d) -> int:
+    """
+    Номер дня (дней от 1970-01-01) для date или строки 'ГГГГ-ММ-ДД'
+    Совпадает с колонками bookings.ci_day/co_day
+    """
+    if isinstance(d, str):
+        d = datetime.strptime(d, "%Y-%m-%d").date()
+    return (d - _EPOCH).days
+
+
+def day_to_date(day: int) -> date:
+    """Дата по номеру дня"""
+    return _EPOCH + timedelta(days=day)
+
+
 def get_date_range(start_date: date, end_date: date) -> list:
     """Получение списка дат в диапазоне"""
     delta = end_date - start_date
@@ -225,6 +245,11 @@ def get_season(check_date: date) -> str:
         return "Осень"
 
 
+def season_multipliers_by_month(multipliers: Dict[str, float]) -> List[float]:
+    """Множители цены для месяцев 1-12 по сезону get_season (нет в словаре - 1.0)"""
+    return [multipliers.get(get_season(date(2000, month, 1)), 1.0) for month in range(1, 13)]
+
+
 def calculate_discount(total: float, nights: int) -> Tuple[float, float]:
     """
     Расчет скидки в зависимости от длительности
@@ -242,4 +267,88 @@ def calculate_discount(total: float, nights: int) -> Tuple[float, float]:
     discount = total * discount_rate
     final_total = total - discount
     
-    return discount, final_total
\ No newline at end of file
+    return discount, final_total
+
+
+def get_process_age() -> Optional[float]:
+    """
+    Время в секундах с момента создания процесса (Linux, /proc)
+    Возвращает None, если определить не удалось
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            # Поле 22 (starttime) после имени процесса в скобках
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# Файловые системы сетевых дисков (тип из /proc/mounts)
+NETWORK_FILESYSTEMS = (
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "afs", "ceph", "glusterfs",
+    "fuse.sshfs", "davfs"
+)
+
+
+def is_network_path(path: str) -> bool:
+    """
+    Лежит ли файл на сетевом диске: UNC-путь или сетевой диск Windows,
+    в Linux - точка монтирования с сетевой файловой системой.
+    Если определить не удалось, диск считается локальным.
+    """
+    path = os.path.abspath(path)
+    if path.startswith(("\\\\", "//")):
+        return True
+    if os.name == "nt":
+        import ctypes
+        drive = os.path.splitdrive(path)[0] + "\\"
+        return ctypes.windll.kernel32.GetDriveTypeW(drive) == 4  # DRIVE_REMOTE
+    try:
+        path = os.path.realpath(path)
+        fs_type, mount_len = None, -1
+        with open("/proc/mounts") as f:
+            for line in f:
+                fields = line.split()
+                # Пробелы в пути точки монтирования записаны как \040
+                mount_point = fields[1].replace("\\040", " ")
+                inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+                if inside and len(mount_point) > mount_len:
+                    fs_type, mount_len = fields[2], len(mount_point)
+        return fs_type in NETWORK_FILESYSTEMS
+    except (OSError, IndexError):
+        return False
+
+
+class StartupProfiler:
+    """Замер этапов запуска приложения (режим --profile-startup)"""
+    
+    def __init__(self, start: Optional[float] = None):
+        now = time.perf_counter()
+        self.start = start if start is not None else now
+        # Время от создания процесса до первой строки main.py
+        age = get_process_age()
+        self.interpreter_time = max(0.0, age - (now - self.start)) if age is not None else None
+        self.marks = []
+    
+    def mark(self, label: str):
+        """Отметка завершения этапа"""
+        self.marks.append((label, time.perf_counter()))
+    
+    def report(self) -> str:
+        """Текстовый отчет: длительность этапов и накопленное время"""
+        lines = ["Профиль запуска (мс):"]
+        offset = 0.0
+        if self.interpreter_time is not None:
+            offset = self.interpreter_time
+            lines.append(f"  {'Старт интерпретатора':<28}{offset * 1000:9.1f}{offset * 1000:10.1f}")
+        previous = self.start
+        for label, moment in self.marks:
+            lines.append(
+                f"  {label:<28}{(moment - previous) * 1000:9.1f}"
+                f"{(moment - self.start + offset) * 1000:10.1f}"
+            )
+            previous = moment
+        return "\n".join(lines)